@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Directory of the tool, so the benchmark can be run from anywhere
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that must not be loaded just by starting the tool
+HEAVY_MODULES = ["librosa", "numpy", "soundfile", "soxr", "pydub", "mutagen", "tinytag", "eyed3", "gradio", "fpdf"]
+
+# Modules imported when starting the CLI
+STARTUP_MODULES = ["main", "file_handler", "metadata_extractor"]
+
+# Default number of timed runs, the median of which is reported
+DEFAULT_RUNS = 5
+
+# Default budget for starting the tool, in seconds
+DEFAULT_MAX_SECONDS = 1.0
+
+def measure_startup(runs):
+    """
+    Time starting the CLI in fresh interpreters.
+
+    Args:
+        runs (int): Number of timed runs.
+
+    Returns:
+        list: Startup time of each run in seconds.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {', '.join(STARTUP_MODULES)}; "
+        "print(time.perf_counter() - start)"
+    )
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip()))
+    return timings
+
+def find_loaded_heavy_modules():
+    """
+    List the heavy libraries loaded by starting the CLI.
+
+    Returns:
+        list: Names of the heavy libraries found in sys.modules.
+    """
+    code = (
+        f"import sys, {', '.join(STARTUP_MODULES)}; "
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return [name for name in result.stdout.strip().split(",") if name]
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark of the audio metadata extraction tool.")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help=f"Number of timed runs (default: {DEFAULT_RUNS}).")
+    parser.add_argument("--max-seconds", type=float, default=DEFAULT_MAX_SECONDS, help=f"Fail if the median startup time exceeds this (default: {DEFAULT_MAX_SECONDS}).")
+    args = parser.parse_args()
+
+    timings = measure_startup(args.runs)
+    loaded = find_loaded_heavy_modules()
+    median = statistics.median(timings)
+    print(json.dumps({
+        "Benchmark": "startup",
+        "Runs": args.runs,
+        "Median Seconds": round(median, 4),
+        "Min Seconds": round(min(timings), 4),
+        "Max Seconds": round(max(timings), 4),
+        "Heavy Modules Loaded": loaded
+    }, indent=4))
+
+    failed = False
+    if loaded:
+        print(f"Heavy modules loaded at startup: {', '.join(loaded)}", file=sys.stderr)
+        failed = True
+    if median > args.max_seconds:
+        print(f"Median startup time {median:.3f}s exceeds the budget of {args.max_seconds:.3f}s", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import math
+import wave
+import array
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+# Directory of the tool, so the benchmark can be run from anywhere
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from metadata_extractor import (extract_metadata, extract_with_ffmpeg, extract_with_soundfile, extract_with_mutagen,
+                                extract_with_tinytag, extract_with_eyed3, extract_with_mediainfo, extract_with_headers)
+from file_handler import handle_directory, save_metadata
+
+# Bundled sample files
+DATA_DIR = os.path.join(REPO_DIR, "data")
+
+# Extractors run by extract_metadata, in its merge order
+EXTRACTORS = [
+    ("FFmpeg", extract_with_ffmpeg),
+    ("SoundFile", extract_with_soundfile),
+    ("Mutagen", extract_with_mutagen),
+    ("TinyTag", extract_with_tinytag),
+    ("eyeD3", extract_with_eyed3),
+    ("MediaInfo", extract_with_mediainfo),
+    ("Header", extract_with_headers)
+]
+
+# Output formats of save_metadata
+OUTPUT_FORMATS = ["json", "jsonl", "csv", "tsv", "txt", "pdf"]
+
+# Benchmark groups, run in this order
+GROUPS = ["extractors", "levels", "formats", "directory"]
+
+# Synthetic WAV files as (duration in seconds, sample rate, channels)
+SYNTHETIC_FILES = [(10, 44100, 1), (60, 44100, 2)]
+
+# Default number of timed runs per benchmark, the median of which is reported
+DEFAULT_RUNS = 3
+
+def create_synthetic_wav(file_path, duration, sample_rate, channels):
+    """
+    Write a 16-bit WAV file holding a 440 Hz tone.
+
+    Args:
+        file_path (str): Path of the file to write.
+        duration (int): Duration in seconds.
+        sample_rate (int): Sample rate in Hz.
+        channels (int): Number of channels.
+    """
+    period = [int(16000 * math.sin(2 * math.pi * 440 * i / sample_rate)) for i in range(sample_rate)]
+    second = array.array("h", (value for value in period for _ in range(channels)))
+    with wave.open(file_path, "wb") as outfile:
+        outfile.setnchannels(channels)
+        outfile.setsampwidth(2)
+        outfile.setframerate(sample_rate)
+        for _ in range(duration):
+            outfile.writeframes(second.tobytes())
+
+def prepare_files(work_dir):
+    """
+    Collect the bundled samples and create the synthetic files.
+
+    Args:
+        work_dir (str): Directory receiving the files.
+
+    Returns:
+        list: Paths of the benchmark files.
+    """
+    files_dir = os.path.join(work_dir, "files")
+    os.makedirs(files_dir)
+    file_paths = []
+    for name in sorted(os.listdir(DATA_DIR)):
+        file_path = os.path.join(files_dir, name)
+        shutil.copyfile(os.path.join(DATA_DIR, name), file_path)
+        file_paths.append(file_path)
+    for duration, sample_rate, channels in SYNTHETIC_FILES:
+        file_path = os.path.join(files_dir, f"synthetic_{duration}s_{sample_rate}_{channels}ch.wav")
+        create_synthetic_wav(file_path, duration, sample_rate, channels)
+        file_paths.append(file_path)
+    return file_paths
+
+def time_call(function, runs):
+    """
+    Time a function over several runs.
+
+    Args:
+        function (callable): Function to call without arguments.
+        runs (int): Number of timed runs.
+
+    Returns:
+        tuple: Timing statistics and the result of the last call.
+    """
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return {
+        "Runs": runs,
+        "Median Seconds": round(statistics.median(timings), 6),
+        "Min Seconds": round(min(timings), 6),
+        "Max Seconds": round(max(timings), 6)
+    }, result
+
+def bench_extractors(file_paths, runs):
+    """
+    Time every extractor on every file.
+
+    Extractors that cannot read a file (or whose tool is missing) are timed
+    all the same and reported with "Succeeded": False.
+
+    Args:
+        file_paths (list): Paths of the benchmark files.
+        runs (int): Number of timed runs.
+
+    Returns:
+        list: Result of every extractor on every file.
+    """
+    results = []
+    for file_path in file_paths:
+        for name, extractor in EXTRACTORS:
+            stats, metadata = time_call(lambda: extractor(file_path), runs)
+            results.append({"Group": "extractors", "Name": name, "File": os.path.basename(file_path), "Succeeded": bool(metadata), **stats})
+    return results
+
+def bench_levels(file_paths, runs):
+    """
+    Time extract_metadata at every processing level on every file.
+
+    Args:
+        file_paths (list): Paths of the benchmark files.
+        runs (int): Number of timed runs.
+
+    Returns:
+        list: Result of every level on every file.
+    """
+    results = []
+    for file_path in file_paths:
+        for level in (0, 1, 2):
+            stats, _ = time_call(lambda: extract_metadata(file_path, level), runs)
+            results.append({"Group": "levels", "Name": f"Level {level}", "File": os.path.basename(file_path), **stats})
+    return results
+
+def bench_formats(file_paths, runs, work_dir):
+    """
+    Time save_metadata in every output format on the level 1 metadata of all files.
+
+    Args:
+        file_paths (list): Paths of the benchmark files.
+        runs (int): Number of timed runs.
+        work_dir (str): Directory receiving the output files.
+
+    Returns:
+        list: Result of every output format.
+    """
+    metadata = [extract_metadata(file_path, 1) for file_path in file_paths]
+    results = []
+    for output_format in OUTPUT_FORMATS:
+        output_dir = os.path.join(work_dir, "output", output_format)
+        stats, _ = time_call(lambda: save_metadata(metadata, output_dir, output_format), runs)
+        results.append({"Group": "formats", "Name": output_format, "Records": len(metadata), **stats})
+    return results
+
+def bench_directory(file_paths, runs, workers):
+    """
+    Time handle_directory at level 1 over the directory of all files.
+
+    Args:
+        file_paths (list): Paths of the benchmark files, all in one directory.
+        runs (int): Number of timed runs.
+        workers (int): Number of worker processes.
+
+    Returns:
+        list: Throughput result of the directory run.
+    """
+    directory = os.path.dirname(file_paths[0])
+    total_bytes = sum(os.path.getsize(file_path) for file_path in file_paths)
+    stats, _ = time_call(lambda: handle_directory(directory, 1, True, workers), runs)
+    seconds = stats["Median Seconds"]
+    return [{
+        "Group": "directory",
+        "Name": f"Level 1, {workers} workers",
+        "Files": len(file_paths),
+        "Bytes": total_bytes,
+        "Files Per Second": round(len(file_paths) / seconds, 3) if seconds else None,
+        "MB Per Second": round(total_bytes / 1024 / 1024 / seconds, 3) if seconds else None,
+        **stats
+    }]
+
+def get_commit():
+    """
+    Get the commit of the benchmarked tree, so runs can be compared across commits.
+
+    Returns:
+        str: Commit hash, or "Unknown" outside a git checkout.
+    """
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "Unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the audio metadata extraction tool.")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help=f"Number of timed runs per benchmark (default: {DEFAULT_RUNS}).")
+    parser.add_argument("--groups", type=str, default=",".join(GROUPS), help=f"Comma-separated benchmark groups to run (default: {','.join(GROUPS)}).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes of the directory benchmark (default: 1).")
+    parser.add_argument("--output", type=str, help="File to write the results to instead of standard output.")
+    args = parser.parse_args()
+
+    groups = [group.strip() for group in args.groups.split(",") if group.strip()]
+    unknown = sorted(set(groups) - set(GROUPS))
+    if unknown:
+        parser.error(f"Unknown benchmark groups: {', '.join(unknown)}")
+
+    # Paths must lie below the working directory, and extractor errors on unreadable files are expected
+    os.chdir(REPO_DIR)
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix=".benchmark_", dir=REPO_DIR) as work_dir:
+        file_paths = prepare_files(work_dir)
+        if "extractors" in groups:
+            results.extend(bench_extractors(file_paths, args.runs))
+        if "levels" in groups:
+            results.extend(bench_levels(file_paths, args.runs))
+        if "formats" in groups:
+            results.extend(bench_formats(file_paths, args.runs, work_dir))
+        if "directory" in groups:
+            results.extend(bench_directory(file_paths, args.runs, args.workers))
+
+    report = json.dumps({
+        "Benchmark": "suite",
+        "Commit": get_commit(),
+        "Date": datetime.now().isoformat(timespec="seconds"),
+        "Python": platform.python_version(),
+        "Platform": platform.platform(),
+        "Results": results
+    }, indent=4)
+    if args.output:
+        with open(args.output, "w") as outfile:
+            outfile.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
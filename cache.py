@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import subprocess
+from functools import lru_cache
+from importlib import metadata as importlib_metadata
+
+from check import sanitize_path, is_safe_path
+
+CACHE_FILE_NAME = "aft_cache.sqlite"
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024  # bytes
+
+# Bump whenever the output of an extractor changes, so stale entries are dropped
+CACHE_FORMAT_VERSION = 1
+
+# Libraries and tools whose versions invalidate the cache when they change
+EXTRACTOR_PACKAGES = ["mutagen", "tinytag", "eyeD3", "soundfile", "pydub", "librosa", "numpy"]
+EXTRACTOR_COMMANDS = {
+    "ffprobe": ["ffprobe", "-version"],
+    "mediainfo": ["mediainfo", "--Version"],
+}
+
+# Fraction of the size limit the cache is trimmed down to when it overflows
+EVICTION_TARGET = 0.9
+
+@lru_cache(maxsize=None)
+def get_extractor_versions():
+    """
+    Collect the versions of all extractor libraries and command line tools.
+
+    Returns:
+        str: JSON description of the versions, used as the cache fingerprint.
+    """
+    versions = {"AFT Cache": CACHE_FORMAT_VERSION}
+    for package in EXTRACTOR_PACKAGES:
+        try:
+            versions[package] = importlib_metadata.version(package)
+        except importlib_metadata.PackageNotFoundError:
+            versions[package] = "Unknown"
+    for name, command in EXTRACTOR_COMMANDS.items():
+        try:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30)
+            versions[name] = result.stdout.strip().splitlines()[-1 if name == "mediainfo" else 0]
+        except Exception:
+            versions[name] = "Unknown"
+    return json.dumps(versions, sort_keys=True)
+
+class MetadataCache:
+    """
+    On-disk SQLite cache of extractor results.
+
+    Entries are keyed by file path and content checksum. The checksum of a file
+    is itself cached by (path, size, mtime), so unchanged files are not even
+    re-hashed; a file whose stat changed but whose content did not is still a
+    hit after re-hashing. Entries are scoped to the path because several
+    extractors (e.g. FFmpeg, MediaInfo) embed the file name in their output.
+
+    Payloads are stored as JSON rather than pickles so a tampered cache file
+    cannot execute code. Values that JSON cannot represent are stored as strings.
+
+    The connection is shared by the extractor threads of a process and is
+    guarded by a lock.
+    """
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE):
+        """
+        Open (or create) the cache in a directory.
+
+        Args:
+            cache_dir (str): Directory holding the cache database.
+            max_size (int): Maximum total size of cached payloads in bytes.
+
+        Raises:
+            ValueError: If the cache directory path is unsafe.
+        """
+        sanitized_cache_dir = sanitize_path(cache_dir)
+        if not is_safe_path(os.getcwd(), sanitized_cache_dir):
+            raise ValueError("Unsafe cache directory path specified.")
+        os.makedirs(sanitized_cache_dir, exist_ok=True)
+
+        self.path = os.path.join(sanitized_cache_dir, CACHE_FILE_NAME)
+        self.max_size = max_size
+        # Autocommit mode keeps write locks short when several worker processes share the cache
+        self.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, checksum TEXT)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "path TEXT, checksum TEXT, section TEXT, payload TEXT, size INTEGER, last_used REAL, "
+            "PRIMARY KEY (path, checksum, section))")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._check_versions()
+        self.total_size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _check_versions(self):
+        """
+        Drop all entries if the extractor versions changed since they were cached.
+        """
+        versions = get_extractor_versions()
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'versions'").fetchone()
+        if row and row[0] == versions:
+            return
+        if row:
+            logging.info("Extractor versions changed, clearing metadata cache.")
+        self.connection.execute("DELETE FROM entries")
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('versions', ?)", (versions,))
+
+    def get_checksum(self, file_path, stat):
+        """
+        Get the cached checksum of a file if its size and modification time are unchanged.
+
+        Args:
+            file_path (str): The sanitized path to the file.
+            stat (os.stat_result): Current stat result of the file.
+
+        Returns:
+            str: The cached checksum, or None on a miss.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT checksum FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (file_path, stat.st_size, stat.st_mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def set_checksum(self, file_path, stat, checksum):
+        """
+        Remember the checksum of a file for its current size and modification time.
+
+        Args:
+            file_path (str): The sanitized path to the file.
+            stat (os.stat_result): Stat result the checksum was computed for.
+            checksum (str): The checksum of the file.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, checksum) VALUES (?, ?, ?, ?)",
+                (file_path, stat.st_size, stat.st_mtime_ns, checksum))
+
+    def get(self, file_path, checksum, section):
+        """
+        Look up a cached result.
+
+        Args:
+            file_path (str): The sanitized path to the file.
+            checksum (str): The checksum of the file.
+            section (str): Name of the cached result (e.g. an extractor name).
+
+        Returns:
+            tuple: (True, value) on a hit, (False, None) on a miss.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT payload FROM entries WHERE path = ? AND checksum = ? AND section = ?",
+                (file_path, checksum, section)).fetchone()
+            if row is None:
+                return False, None
+            self.connection.execute(
+                "UPDATE entries SET last_used = ? WHERE path = ? AND checksum = ? AND section = ?",
+                (time.time(), file_path, checksum, section))
+        return True, json.loads(row[0])
+
+    def put(self, file_path, checksum, section, value):
+        """
+        Store a result, evicting least recently used entries if the cache grows too large.
+
+        Args:
+            file_path (str): The sanitized path to the file.
+            checksum (str): The checksum of the file.
+            section (str): Name of the cached result (e.g. an extractor name).
+            value: JSON serializable result to store.
+        """
+        payload = json.dumps(value, default=str)
+        with self.lock:
+            # A replaced entry no longer counts towards the total size
+            row = self.connection.execute(
+                "SELECT size FROM entries WHERE path = ? AND checksum = ? AND section = ?",
+                (file_path, checksum, section)).fetchone()
+            if row:
+                self.total_size -= row[0]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries (path, checksum, section, payload, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (file_path, checksum, section, payload, len(payload), time.time()))
+            self.total_size += len(payload)
+            if self.total_size > self.max_size:
+                self.evict()
+
+    def fetch(self, file_path, checksum, section, compute):
+        """
+        Return a cached result, computing and storing it on a miss.
+
+        A result of None means the computation failed; it is not stored, so the
+        next lookup computes it again and reports the error again.
+
+        Args:
+            file_path (str): The sanitized path to the file.
+            checksum (str): The checksum of the file, or "Unknown" to bypass the cache.
+            section (str): Name of the cached result (e.g. an extractor name).
+            compute (callable): Function producing the result on a miss.
+
+        Returns:
+            The cached or freshly computed result.
+        """
+        if checksum == "Unknown":
+            return compute()
+        try:
+            hit, value = self.get(file_path, checksum, section)
+            if hit:
+                return value
+        except Exception as e:
+            logging.error(f"Error reading metadata cache for {file_path}: {e}")
+        value = compute()
+        if value is None:
+            return value
+        try:
+            self.put(file_path, checksum, section, value)
+        except Exception as e:
+            logging.error(f"Error writing metadata cache for {file_path}: {e}")
+        return value
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache is below its size limit.
+        """
+        with self.lock:
+            # Other processes may have written to the cache, so start from the real size
+            self.total_size = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            target = self.max_size * EVICTION_TARGET
+            cursor = self.connection.execute(
+                "SELECT path, checksum, section, size FROM entries ORDER BY last_used")
+            expired = []
+            for path, checksum, section, size in cursor:
+                if self.total_size <= target:
+                    break
+                expired.append((path, checksum, section))
+                self.total_size -= size
+            cursor.close()
+            self.connection.executemany(
+                "DELETE FROM entries WHERE path = ? AND checksum = ? AND section = ?", expired)
+        logging.debug(f"Evicted {len(expired)} metadata cache entries")
+
+    def close(self):
+        """
+        Close the cache database.
+        """
+        with self.lock:
+            self.connection.close()
+
+# Open caches of the current process, keyed by (process id, directory, size limit)
+_open_caches = {}
+
+def open_cache(cache_dir, max_size=DEFAULT_CACHE_SIZE):
+    """
+    Get the metadata cache for a directory, opening it once per process.
+
+    SQLite connections must not be shared across fork(), so worker processes
+    get their own connection.
+
+    Args:
+        cache_dir (str): Directory holding the cache database.
+        max_size (int): Maximum total size of cached payloads in bytes.
+
+    Returns:
+        MetadataCache: The open cache.
+    """
+    key = (os.getpid(), cache_dir, max_size)
+    if key not in _open_caches:
+        _open_caches[key] = MetadataCache(cache_dir, max_size)
+    return _open_caches[key]
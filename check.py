@@ -1,5 +1,8 @@
 import os
+import struct
+import threading
 from pathlib import Path
+from functools import lru_cache
 import mimetypes
 
 try:
@@ -24,8 +27,234 @@ SUPPORTED_FORMATS = [
     'audio/x-aiff',   # .aiff
     'audio/m4a',      # .m4a
     'audio/x-m4a',    # .m4a
+    'audio/mp4',      # .m4a, .mp4
+    'audio/x-ms-wma', # .wma
+    'audio/amr',      # .amr
+    'audio/AMR',      # .amr
 ]
 
+# Bytes read from the start of a file to recognise its format
+SNIFF_SIZE = 512
+
+# Number of files whose sniffed format is remembered
+SNIFF_CACHE_SIZE = 4096
+
+# MIME types of the formats recognised by sniff_format, named as the header parser names them
+SNIFFED_MIME_TYPES = {
+    "MP3": "audio/mpeg",
+    "MP2": "audio/mpeg",
+    "MP1": "audio/mpeg",
+    "AAC": "audio/aac",
+    "WAV": "audio/wav",
+    "OGG": "audio/ogg",
+    "OPUS": "audio/ogg",
+    "FLAC": "audio/flac",
+    "AIFF": "audio/aiff",
+    "AIFF-C": "audio/aiff",
+    "M4A": "audio/m4a",
+    "MP4": "audio/mp4",
+    "WMA": "audio/x-ms-wma",
+    "AMR": "audio/amr",
+}
+
+# Major brands of MP4 files holding audio only (iTunes audio and audiobooks)
+MP4_AUDIO_BRANDS = (b'M4A ', b'M4B ', b'M4P ')
+
+# GUID starting every ASF (WMA) file
+ASF_HEADER_GUID = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c")
+
+# libmagic handles are not thread-safe, so the shared one is used under a lock
+_magic_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def get_magic():
+    """
+    Create the libmagic handle shared by all content checks of this process.
+
+    Returns:
+        magic.Magic: Handle detecting MIME types.
+    """
+    return magic.Magic(mime=True)
+
+def detect_mime_type(file_path):
+    """
+    Detect the MIME type of a file from its content with libmagic.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: The MIME type.
+    """
+    with _magic_lock:
+        return get_magic().from_file(file_path)
+
+def read_at(f, offset, size):
+    """
+    Read bytes at an offset of an open file.
+
+    Args:
+        f (file): File object opened in binary mode.
+        offset (int): Position to read from.
+        size (int): Number of bytes to read.
+
+    Returns:
+        bytes: The bytes read, fewer than size at the end of the file.
+    """
+    f.seek(offset)
+    return f.read(size)
+
+def sniff_mpeg_frame(f, offset):
+    """
+    Recognise an MPEG audio or ADTS AAC stream starting at an offset.
+
+    A frame sync alone is too weak (a UTF-16 byte order mark looks like one),
+    so the stream is only recognised if a second frame header follows at the
+    length given by the first, as header_parser.read_mp3_header requires.
+
+    Args:
+        f (file): File object opened in binary mode.
+        offset (int): Position of the presumed first frame.
+
+    Returns:
+        str: "MP3", "MP2", "MP1" or "AAC", or None if no two consecutive frames are found.
+    """
+    # Imported here, as header_parser itself depends on this module
+    from header_parser import parse_mpeg_frame_header
+
+    header = read_at(f, offset, 7)
+    if len(header) < 7 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    if (header[1] >> 1) & 0x03 == 0:
+        # ADTS uses the otherwise reserved layer value, with a 12-bit sync and a 13-bit frame length
+        if header[1] & 0xF0 != 0xF0 or (header[2] >> 2) & 0x0F >= 13:
+            return None
+        frame_length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+        following = read_at(f, offset + frame_length, 2) if frame_length >= 7 else b''
+        return "AAC" if len(following) == 2 and following[0] == 0xFF and following[1] & 0xF6 == 0xF0 else None
+    frame = parse_mpeg_frame_header(header[:4])
+    if frame is None:
+        return None
+    following = read_at(f, offset + frame["Frame Length"], 4)
+    if len(following) < 4 or parse_mpeg_frame_header(following) is None:
+        return None
+    return "MP3" if frame["Layer"] == 3 else f"MP{frame['Layer']}"
+
+def sniff_mp4_tracks(f):
+    """
+    Recognise an MP4 file of a generic brand (isom, mp42, ...) as audio by its tracks.
+
+    The same ISO base media format holds video, 3GP clips and HEIF/AVIF
+    images, so only files with an audio track and no video track are audio.
+
+    Args:
+        f (file): File object opened in binary mode.
+
+    Returns:
+        str: "MP4", or None if the file has no audio track, has a video track or cannot be parsed.
+    """
+    # Imported here, as header_parser itself depends on this module
+    from header_parser import read_mp4_track_handlers
+
+    try:
+        handlers = read_mp4_track_handlers(f)
+    except (struct.error, ValueError):
+        return None
+    return "MP4" if b'soun' in handlers and b'vide' not in handlers else None
+
+def sniff_bytes(data, f):
+    """
+    Recognise an audio format from the first bytes of a file.
+
+    Args:
+        data (bytes): The first SNIFF_SIZE bytes of the file.
+        f (file): The open file, to confirm MPEG frames and look past an ID3v2 tag.
+
+    Returns:
+        str: The format, a key of SNIFFED_MIME_TYPES, or None if it is not recognised.
+    """
+    if data[:4] in (b'RIFF', b'RF64', b'BW64') and data[8:12] == b'WAVE':
+        return "WAV"
+    if data[:4] == b'FORM' and data[8:12] in (b'AIFF', b'AIFC'):
+        return "AIFF" if data[8:12] == b'AIFF' else "AIFF-C"
+    if data[:4] == b'fLaC':
+        return "FLAC"
+    if data[:4] == b'OggS':
+        # The first page holds the codec's identification header
+        return "OPUS" if data[28:36] == b'OpusHead' else "OGG"
+    if data[4:8] == b'ftyp':
+        if data[8:12] in MP4_AUDIO_BRANDS:
+            return "M4A"
+        return sniff_mp4_tracks(f)
+    if data[:16] == ASF_HEADER_GUID:
+        return "WMA"
+    if data.startswith(b'#!AMR'):
+        return "AMR"
+    if data[:3] == b'ID3' and len(data) >= 10:
+        # The tag is followed by the audio, usually MPEG frames
+        tag_end = 10 + ((data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]) + (10 if data[5] & 0x10 else 0)
+        if read_at(f, tag_end, 4) == b'fLaC':
+            return "FLAC"
+        return sniff_mpeg_frame(f, tag_end) or "MP3"
+    return sniff_mpeg_frame(f, 0)
+
+@lru_cache(maxsize=SNIFF_CACHE_SIZE)
+def _sniff_file(file_path, size, modification_time):
+    with open(file_path, 'rb') as f:
+        return sniff_bytes(f.read(SNIFF_SIZE), f)
+
+def sniff_format(file_path):
+    """
+    Recognise the audio format of a file from its content.
+
+    Only the first SNIFF_SIZE bytes are read (and a few more after a large
+    ID3v2 tag). The result is remembered per file until the file's size or
+    modification time changes, so checking the file and routing it to its
+    extractors read it once.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: The format (e.g. "MP3", "WAV", "OPUS"), a key of SNIFFED_MIME_TYPES, or None
+        if it is not recognised or the file cannot be read.
+    """
+    try:
+        stat = os.stat(file_path)
+        # Keyed by the absolute path, so relative and sanitized spellings of a path share the result
+        return _sniff_file(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return None
+
+def is_audio_extension(file_path):
+    """
+    Classify a file by its extension alone.
+
+    Args:
+        file_path (str): The path or name of the file.
+
+    Returns:
+        bool: True if the extension is that of a supported audio format, False if it
+        is that of another known type, or None if the extension is not known and
+        the file's content has to be checked.
+    """
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if mime_type is None:
+        return None
+    return mime_type in SUPPORTED_FORMATS
+
+def is_audio_content(file_path):
+    """
+    Check whether the first bytes of a file are those of a supported audio format.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        bool: True if sniff_format recognises a supported format, False otherwise.
+    """
+    return SNIFFED_MIME_TYPES.get(sniff_format(file_path)) in SUPPORTED_FORMATS
+
 def is_audio_file(file_path):
     try:
         """
@@ -37,14 +266,17 @@ def is_audio_file(file_path):
         Returns:
             bool: True if the file is an audio file, False otherwise.
         """
-        # First, use mimetypes to get the MIME type based on the file extension
+        # A format recognised from the file's content settles it, whatever the extension
+        if is_audio_content(file_path):
+            return True
+
+        # Otherwise, use mimetypes to get the MIME type based on the file extension
         mime_type, _ = mimetypes.guess_type(file_path)
         # print(f"Guessed MIME type using mimetypes: {mime_type}")
     
         # If mimetypes did not guess correctly and python-magic is available, use it to detect MIME type based on file content
         if (not mime_type or not mime_type.startswith('audio')) and MAGIC_AVAILABLE:
-            mime = magic.Magic(mime=True)
-            mime_type = mime.from_file(file_path)
+            mime_type = detect_mime_type(file_path)
             # print(f"Detected MIME type using magic: {mime_type}")
     
         # Check if the MIME type is in the list of allowed audio MIME types
@@ -56,6 +288,9 @@ def is_audio_file(file_path):
         raise ValueError(f"Bad file format: {e}") 
         
 def sanitize_path(path):
+    # A validated path is already resolved and sanitized
+    if isinstance(path, ValidatedPath):
+        return path
     try:
         if not isinstance(path, str) or not path:
             raise ValueError("Invalid path: Path must be a non-empty string")
@@ -75,21 +310,80 @@ def sanitize_path(path):
         raise ValueError(f"Unsafe path detected: {e}") 
 
 def is_safe_path(basedir, path, follow_symlinks=True):
+    # A validated path was already found safe with respect to the same base directory
+    if follow_symlinks and isinstance(path, ValidatedPath) and path.basedir == basedir:
+        return True
     try:
-        sanitized_basedir = Path(sanitize_path(basedir)).resolve()
-        sanitized_path = Path(sanitize_path(path)).resolve()
+        # sanitize_path resolves the paths, so they are not resolved again here
+        sanitized_basedir = Path(sanitize_path(basedir))
+        sanitized_path = Path(sanitize_path(path))
 
         # Check if the given path is within the basedir or the system's temporary directory
-        temp_dir = Path(os.path.realpath(os.path.expanduser(os.getenv('TMP', '/tmp')))).resolve()
+        temp_dir = get_temp_dir(os.getenv('TMP', '/tmp'))
 
-        if follow_symlinks:
-            abs_base = sanitized_basedir.resolve()
-            abs_path = sanitized_path.resolve()
-        else:
-            abs_base = sanitized_basedir
-            abs_path = sanitized_path
+        abs_base = sanitized_basedir
+        abs_path = sanitized_path
 
         # Check if the absolute path is within the base directory or the temporary directory
         return abs_path.parts[:len(abs_base.parts)] == abs_base.parts or abs_path.parts[:len(temp_dir.parts)] == temp_dir.parts
     except ValueError as e:
-        raise ValueError(f"Unsafe path detected: {e}")
\ No newline at end of file
+        raise ValueError(f"Unsafe path detected: {e}")
+
+@lru_cache(maxsize=None)
+def get_temp_dir(tmp):
+    """
+    Resolve the system's temporary directory once per value of the TMP variable.
+
+    Args:
+        tmp (str): Value of the TMP environment variable, or its default.
+
+    Returns:
+        Path: The resolved temporary directory.
+    """
+    return Path(os.path.realpath(os.path.expanduser(tmp))).resolve()
+
+class ValidatedPath(str):
+    """
+    A path that has been sanitized and found safe, so it need not be checked again.
+
+    Creating one runs sanitize_path and is_safe_path once. Afterwards
+    sanitize_path returns it unchanged and is_safe_path accepts it without
+    resolving it again, as long as it is checked against the same base
+    directory; against any other base directory it is checked as usual.
+    Instances are immutable, and are validated again when unpickled, e.g. in
+    a worker process.
+    """
+
+    def __new__(cls, path, basedir=None):
+        """
+        Validate a path.
+
+        Args:
+            path (str): The path to validate.
+            basedir (str, optional): Directory the path must lie in (or in the temporary
+                directory); the current working directory if None.
+
+        Returns:
+            ValidatedPath: The sanitized path.
+
+        Raises:
+            ValueError: If the path is invalid or unsafe.
+        """
+        basedir = os.getcwd() if basedir is None else basedir
+        if isinstance(path, ValidatedPath) and path.basedir == basedir:
+            return path
+        sanitized_path = sanitize_path(path)
+        if not is_safe_path(basedir, sanitized_path):
+            raise ValueError("Unsafe file path specified.")
+        validated_path = super().__new__(cls, sanitized_path)
+        object.__setattr__(validated_path, "basedir", basedir)
+        return validated_path
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ValidatedPath is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ValidatedPath is immutable")
+
+    def __reduce__(self):
+        return (ValidatedPath, (str(self), self.basedir))
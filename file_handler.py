@@ -1,86 +1,990 @@
 import os
-from metadata_extractor import extract_metadata
+from metadata_extractor import extract_metadata, EXTRACTOR_PROFILES, DEFAULT_PROFILE
 import json
 import csv
 from datetime import datetime
-from fpdf import FPDF
+import math
+import time
+import fnmatch
 import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
-from check import sanitize_path, is_safe_path, is_audio_file, SUPPORTED_FORMATS
+from check import sanitize_path, is_safe_path, is_audio_file, is_audio_extension, is_audio_content, SUPPORTED_FORMATS
+from manifest import get_manifest_path, load_manifest, save_manifest, is_unchanged, build_manifest_entry
+from probe import ProbePrefetcher, get_tool_path, PROBE_TOOLS, PROBE_CONCURRENCY, PROBE_TIMEOUT
 
+# Number of files kept in flight per worker process in batch mode
+POOL_WINDOW_FACTOR = 4
 
-def handle_file_upload(files, level, aggregate):
+# Number of newly processed files after which an incremental run saves its manifest
+MANIFEST_SAVE_INTERVAL = 500
+
+class JsonLinesWriter:
+    """
+    Stream metadata records to a JSON Lines file, one record per line.
+
+    Each record is written and flushed as soon as it is available, so memory
+    use does not grow with the batch size and a crash keeps every record
+    written so far.
+    """
+    def __init__(self, output_dir):
+        """
+        Create the output file.
+
+        Args:
+            output_dir (str): Directory to save the metadata file in.
+
+        Raises:
+            ValueError: If the output directory path is unsafe.
+        """
+        sanitized_output_dir = sanitize_path(output_dir)
+        if not is_safe_path(os.getcwd(), sanitized_output_dir):
+            raise ValueError("Unsafe output directory path specified.")
+        os.makedirs(sanitized_output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        self.output_path = os.path.join(sanitized_output_dir, f"metadata_{timestamp}.jsonl")
+        self.outfile = open(self.output_path, 'w')
+        self.count = 0
+
+    def write(self, metadata):
+        """
+        Write one record and flush it to disk.
+
+        Args:
+            metadata (dict or list): Metadata of one file.
+        """
+        self.outfile.write(json.dumps(metadata, default=str) + "\n")
+        self.outfile.flush()
+        self.count += 1
+
+    def close(self):
+        """
+        Close the output file.
+        """
+        if not self.outfile.closed:
+            self.outfile.close()
+            logging.info(f"Metadata saved to {self.output_path}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def build_error_record(file_path, error, error_type="Error"):
+    """
+    Build a metadata record describing a file that could not be processed.
+
+    Args:
+        file_path (str): The path to the file that failed.
+        error (Exception or str): The error raised while processing the file.
+        error_type (str): Type of the error if it is given as a string; the exception's class name otherwise.
+
+    Returns:
+        dict: Error record to include in the batch results.
+    """
+    if isinstance(error, Exception):
+        error_type = type(error).__name__
+        error = f"{error_type}: {error}"
+    return {
+        "Source": "Error",
+        "File Name": os.path.basename(file_path),
+        "File Path": file_path,
+        "Error": str(error),
+        "Error Type": error_type
+    }
+
+def build_timeout_record(file_path, timeout):
+    """
+    Build the error record of a file whose processing exceeded its time budget.
+
+    Args:
+        file_path (str): The path to the file that timed out.
+        timeout (float): The time budget in seconds.
+
+    Returns:
+        dict: Error record listing the file as the stage that timed out.
+    """
+    record = build_error_record(file_path, f"Processing timed out after {timeout} seconds", "TimeoutError")
+    record["Timed Out"] = ["File"]
+    return record
+
+def get_timed_out_stages(metadata):
+    """
+    Get the stages that ran out of time while processing a file.
+
+    Args:
+        metadata (dict or list or None): Result of processing the file.
+
+    Returns:
+        list: Names of the stages ("File" if the whole file timed out).
+    """
+    if isinstance(metadata, dict):
+        return metadata.get("Timed Out", [])
+    if isinstance(metadata, list):
+        return [md["Source"] for md in metadata if isinstance(md, dict) and md.get("Timed Out")]
+    return []
+
+def get_extractor_errors(metadata):
+    """
+    Get the errors of the extractors that failed on a file.
+
+    Args:
+        metadata (dict or list or None): Result of processing the file.
+
+    Returns:
+        list: Entries with the extractor ("Source"), the error and its "Error Type".
+    """
+    if isinstance(metadata, dict):
+        return metadata.get("Extractor Errors", [])
+    if isinstance(metadata, list):
+        return [md for md in metadata if isinstance(md, dict) and md.get("Error Type")]
+    return []
+
+def get_timings(metadata):
+    """
+    Get the timings recorded while processing a file.
+
+    Args:
+        metadata (dict or list or None): Result of processing the file.
+
+    Returns:
+        dict: The "Timings" section, or None if timings were not recorded.
+    """
+    if isinstance(metadata, dict):
+        return metadata.get("Timings")
+    if isinstance(metadata, list):
+        return next((md for md in metadata if isinstance(md, dict) and md.get("Source") == "Timings"), None)
+    return None
+
+def strip_timings(metadata):
+    """
+    Remove the timings recorded while processing a file from its result.
+
+    Args:
+        metadata (dict or list or None): Result of processing the file.
+
+    Returns:
+        dict or list or None: The result without its "Timings" section.
+    """
+    if isinstance(metadata, dict):
+        metadata.pop("Timings", None)
+    elif isinstance(metadata, list):
+        metadata = [md for md in metadata if not (isinstance(md, dict) and md.get("Source") == "Timings")]
+    return metadata
+
+def take_file_checksum(metadata):
+    """
+    Get the checksum computed while processing a file, removing its extra "File" entry from a non-aggregated result.
+
+    Args:
+        metadata (dict or list or None): Result of processing the file with the "file_checksum" option.
+
+    Returns:
+        tuple: The result without its "File" entry, and the checksum or None if the result holds none
+        (e.g. an error record).
+    """
+    if isinstance(metadata, dict):
+        return metadata, metadata.get("Checksum")
+    if isinstance(metadata, list):
+        checksum = next((md.get("Checksum") for md in metadata if isinstance(md, dict) and md.get("Source") == "File"), None)
+        return [md for md in metadata if not (isinstance(md, dict) and md.get("Source") == "File")], checksum
+    return metadata, None
+
+def process_file(file_path, level, aggregate, **options):
+    """
+    Extract metadata from a single file without raising.
+
+    Args:
+        file_path (str): Sanitized path to the audio file.
+        level (int): Processing level (0, 1 or 2).
+        aggregate (bool): Whether to aggregate metadata from all extractors.
+        **options: Additional keyword arguments for extract_metadata.
+
+    Returns:
+        dict or list: Extracted metadata, an error record if extraction failed,
+        or None if the file is not a supported audio file.
+    """
+    try:
+        if not is_audio_file(file_path):
+            logging.error(f"Incorrect file format: {file_path}")
+            return None
+        return extract_metadata(file_path, level, aggregate, **options)
+    except Exception as e:
+        logging.error(f"Unexpected error processing file {file_path}: {e}")
+        return build_error_record(file_path, e)
+
+class BatchPaths:
+    """
+    Paths of the files of a batch, read from an iterable only as far as they are needed.
+
+    Lets processing start on the first files of a directory while it is
+    still being walked. Supports indexing, slicing and iteration, but not len.
+    """
+
+    def __init__(self, file_paths):
+        """
+        Args:
+            file_paths (iterable): Sanitized paths of the files, in processing order.
+        """
+        self.iterator = iter(file_paths)
+        self.file_paths = []
+
+    def fill(self, count):
+        """
+        Read paths until count of them are known or the iterable is exhausted.
+
+        Args:
+            count (int or float): Number of paths wanted; math.inf reads all of them.
+
+        Returns:
+            int: Number of paths known.
+        """
+        while self.iterator is not None and len(self.file_paths) < count:
+            try:
+                self.file_paths.append(next(self.iterator))
+            except StopIteration:
+                self.iterator = None
+        return len(self.file_paths)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self.fill(math.inf if index.stop is None else index.stop)
+        else:
+            self.fill(index + 1)
+        return self.file_paths[index]
+
+    def __iter__(self):
+        index = 0
+        while self.fill(index + 1) > index:
+            yield self.file_paths[index]
+            index += 1
+
+def _completed_future(result):
+    """
+    Wrap an already known result in a finished future.
+
+    Args:
+        result: The result the future should hold.
+
+    Returns:
+        Future: A future that is already done.
+    """
+    future = Future()
+    future.set_result(result)
+    return future
+
+def _kill_workers(executor):
+    """
+    Kill the worker processes of a process pool, breaking the pool.
+
+    Args:
+        executor (ProcessPoolExecutor): The pool.
+    """
+    # ProcessPoolExecutor has no public way to stop running tasks before Python 3.14
+    for process in list((executor._processes or {}).values()):
+        process.kill()
+
+def _run_isolated(file_path, level, aggregate, options, file_timeout=None):
+    """
+    Process a single file in its own worker process.
+
+    Used to find out which file brought down a shared pool: if the isolated
+    worker dies as well, the file is reported as failed.
+
+    Args:
+        file_path (str): Sanitized path to the audio file.
+        level (int): Processing level (0, 1 or 2).
+        aggregate (bool): Whether to aggregate metadata from all extractors.
+        options (dict): Additional keyword arguments for extract_metadata.
+        file_timeout (float, optional): Seconds after which the worker is killed.
+
+    Returns:
+        dict or list: Extracted metadata or an error record.
+    """
+    try:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(process_file, file_path, level, aggregate, **options)
+            try:
+                return future.result(timeout=file_timeout)
+            except FutureTimeoutError:
+                logging.error(f"Processing {file_path} timed out after {file_timeout} seconds")
+                _kill_workers(executor)
+                return build_timeout_record(file_path, file_timeout)
+    except BrokenProcessPool:
+        logging.error(f"Worker process terminated abruptly while processing {file_path}")
+        return build_error_record(file_path, "Worker process terminated abruptly", "BrokenProcessPool")
+    except Exception as e:
+        logging.error(f"Unexpected error processing file {file_path}: {e}")
+        return build_error_record(file_path, e)
+
+def get_probe_tools(level, options):
+    """
+    Get the probing tools worth running ahead of extraction.
+
+    Nothing is probed at level 0, for tools the profile excludes or that are
+    not installed, or when the metadata cache is used (cached files would be
+    probed for nothing).
+
+    Args:
+        level (int): Processing level (0, 1 or 2).
+        options (dict): Additional keyword arguments for extract_metadata.
+
+    Returns:
+        list: Names of the tools' extractors, keys of PROBE_TOOLS.
+    """
+    if int(level) == 0 or options.get("cache_dir"):
+        return []
+    allowed = EXTRACTOR_PROFILES.get(options.get("profile", DEFAULT_PROFILE))
+    return [tool for tool, executable in PROBE_TOOLS.items()
+            if (allowed is None or tool in allowed) and get_tool_path(executable)]
+
+def create_prefetcher(file_paths, level, options, concurrency=PROBE_CONCURRENCY, file_timeout=None):
+    """
+    Create a prefetcher running ffprobe and MediaInfo ahead of extraction for a batch.
+
+    Args:
+        file_paths (list or BatchPaths): Sanitized paths of the files to process.
+        level (int): Processing level (0, 1 or 2).
+        options (dict): Additional keyword arguments for extract_metadata.
+        concurrency (int): Maximum number of probing processes in flight.
+        file_timeout (float, optional): Time budget of each file in seconds.
+
+    Returns:
+        ProbePrefetcher: The prefetcher, or None for single files or if there is nothing to probe.
+    """
+    tools = get_probe_tools(level, options)
+    if not tools or len(file_paths[:2]) <= 1:
+        return None
+    # A probe may not outlast the extractor or the file it is run for
+    timeout = min(timeout for timeout in (options.get("probe_timeout", PROBE_TIMEOUT), options.get("extractor_timeout"), file_timeout)
+                  if timeout is not None)
+    return ProbePrefetcher(file_paths, tools, concurrency, timeout)
+
+def _file_options(options, prefetcher, index):
+    """
+    Get the extract_metadata keyword arguments for one file of a batch.
+
+    Args:
+        options (dict): Keyword arguments shared by all files.
+        prefetcher (ProbePrefetcher or None): Prefetcher of the batch.
+        index (int): Index of the file in the batch.
+
+    Returns:
+        dict: Keyword arguments for the file.
+    """
+    if prefetcher is None:
+        return options
+    return dict(options, prefetched=prefetcher.get(index))
+
+def _iter_pool_results(file_paths, level, aggregate, workers, options, prefetcher=None, file_timeout=None, metrics=None):
+    """
+    Process files on a process pool, yielding results in input order.
+
+    At most POOL_WINDOW_FACTOR * workers files are in flight at any time. If a
+    worker dies (e.g. a decoder segfaults) the pool is rebuilt. The pool hands
+    out work in submission order, so the file that crashed it is among the
+    first unfinished files; those are re-run one by one in isolated workers and
+    the rest are resubmitted to a fresh pool.
+
+    With a file_timeout, the oldest file in flight gets that many seconds
+    from the moment it is submitted or reaches the head of the queue,
+    whichever is later. When it runs out of time the workers are killed, the
+    file is reported as timed out and the other unfinished files are
+    resubmitted to a fresh pool.
+
+    Args:
+        file_paths (BatchPaths): Sanitized paths of the files to process.
+        level (int): Processing level (0, 1 or 2).
+        aggregate (bool): Whether to aggregate metadata from all extractors.
+        workers (int): Number of worker processes.
+        options (dict): Additional keyword arguments for extract_metadata.
+        prefetcher (ProbePrefetcher, optional): Source of prefetched ffprobe and MediaInfo output.
+        file_timeout (float, optional): Seconds a file may take; unlimited if None.
+        metrics (BatchMetrics, optional): Metrics kept informed of the number of files in flight.
+
+    Yields:
+        dict or list or None: Result of process_file for each file.
+    """
+    window = workers * POOL_WINDOW_FACTOR
+    # Files that may have been running when a pool broke
+    suspect_count = 2 * workers + 1
+    # Files to run again come first, then files not submitted yet, read from file_paths as needed
+    queue = deque()
+    next_index = 0
+
+    def has_next():
+        return file_paths.fill(next_index + 1) > next_index
+
+    while queue or has_next():
+        in_flight = deque()
+        submitted = {}
+        pool_broken = False
+        timed_out = False
+        head_since = time.monotonic()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while (queue or in_flight or has_next()) and not pool_broken:
+                while (queue or has_next()) and len(in_flight) < window:
+                    if queue:
+                        index, future = queue.popleft()
+                    else:
+                        index, future = next_index, None
+                        next_index += 1
+                    if future is None:
+                        try:
+                            future = executor.submit(process_file, file_paths[index], level, aggregate, **_file_options(options, prefetcher, index))
+                        except BrokenProcessPool:
+                            queue.appendleft((index, None))
+                            pool_broken = True
+                            break
+                        submitted[index] = time.monotonic()
+                    in_flight.append((index, future))
+                if pool_broken or not in_flight:
+                    break
+                if metrics:
+                    metrics.set_in_flight(len(in_flight))
+
+                index, future = in_flight[0]
+                timeout = None
+                if file_timeout is not None:
+                    timeout = max(0, max(head_since, submitted.get(index, 0)) + file_timeout - time.monotonic())
+                try:
+                    result = future.result(timeout=timeout)
+                except FutureTimeoutError:
+                    logging.error(f"Processing {file_paths[index]} timed out after {file_timeout} seconds, restarting the process pool")
+                    _kill_workers(executor)
+                    result = build_timeout_record(file_paths[index], file_timeout)
+                    timed_out = True
+                except BrokenProcessPool:
+                    pool_broken = True
+                    break
+                except Exception as e:
+                    logging.error(f"Unexpected error processing file {file_paths[index]}: {e}")
+                    result = build_error_record(file_paths[index], e)
+                in_flight.popleft()
+                head_since = time.monotonic()
+                yield result
+                if timed_out:
+                    break
+
+        if timed_out:
+            # The killed workers were running the timed out file or other, innocent ones
+            queue.extendleft(reversed([(index, future if future.done() and not future.cancelled()
+                                        and not isinstance(future.exception(), BrokenProcessPool) else None)
+                                       for index, future in in_flight]))
+            continue
+        if not pool_broken:
+            continue
+
+        logging.error("Worker process terminated abruptly, restarting the process pool")
+        retry = []
+        suspects = suspect_count
+        for index, future in in_flight:
+            if future.done() and not isinstance(future.exception(), BrokenProcessPool):
+                retry.append((index, future))
+            elif suspects > 0:
+                suspects -= 1
+                retry.append((index, _completed_future(_run_isolated(file_paths[index], level, aggregate, _file_options(options, prefetcher, index), file_timeout))))
+            else:
+                retry.append((index, None))
+        queue.extendleft(reversed(retry))
+
+def _iter_serial_results(file_paths, level, aggregate, options, prefetcher=None, metrics=None):
+    """
+    Process files one after the other in this process, yielding results in input order.
+
+    Args:
+        file_paths (BatchPaths): Sanitized paths of the files to process.
+        level (int): Processing level (0, 1 or 2).
+        aggregate (bool): Whether to aggregate metadata from all extractors.
+        options (dict): Additional keyword arguments for extract_metadata.
+        prefetcher (ProbePrefetcher, optional): Source of prefetched ffprobe and MediaInfo output.
+        metrics (BatchMetrics, optional): Metrics kept informed of the number of files in flight.
+
+    Yields:
+        dict or list or None: Result of process_file for each file.
+    """
+    for index, file_path in enumerate(file_paths):
+        if metrics:
+            metrics.set_in_flight(1)
+        yield process_file(file_path, level, aggregate, **_file_options(options, prefetcher, index))
+
+def iter_file_results(file_paths, level, aggregate, workers=1, probe_concurrency=PROBE_CONCURRENCY, file_timeout=None, metrics=None, **options):
+    """
+    Extract metadata from several files, yielding each file with its result in input order.
+
+    ffprobe and MediaInfo are run ahead of extraction, several processes at a
+    time, rather than inside each extraction (see create_prefetcher). With a
+    file_timeout, files are always processed in worker processes, even with a
+    single worker, so that a file running out of time can be killed.
+
+    The paths may come from a generator, e.g. of scan_directory; they are
+    read from it only as processing and prefetching need them.
+
+    Args:
+        file_paths (iterable): Sanitized paths of the files to process.
+        level (int): Processing level (0, 1 or 2).
+        aggregate (bool): Whether to aggregate metadata from all extractors.
+        workers (int): Number of worker processes; 1 processes files serially.
+        probe_concurrency (int): Maximum number of ffprobe/MediaInfo processes in flight.
+        file_timeout (float, optional): Seconds a file may take before its worker is killed; unlimited if None.
+        metrics (BatchMetrics, optional): Live metrics updated as files are submitted and finished. Their
+            extractor latencies need timings, which are then recorded but only kept in the results
+            if the "timings" option is set.
+        **options: Additional keyword arguments for extract_metadata.
+
+    Yields:
+        tuple: File path and its metadata, error record, or None for non-audio files.
+    """
+    keep_timings = options.get("timings", False)
+    if metrics:
+        options["timings"] = True
+    file_paths = file_paths if isinstance(file_paths, BatchPaths) else BatchPaths(file_paths)
+    prefetcher = create_prefetcher(file_paths, level, options, probe_concurrency, file_timeout)
+    try:
+        if file_timeout is None and (workers is None or workers <= 1 or file_paths.fill(2) <= 1):
+            results = _iter_serial_results(file_paths, level, aggregate, options, prefetcher, metrics)
+        else:
+            results = _iter_pool_results(file_paths, level, aggregate, max(1, workers or 1), options, prefetcher, file_timeout, metrics)
+        for file_path, result in zip(file_paths, results):
+            if metrics:
+                metrics.observe(file_path, result)
+                if not keep_timings:
+                    result = strip_timings(result)
+            yield file_path, result
+    finally:
+        if metrics:
+            metrics.set_in_flight(0)
+        if prefetcher:
+            prefetcher.close()
+
+def iter_results(file_paths, level, aggregate, workers=1, **options):
+    """
+    Extract metadata from several files, yielding results in input order.
+
+    Args:
+        file_paths (iterable): Sanitized paths of the files to process.
+        level (int): Processing level (0, 1 or 2).
+        aggregate (bool): Whether to aggregate metadata from all extractors.
+        workers (int): Number of worker processes; 1 processes files serially.
+        **options: Additional keyword arguments for extract_metadata.
+
+    Yields:
+        dict or list: Extracted metadata or an error record for each audio file.
+    """
+    for _, result in iter_file_results(file_paths, level, aggregate, workers, **options):
+        if result:
+            yield result
+
+def collect_results(results, writer=None):
+    """
+    Collect results into a list, or stream them to a writer instead.
+
+    Args:
+        results (iterable): Metadata records.
+        writer (JsonLinesWriter, optional): Writer receiving each record as it arrives.
+
+    Returns:
+        list: The records, or an empty list if they were streamed to the writer.
+    """
+    if writer is None:
+        return list(results)
+    for result in results:
+        writer.write(result)
+    return []
+
+def update_summary(summary, metadata):
+    """
+    Count a freshly processed file in a batch summary.
+
+    If the file's timings were recorded, they are also collected under
+    "Timing Samples" for format_timing_summary.
+
+    Args:
+        summary (Counter or None): Batch summary to update; nothing is counted if None.
+        metadata (dict or list): Result of processing the file.
+    """
+    if summary is None:
+        return
+    summary["Files"] += 1
+    if get_timed_out_stages(metadata):
+        summary["Timeouts"] += 1
+    if is_error_record(metadata):
+        summary["Errors"] += 1
+    elif isinstance(metadata, dict):
+        summary["Skipped Extractor Calls"] += len(metadata.get("Skipped Extractors", []))
+    timings = get_timings(metadata)
+    if timings:
+        # Timing samples are kept per extractor and per container for format_timing_summary
+        samples = summary.setdefault("Timing Samples", {})
+        for name, seconds in timings.get("Extractors", {}).items():
+            samples.setdefault(("Extractor", name), []).append(seconds)
+        samples.setdefault(("Format", timings["Container"]), []).append(timings["Total"])
+
+def summarize_results(results, summary=None):
+    """
+    Pass results through, counting each of them in a batch summary.
+
+    Args:
+        results (iterable): Metadata records.
+        summary (Counter, optional): Batch summary to update.
+
+    Yields:
+        dict or list: The records, unchanged.
+    """
+    for result in results:
+        update_summary(summary, result)
+        yield result
+
+def format_summary(summary):
+    """
+    Describe a batch summary in one line.
+
+    Skipped extractor calls are only known for aggregated metadata. Files
+    with a stage that timed out are counted as timeouts.
+
+    Args:
+        summary (Counter): Batch summary from update_summary.
+
+    Returns:
+        str: The description.
+    """
+    return (f"Processed {summary['Files']} files ({summary['Errors']} errors, {summary['Timeouts']} timeouts), "
+            f"skipped {summary['Skipped Extractor Calls']} extractor calls.")
+
+def percentile(values, fraction):
+    """
+    Get a percentile of some values by the nearest-rank method.
+
+    Args:
+        values (list): The values, not empty.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The smallest value at or above the given fraction of the values.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def format_timing_summary(summary):
+    """
+    Describe the timings of a batch, one line per extractor and per container format.
+
+    Each line gives the 50th, 95th and 99th percentile of the extractor's wall
+    time, or of the total extraction time of files in that format.
+
+    Args:
+        summary (Counter): Batch summary from update_summary.
+
+    Returns:
+        str: The description, empty if no timings were recorded.
+    """
+    lines = []
+    for (kind, name), values in sorted(summary.get("Timing Samples", {}).items()):
+        lines.append(f"{kind} {name}: p50 {percentile(values, 0.5):.3f}s, p95 {percentile(values, 0.95):.3f}s, "
+                     f"p99 {percentile(values, 0.99):.3f}s over {len(values)} files")
+    return "\n".join(lines)
+
+def is_error_record(metadata):
+    """
+    Check whether a result is an error record from build_error_record.
+
+    Args:
+        metadata (dict or list or None): Result of processing a file.
+
+    Returns:
+        bool: True for error records.
+    """
+    return isinstance(metadata, dict) and metadata.get("Source") == "Error"
+
+def handle_file_upload(files, level, aggregate, workers=1, writer=None, summary=None, **options):
     """
     Handle the upload of audio files and extract their metadata.
 
     Args:
         files (list): List of file paths to process.
-        level (int): Processing level (1 or 2).
+        level (int): Processing level (0, 1 or 2).
         aggregate (bool): Whether to aggregate metadata from all files.
+        workers (int): Number of worker processes used for extraction.
+        writer (JsonLinesWriter, optional): Writer to stream records to instead of returning them.
+        summary (Counter, optional): Batch summary updated with every processed file.
+        **options: Additional keyword arguments for extract_metadata.
 
     Returns:
-        list: List of extracted metadata dictionaries.
+        list: List of extracted metadata dictionaries (empty when streamed to a writer).
     """
     try:
-        results = []
+        file_paths = []
         for file in files:
             try:
                 sanitized_file_path = sanitize_path(file)
                 if not is_safe_path(os.getcwd(), sanitized_file_path):
                     raise ValueError("Unsafe file path specified.")
-                if is_audio_file(sanitized_file_path):
-                    metadata = extract_metadata(sanitized_file_path, level, aggregate)
-                    if metadata:
-                        results.append(metadata)
-                else:
-                    logging.error(f"Incorrect file format: {sanitized_file_path}")
+                file_paths.append(sanitized_file_path)
             except Exception as e:
                 logging.error(f"Unexpected error processing file {file}: {e}")
-        return results
+        results = summarize_results(iter_results(file_paths, level, aggregate, workers, **options), summary)
+        return collect_results(results, writer)
     except Exception as e:
         logging.error(f"Error in handle file upload: {e}")
         return None
 
-def handle_directory(directory, level, aggregate):
+def handle_directory(directory, level, aggregate, workers=1, writer=None, summary=None, include=None, exclude=None, max_depth=None, **options):
     """
     Handle a directory of audio files and extract their metadata.
 
+    Files are processed as the directory walk finds them.
+
     Args:
         directory (str): Path to the directory to process.
-        level (int): Processing level (1 or 2).
+        level (int): Processing level (0, 1 or 2).
         aggregate (bool): Whether to aggregate metadata from all files.
+        workers (int): Number of worker processes used for extraction.
+        writer (JsonLinesWriter, optional): Writer to stream records to instead of returning them.
+        summary (Counter, optional): Batch summary updated with every processed file.
+        include (list, optional): Glob patterns of the files to process (see scan_directory).
+        exclude (list, optional): Glob patterns of the files and directories to skip.
+        max_depth (int, optional): Levels of subdirectories to descend into; no limit if None.
+        **options: Additional keyword arguments for extract_metadata.
 
     Returns:
-        list: List of extracted metadata dictionaries.
+        list: List of extracted metadata dictionaries (empty when streamed to a writer).
     """
     try:
-        sanitized_directory = sanitize_path(directory)
-        if not is_safe_path(os.getcwd(), sanitized_directory):
-            raise ValueError("Unsafe directory path specified.")
-            
-        if not os.path.isdir(sanitized_directory):
-            raise ValueError(f"Invalid directory path: {sanitized_directory}")
-            
-        results = []
-        for root, _, files in os.walk(sanitized_directory):
-            for file in files:
-                try:
-                    file_path = os.path.join(root, file)
-                    sanitized_file_path = sanitize_path(file_path)
-                    if is_audio_file(sanitized_file_path):
-                        metadata = extract_metadata(sanitized_file_path, level, aggregate)
-                        if metadata:
-                            results.append(metadata)
-                    else:
-                        logging.error(f"Incorrect file format: {sanitized_file_path}")
-                except Exception as e:
-                    logging.error(f"Unexpected error processing file {file}: {e}")
+        _, found = scan_directory(directory, include, exclude, max_depth)
+        file_paths = (file_path for file_path, _ in found)
+        results = summarize_results(iter_results(file_paths, level, aggregate, workers, **options), summary)
+        results = collect_results(results, writer)
         logging.debug(f"Files processed and results collected {len(results)}")                
         return results
     except ValueError as e:
         logging.error(f"Error in handle directory: {e}")
         return None
 
+def handle_directory_incremental(directory, level, aggregate, manifest_dir, workers=1, writer=None, summary=None, include=None, exclude=None, max_depth=None, **options):
+    """
+    Handle a directory of audio files, extracting metadata only for new or changed files.
+
+    A manifest in manifest_dir records the stat information, checksum and
+    metadata of every processed file. Files that are unchanged since the
+    previous run reuse their recorded metadata, files that disappeared are
+    dropped, and failed or timed out files are retried on the next run.
+
+    Args:
+        directory (str): Path to the directory to process.
+        level (int): Processing level (0, 1 or 2).
+        aggregate (bool): Whether to aggregate metadata from all files.
+        manifest_dir (str): Directory holding the manifest.
+        workers (int): Number of worker processes used for extraction.
+        writer (JsonLinesWriter, optional): Writer to stream records to instead of returning them.
+        summary (Counter, optional): Batch summary updated with every newly processed file.
+        include (list, optional): Glob patterns of the files to process (see scan_directory).
+        exclude (list, optional): Glob patterns of the files and directories to skip.
+        max_depth (int, optional): Levels of subdirectories to descend into; no limit if None.
+        **options: Additional keyword arguments for extract_metadata.
+
+    Returns:
+        list: List of metadata dictionaries for all files in the directory
+        (empty when streamed to a writer).
+    """
+    try:
+        sanitized_directory, found = scan_directory(directory, include, exclude, max_depth)
+        # Every file has to be compared with the manifest before the run starts
+        found = list(found)
+        file_paths = [file_path for file_path, _ in found]
+        manifest_path = get_manifest_path(manifest_dir, sanitized_directory)
+        manifest = load_manifest(manifest_path, sanitized_directory, level, aggregate,
+                                 options.get("profile", DEFAULT_PROFILE), options.get("hashes"), options.get("block_size"),
+                                 options.get("streaming", False), options.get("analysis_sr"), options.get("features"))
+        previous_files = manifest["Files"]
+
+        files = {}
+        changed = []
+        stats = {}
+        for file_path, stat in found:
+            try:
+                entry = previous_files.get(file_path)
+                if entry and is_unchanged(entry, file_path, stat):
+                    entry["Modification Time"] = stat.st_mtime_ns
+                    files[file_path] = entry
+                else:
+                    changed.append(file_path)
+                    stats[file_path] = stat
+            except Exception as e:
+                logging.error(f"Unexpected error processing file {file_path}: {e}")
+        logging.info(f"Incremental run: {len(changed)} new or changed files, {len(files)} unchanged")
+
+        def merged_results():
+            # Interleave reused and new records in directory order, so they can be streamed
+            # The checksum computed during extraction saves hashing new files again for the manifest
+            new_results = iter_file_results(changed, level, aggregate, workers, file_checksum=True, **options)
+            processed = 0
+            for file_path in file_paths:
+                if file_path in stats:
+                    _, metadata = next(new_results)
+                    metadata, checksum = take_file_checksum(metadata)
+                    if metadata:
+                        update_summary(summary, metadata)
+                    # Failed and timed out files are retried on the next run
+                    if not is_error_record(metadata) and not get_timed_out_stages(metadata):
+                        files[file_path] = build_manifest_entry(file_path, stats[file_path], metadata, checksum)
+                    processed += 1
+                    if processed % MANIFEST_SAVE_INTERVAL == 0:
+                        # Keep the progress of long runs; files not visited yet keep their old entries
+                        manifest["Files"] = dict(previous_files, **files)
+                        save_manifest(manifest_path, manifest)
+                elif file_path in files:
+                    metadata = files[file_path]["Metadata"]
+                else:
+                    continue
+                if metadata:
+                    yield metadata
+
+        results = collect_results(merged_results(), writer)
+        manifest["Files"] = files
+        save_manifest(manifest_path, manifest)
+        return results
+    except ValueError as e:
+        logging.error(f"Error in handle directory: {e}")
+        return None
+
+def scan_directory(directory, include=None, exclude=None, max_depth=None):
+    """
+    Find the audio files below a directory.
+
+    The directory is walked with os.scandir. Files with the extension of a
+    supported audio format are accepted without being opened; files with an
+    unknown extension are checked as is_audio_file checks them, and files
+    with the extension of another type (or of an audio format listed by
+    extension only, e.g. .m4a) are accepted if their first bytes are those
+    of a supported format. Files are found in name order, those of a directory before its
+    subdirectories, and are yielded as they are found, so processing can
+    start before the walk is finished. Symbolic links to directories are not
+    followed.
+
+    Glob patterns containing "/" are matched against the path relative to
+    the directory, others against the file or directory name.
+
+    Args:
+        directory (str): Path to the directory.
+        include (list, optional): Glob patterns, at least one of which files must match.
+        exclude (list, optional): Glob patterns of files and directories to skip.
+        max_depth (int, optional): Levels of subdirectories to descend into; 0 lists only
+            the directory itself, None has no limit.
+
+    Returns:
+        tuple: Sanitized directory path and a generator of (sanitized file path, os.stat_result) pairs.
+
+    Raises:
+        ValueError: If the directory path is unsafe or invalid.
+    """
+    sanitized_directory = sanitize_path(directory)
+    if not is_safe_path(os.getcwd(), sanitized_directory):
+        raise ValueError("Unsafe directory path specified.")
+
+    if not os.path.isdir(sanitized_directory):
+        raise ValueError(f"Invalid directory path: {sanitized_directory}")
+
+    return sanitized_directory, _walk_audio_files(sanitized_directory, include or [], exclude or [], max_depth)
+
+def matches_any(relative_path, patterns):
+    """
+    Check whether a path matches any of several glob patterns.
+
+    Args:
+        relative_path (str): Path relative to the walked directory, with "/" separators.
+        patterns (list): Glob patterns; those without "/" are matched against the name only.
+
+    Returns:
+        bool: True if a pattern matches.
+    """
+    name = relative_path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatchcase(relative_path if "/" in pattern else name, pattern) for pattern in patterns)
+
+def _walk_audio_files(root, include, exclude, max_depth):
+    """
+    Walk a directory depth first, yielding its audio files.
+
+    Args:
+        root (str): Sanitized path of the directory.
+        include (list): Glob patterns, at least one of which files must match if any are given.
+        exclude (list): Glob patterns of files and directories to skip.
+        max_depth (int or None): Levels of subdirectories to descend into.
+
+    Yields:
+        tuple: Sanitized file path and the stat result of its directory entry.
+    """
+    stack = [(root, "", 0)]
+    while stack:
+        directory, prefix, depth = stack.pop()
+        try:
+            with os.scandir(directory) as scanner:
+                entries = sorted(scanner, key=lambda entry: entry.name)
+        except OSError as e:
+            logging.error(f"Error reading directory {directory}: {e}")
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            relative_path = prefix + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if (max_depth is None or depth < max_depth) and not matches_any(relative_path, exclude):
+                        subdirectories.append((entry.path, relative_path + "/", depth + 1))
+                    continue
+                if not entry.is_file() or matches_any(relative_path, exclude) or (include and not matches_any(relative_path, include)):
+                    continue
+                # Entries of a resolved directory are resolved already, unless they are links
+                file_path = sanitize_path(entry.path) if entry.is_symlink() else entry.path
+                # The extension is only trusted to accept a file; other files cost one cached read of their first bytes
+                is_audio = is_audio_extension(entry.name)
+                if is_audio is None:
+                    is_audio = is_audio_file(file_path)
+                elif not is_audio:
+                    is_audio = is_audio_content(file_path)
+                if not is_audio:
+                    logging.debug(f"Skipping non-audio file {file_path}")
+                    continue
+                yield file_path, entry.stat()
+            except Exception as e:
+                logging.error(f"Unexpected error processing file {entry.path}: {e}")
+        stack.extend(reversed(subdirectories))
+
+def flatten_records(metadata):
+    """
+    List the records of batch results one dictionary per record.
+
+    Without aggregation, the result of a file is a list of dictionaries (one
+    per extractor); CSV, TSV, text and PDF output write each of them as a
+    record of its own.
+
+    Args:
+        metadata (list): Metadata dictionaries or lists of them.
+
+    Returns:
+        list: Metadata dictionaries.
+    """
+    return [record for data in metadata for record in (data if isinstance(data, list) else [data])]
+
+def get_table_headers(metadata):
+    """
+    Get the columns of a CSV/TSV table of metadata records.
+
+    Records differ in their keys (an error record has none of the metadata
+    fields), so the columns are the keys of all records, in the order they
+    are first seen.
+
+    Args:
+        metadata (list): List of metadata dictionaries, see flatten_records.
+
+    Returns:
+        list: Column names.
+    """
+    return list(dict.fromkeys(key for data in metadata for key in data))
+
 def save_metadata(metadata, output_dir, output_format):
     """
     Save the extracted metadata to a file in the specified format.
@@ -88,7 +992,7 @@ def save_metadata(metadata, output_dir, output_format):
     Args:
         metadata (list): List of metadata dictionaries to save.
         output_dir (str): Directory to save the metadata files.
-        output_format (str): Format to save the metadata in (json, csv, tsv, txt, pdf).
+        output_format (str): Format to save the metadata in (json, jsonl, csv, tsv, txt, pdf).
 
     Raises:
         ValueError: If the output directory path is unsafe.
@@ -106,19 +1010,25 @@ def save_metadata(metadata, output_dir, output_format):
             output_path = os.path.join(sanitized_output_dir, f"metadata_{timestamp}.json")
             with open(output_path, 'w') as outfile:
                 json.dump(metadata, outfile, indent=4)
+        elif output_format == "jsonl":
+            with JsonLinesWriter(sanitized_output_dir) as writer:
+                output_path = writer.output_path
+                for data in metadata:
+                    writer.write(data)
         elif output_format in ["csv", "tsv"]:
+            metadata = flatten_records(metadata)
             output_path = os.path.join(sanitized_output_dir, f"metadata_{timestamp}.{output_format}")
             delimiter = '\t' if output_format == "tsv" else ','
             with open(output_path, 'w', newline='') as outfile:
                 writer = csv.writer(outfile, delimiter=delimiter)
-                headers = metadata[0].keys()
+                headers = get_table_headers(metadata)
                 writer.writerow(headers)
                 for data in metadata:
-                    writer.writerow([data[key] for key in headers])
+                    writer.writerow([data.get(key, "") for key in headers])
         elif output_format == "txt":
             output_path = os.path.join(sanitized_output_dir, f"metadata_{timestamp}.txt")
             with open(output_path, 'w') as outfile:
-                for data in metadata:
+                for data in flatten_records(metadata):
                     for key, value in data.items():
                         if isinstance(value, dict):
                             outfile.write(f"{key}:\n")
@@ -129,10 +1039,12 @@ def save_metadata(metadata, output_dir, output_format):
                     outfile.write("\n")
         elif output_format == "pdf":
             output_path = os.path.join(sanitized_output_dir, f"metadata_{timestamp}.pdf")
+            # Only PDF output needs fpdf, so it is not imported at startup
+            from fpdf import FPDF
             pdf = FPDF()
             pdf.add_page()
             pdf.set_font("Arial", size=12)
-            for data in metadata:
+            for data in flatten_records(metadata):
                 for key, value in data.items():
                     if isinstance(value, dict):
                         pdf.cell(200, 10, txt=f"{key}:", ln=True, align='L')
@@ -154,7 +1066,7 @@ def format_metadata(metadata, format):
 
     Args:
         metadata (list): List of metadata dictionaries to format.
-        format (str): Format to convert the metadata to (json, csv, tsv, txt, pdf).
+        format (str): Format to convert the metadata to (json, jsonl, csv, tsv, txt, pdf).
 
     Returns:
         str: Formatted metadata as a string or bytes for PDF.
@@ -165,17 +1077,20 @@ def format_metadata(metadata, format):
     try:
         if format == "json":
             return json.dumps(metadata, indent=4)
+        elif format == "jsonl":
+            return "\n".join(json.dumps(data, default=str) for data in metadata)
         elif format in ["csv", "tsv"]:
             output = []
             delimiter = '\t' if format == "tsv" else ','
-            headers = metadata[0].keys()
+            metadata = flatten_records(metadata)
+            headers = get_table_headers(metadata)
             output.append(delimiter.join(headers))
             for data in metadata:
-                output.append(delimiter.join([str(data[key]) for key in headers]))
+                output.append(delimiter.join([str(data.get(key, "")) for key in headers]))
             return "\n".join(output)
         elif format == "txt":
             output = []
-            for data in metadata:
+            for data in flatten_records(metadata):
                 for key, value in data.items():
                     if isinstance(value, dict):
                         output.append(f"{key}:")
@@ -186,10 +1101,11 @@ def format_metadata(metadata, format):
                 output.append("")
             return "\n".join(output)
         elif format == "pdf":
+            from fpdf import FPDF
             pdf = FPDF()
             pdf.add_page()
             pdf.set_font("Arial", size=12)
-            for data in metadata:
+            for data in flatten_records(metadata):
                 for key, value in data.items():
                     if isinstance(value, dict):
                         pdf.cell(200, 10, txt=f"{key}:", ln=True, align='L')
@@ -0,0 +1,745 @@
+import os
+import logging
+import struct
+
+from check import sanitize_path, is_safe_path, SNIFFED_MIME_TYPES
+
+# WAV format tags whose bits-per-sample field is the real sample bit depth
+WAV_PCM_FORMATS = {
+    0x0001: "PCM",
+    0x0003: "IEEE Float",
+}
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+# AIFF-C compression types whose sample size field is the real sample bit depth
+AIFC_PCM_COMPRESSIONS = {
+    b'NONE': None,  # big-endian PCM, sample size from COMM
+    b'twos': None,  # big-endian PCM, sample size from COMM
+    b'sowt': None,  # little-endian PCM, sample size from COMM
+    b'fl32': 32,
+    b'FL32': 32,
+    b'fl64': 64,
+    b'FL64': 64,
+}
+
+# MPEG audio frame header tables, indexed by the version and layer bits of the header
+MPEG_VERSIONS = {0: "2.5", 2: "2", 3: "1"}
+MPEG_LAYERS = {1: 3, 2: 2, 3: 1}
+MPEG_BITRATES = {
+    ("1", 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    ("1", 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    ("1", 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    ("2", 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    ("2", 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    ("2", 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MPEG_SAMPLE_RATES = {
+    "1": [44100, 48000, 32000],
+    "2": [22050, 24000, 16000],
+    "2.5": [11025, 12000, 8000],
+}
+MPEG_CHANNEL_MODES = ["Stereo", "Joint Stereo", "Dual Channel", "Mono"]
+
+# Bytes searched for the first MPEG audio frame after any ID3v2 tag
+MPEG_SYNC_SEARCH_SIZE = 64 * 1024
+
+# Bytes read from the end of an Ogg file to find the last page
+OGG_TAIL_SIZE = 64 * 1024
+
+# MP4 boxes that contain the boxes needed to describe the audio track
+MP4_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+MP4_AUDIO_CODECS = {
+    b'mp4a': "AAC",
+    b'alac': "ALAC",
+    b'ac-3': "AC3",
+    b'ec-3': "EAC3",
+    b'Opus': "OPUS",
+    b'fLaC': "FLAC",
+}
+
+def skip_id3v2(f):
+    """
+    Skip an ID3v2 tag at the current position of a file, if there is one.
+
+    Args:
+        f (file): File object opened in binary mode.
+
+    Returns:
+        int: Offset of the first byte after the tag.
+    """
+    start = f.tell()
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b'ID3':
+        # Tag size is a 28-bit "syncsafe" integer, excluding the 10-byte header
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        footer = 10 if header[5] & 0x10 else 0
+        f.seek(start + 10 + size + footer)
+    else:
+        f.seek(start)
+    return f.tell()
+
+def read_ieee_extended(data):
+    """
+    Convert an 80-bit IEEE 754 extended precision number (used by AIFF) to a float.
+
+    Args:
+        data (bytes): The 10 bytes of the number.
+
+    Returns:
+        float: The decoded value.
+    """
+    exponent, mantissa = struct.unpack('>HQ', data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+def get_duration(frames, sample_rate):
+    """
+    Compute a duration in seconds from a frame count and a sample rate.
+
+    Args:
+        frames (int): Number of frames.
+        sample_rate (int or float): Sample rate in Hz.
+
+    Returns:
+        float: Duration in seconds, or None if it cannot be computed.
+    """
+    if frames is None or not sample_rate:
+        return None
+    return frames / sample_rate
+
+def read_wav_header(f):
+    """
+    Read the format and data chunks of a RIFF/WAVE file, or of its 64-bit RF64/BW64 variants.
+
+    Args:
+        f (file): File object opened in binary mode, positioned at the start of the file.
+
+    Returns:
+        dict: Parsed header fields, or None if the file is not a WAV file.
+    """
+    riff, _, fformat = struct.unpack('<4sI4s', f.read(12))
+    if riff not in (b'RIFF', b'RF64', b'BW64') or fformat != b'WAVE':
+        return None
+
+    fmt = None
+    data_size = None
+    rf64_data_size = None
+    # The fmt chunk is not necessarily the first one (e.g. JUNK or bext chunks may precede it)
+    while fmt is None or data_size is None:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_size)
+            if chunk_size & 1:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b'ds64':
+            # RF64 and BW64 store 64-bit RIFF and data sizes in the ds64 chunk
+            ds64 = f.read(chunk_size)
+            if len(ds64) >= 16:
+                rf64_data_size = struct.unpack('<Q', ds64[8:16])[0]
+        elif chunk_id == b'data':
+            data_size = rf64_data_size if chunk_size == 0xFFFFFFFF and rf64_data_size is not None else chunk_size
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+    if fmt is None or len(fmt) < 16:
+        return None
+    audio_format, channels, sample_rate, byte_rate, block_align, bits_per_sample = struct.unpack('<HHIIHH', fmt[:16])
+    valid_bits = bits_per_sample
+    if audio_format == WAV_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        # WAVE_FORMAT_EXTENSIBLE: valid bits and the real format tag (first two bytes of the subformat GUID)
+        valid_bits, _, audio_format = struct.unpack('<HIH', fmt[18:26])
+        valid_bits = valid_bits or bits_per_sample
+
+    is_pcm = audio_format in WAV_PCM_FORMATS
+    frames = data_size // block_align if data_size is not None and block_align else None
+    if not is_pcm:
+        subtype = f"0x{audio_format:04X}"
+    elif audio_format == 0x0003:
+        subtype = "DOUBLE" if bits_per_sample == 64 else "FLOAT"
+    else:
+        subtype = "PCM_U8" if bits_per_sample == 8 else f"PCM_{valid_bits}"
+
+    return {
+        "Format": "WAV",
+        "Subtype": subtype,
+        "Encoding": WAV_PCM_FORMATS.get(audio_format, f"0x{audio_format:04X}"),
+        "Audio Format": audio_format,
+        "Channels": channels,
+        "Sample Rate": sample_rate,
+        "Byte Rate": byte_rate,
+        "Block Align": block_align,
+        "Bits Per Sample": bits_per_sample,
+        "Bit Depth": valid_bits if is_pcm else None,
+        "Frames": frames,
+        "Duration": get_duration(frames, sample_rate) if is_pcm else (data_size / byte_rate if data_size and byte_rate else None),
+    }
+
+def parse_flac_streaminfo(info):
+    """
+    Parse the 34-byte FLAC STREAMINFO metadata block.
+
+    Args:
+        info (bytes): The block payload.
+
+    Returns:
+        dict: Parsed header fields.
+    """
+    min_block_size, max_block_size = struct.unpack('>HH', info[0:4])
+    # 20 bits sample rate, 3 bits channels - 1, 5 bits bits per sample - 1, 36 bits total samples
+    packed = int.from_bytes(info[10:18], byteorder='big')
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x07) + 1
+    bits_per_sample = ((packed >> 36) & 0x1F) + 1
+    total_samples = packed & 0xFFFFFFFFF
+
+    return {
+        "Format": "FLAC",
+        "Subtype": f"PCM_{bits_per_sample}",
+        "Min Block Size": min_block_size,
+        "Max Block Size": max_block_size,
+        "Min Frame Size": int.from_bytes(info[4:7], byteorder='big'),
+        "Max Frame Size": int.from_bytes(info[7:10], byteorder='big'),
+        "Channels": channels,
+        "Sample Rate": sample_rate,
+        "Bits Per Sample": bits_per_sample,
+        "Bit Depth": bits_per_sample,
+        "Total Samples": total_samples,
+        # A total of 0 means the number of samples is unknown
+        "Frames": total_samples or None,
+        "Duration": get_duration(total_samples or None, sample_rate),
+        "MD5 Signature": info[18:34].hex(),
+    }
+
+def read_flac_header(f):
+    """
+    Read the STREAMINFO block of a FLAC file.
+
+    Args:
+        f (file): File object opened in binary mode, positioned at the start of the file.
+
+    Returns:
+        dict: Parsed header fields, or None if the file is not a FLAC file.
+    """
+    skip_id3v2(f)
+    if f.read(4) != b'fLaC':
+        return None
+
+    block_header = f.read(4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        return None  # STREAMINFO must be the first metadata block
+    info = f.read(34)
+    if len(info) < 34:
+        return None
+    return parse_flac_streaminfo(info)
+
+def read_aiff_header(f):
+    """
+    Read the COMM chunk of an AIFF or AIFF-C file.
+
+    Args:
+        f (file): File object opened in binary mode, positioned at the start of the file.
+
+    Returns:
+        dict: Parsed header fields, or None if the file is not an AIFF file.
+    """
+    form, _, fformat = struct.unpack('>4sI4s', f.read(12))
+    if form != b'FORM' or fformat not in (b'AIFF', b'AIFC'):
+        return None
+
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack('>4sI', chunk_header)
+        if chunk_id == b'COMM':
+            break
+        f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+    comm = f.read(chunk_size)
+    if len(comm) < 18:
+        return None
+    channels, frames, sample_size = struct.unpack('>HIH', comm[:8])
+    sample_rate = read_ieee_extended(comm[8:18])
+
+    compression = b'NONE'
+    if fformat == b'AIFC' and len(comm) >= 22:
+        compression = comm[18:22]
+    bit_depth = None
+    if compression in AIFC_PCM_COMPRESSIONS:
+        bit_depth = AIFC_PCM_COMPRESSIONS[compression] or sample_size
+
+    if compression in (b'fl32', b'FL32'):
+        subtype = "FLOAT"
+    elif compression in (b'fl64', b'FL64'):
+        subtype = "DOUBLE"
+    elif bit_depth:
+        subtype = f"PCM_{bit_depth}"
+    else:
+        subtype = compression.decode('latin1').strip().upper()
+
+    return {
+        "Format": "AIFF" if fformat == b'AIFF' else "AIFF-C",
+        "Subtype": subtype,
+        "Compression": compression.decode('latin1'),
+        "Channels": channels,
+        "Frames": frames,
+        "Sample Rate": sample_rate,
+        "Duration": get_duration(frames, sample_rate),
+        "Bits Per Sample": sample_size,
+        "Bit Depth": bit_depth,
+    }
+
+def parse_mpeg_frame_header(header):
+    """
+    Parse a 4-byte MPEG audio frame header.
+
+    Args:
+        header (bytes): The four header bytes.
+
+    Returns:
+        dict: Parsed header fields, or None if the bytes are not a valid frame header.
+    """
+    value = struct.unpack('>I', header)[0]
+    if value >> 21 != 0x7FF:
+        return None
+    version = MPEG_VERSIONS.get((value >> 19) & 0x3)
+    layer = MPEG_LAYERS.get((value >> 17) & 0x3)
+    bitrate_index = (value >> 12) & 0xF
+    sample_rate_index = (value >> 10) & 0x3
+    if version is None or layer is None or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = MPEG_BITRATES[("1" if version == "1" else "2", layer)][bitrate_index] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    padding = (value >> 9) & 0x1
+    channel_mode = (value >> 6) & 0x3
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if layer == 2 or version == "1" else 576
+        frame_length = samples_per_frame // 8 * bitrate // sample_rate + padding
+
+    return {
+        "Version": version,
+        "Layer": layer,
+        "Bit Rate": bitrate,
+        "Sample Rate": sample_rate,
+        "Channel Mode": MPEG_CHANNEL_MODES[channel_mode],
+        "Channels": 1 if channel_mode == 3 else 2,
+        "Samples Per Frame": samples_per_frame,
+        "Frame Length": frame_length,
+    }
+
+def read_mp3_header(f):
+    """
+    Read the ID3v2 tag header and the first audio frame of an MPEG audio file.
+
+    The duration comes from a Xing/Info or VBRI header if the encoder wrote
+    one, and is estimated from the file size and bit rate otherwise.
+
+    Args:
+        f (file): File object opened in binary mode, positioned at the start of the file.
+
+    Returns:
+        dict: Parsed header fields, or None if no MPEG audio frame is found.
+    """
+    id3_version = None
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b'ID3':
+        id3_version = f"2.{header[3]}.{header[4]}"
+    f.seek(0)
+    audio_start = skip_id3v2(f)
+    data = f.read(MPEG_SYNC_SEARCH_SIZE)
+
+    frame = None
+    position = data.find(b'\xff')
+    while 0 <= position <= len(data) - 4:
+        frame = parse_mpeg_frame_header(data[position:position + 4])
+        if frame:
+            # Require the next frame to follow, to avoid false syncs inside other data
+            following = position + frame["Frame Length"]
+            if following + 4 > len(data) or parse_mpeg_frame_header(data[following:following + 4]):
+                break
+        frame = None
+        position = data.find(b'\xff', position + 1)
+    if frame is None:
+        return None
+    audio_start += position
+
+    # Xing/Info (LAME) and VBRI headers live in the first frame and give the number of frames
+    frame_count = None
+    encoding = "CBR"
+    side_info = (32 if frame["Channels"] == 2 else 17) if frame["Version"] == "1" else (17 if frame["Channels"] == 2 else 9)
+    xing_offset = position + 4 + side_info
+    tag = data[xing_offset:xing_offset + 4]
+    if tag in (b'Xing', b'Info') and len(data) >= xing_offset + 12:
+        flags = struct.unpack('>I', data[xing_offset + 4:xing_offset + 8])[0]
+        if flags & 0x1:
+            frame_count = struct.unpack('>I', data[xing_offset + 8:xing_offset + 12])[0]
+        encoding = "VBR" if tag == b'Xing' else "CBR"
+    elif data[position + 36:position + 40] == b'VBRI' and len(data) >= position + 54:
+        frame_count = struct.unpack('>I', data[position + 50:position + 54])[0]
+        encoding = "VBR"
+
+    file_size = f.seek(0, os.SEEK_END)
+    if frame_count:
+        frames = frame_count * frame["Samples Per Frame"]
+        duration = get_duration(frames, frame["Sample Rate"])
+    else:
+        audio_size = file_size - audio_start
+        if file_size >= 128:
+            f.seek(file_size - 128)
+            if f.read(3) == b'TAG':
+                audio_size -= 128  # ID3v1 tag
+        duration = audio_size * 8 / frame["Bit Rate"]
+        frames = int(duration * frame["Sample Rate"])
+
+    return {
+        "Format": "MP3" if frame["Layer"] == 3 else f"MP{frame['Layer']}",
+        "Subtype": f"MPEG_LAYER_{'I' * frame['Layer']}",
+        "MPEG Version": frame["Version"],
+        "Layer": frame["Layer"],
+        "ID3 Version": id3_version or "None",
+        "Audio Offset": audio_start,
+        "Encoding": encoding,
+        "Bit Rate": frame["Bit Rate"],
+        "Channel Mode": frame["Channel Mode"],
+        "Channels": frame["Channels"],
+        "Sample Rate": frame["Sample Rate"],
+        "Bit Depth": None,
+        "Frames": frames,
+        "Duration": duration,
+    }
+
+def read_ogg_page(f):
+    """
+    Read one Ogg page at the current position of a file.
+
+    Args:
+        f (file): File object opened in binary mode.
+
+    Returns:
+        dict: Page header fields and payload, or None if there is no valid page.
+    """
+    header = f.read(27)
+    if len(header) < 27 or header[:4] != b'OggS':
+        return None
+    version, header_type, granule_position, serial, sequence, checksum, segments = struct.unpack('<BBqIIIB', header[4:27])
+    segment_table = f.read(segments)
+    payload = f.read(sum(segment_table))
+    return {
+        "Version": version,
+        "Header Type": header_type,
+        "Granule Position": granule_position,
+        "Bitstream Serial Number": serial,
+        "Page Sequence Number": sequence,
+        "Checksum": checksum,
+        "Payload": payload,
+    }
+
+def read_last_ogg_granule(f, serial):
+    """
+    Find the granule position of the last Ogg page of a logical stream.
+
+    Args:
+        f (file): File object opened in binary mode.
+        serial (int): Bitstream serial number of the stream.
+
+    Returns:
+        int: The granule position, or None if no page of the stream is found.
+    """
+    file_size = f.seek(0, os.SEEK_END)
+    f.seek(max(0, file_size - OGG_TAIL_SIZE))
+    tail = f.read()
+    position = tail.rfind(b'OggS')
+    while position >= 0:
+        if len(tail) >= position + 18:
+            granule_position, page_serial = struct.unpack('<qI', tail[position + 6:position + 18])
+            if page_serial == serial and granule_position >= 0:
+                return granule_position
+        position = tail.rfind(b'OggS', 0, position)
+    return None
+
+def read_ogg_header(f):
+    """
+    Read the identification header of the first logical stream of an Ogg file.
+
+    Vorbis, Opus and FLAC streams are recognised. The duration comes from the
+    granule position of the last page.
+
+    Args:
+        f (file): File object opened in binary mode, positioned at the start of the file.
+
+    Returns:
+        dict: Parsed header fields, or None if the file is not an Ogg file.
+    """
+    page = read_ogg_page(f)
+    if page is None:
+        return None
+    packet = page["Payload"]
+    serial = page["Bitstream Serial Number"]
+    metadata = {
+        "Format": "OGG",
+        "Ogg Version": page["Version"],
+        "Bitstream Serial Number": serial,
+        "Bit Depth": None,
+    }
+
+    if packet[:7] == b'\x01vorbis' and len(packet) >= 28:
+        _, channels, sample_rate, bitrate_max, bitrate_nominal, bitrate_min = struct.unpack('<IBIiii', packet[7:28])
+        frames = read_last_ogg_granule(f, serial)
+        metadata.update({
+            "Subtype": "VORBIS",
+            "Channels": channels,
+            "Sample Rate": sample_rate,
+            "Bit Rate": bitrate_nominal if bitrate_nominal > 0 else None,
+            "Maximum Bit Rate": bitrate_max if bitrate_max > 0 else None,
+            "Minimum Bit Rate": bitrate_min if bitrate_min > 0 else None,
+            "Frames": frames,
+            "Duration": get_duration(frames, sample_rate),
+        })
+    elif packet[:8] == b'OpusHead' and len(packet) >= 16:
+        _, channels, pre_skip, input_sample_rate = struct.unpack('<BBHI', packet[8:16])
+        # Opus granule positions always count samples at 48 kHz
+        granule = read_last_ogg_granule(f, serial)
+        frames = max(0, granule - pre_skip) if granule is not None else None
+        metadata.update({
+            "Subtype": "OPUS",
+            "Channels": channels,
+            "Sample Rate": 48000,
+            "Input Sample Rate": input_sample_rate,
+            "Pre-skip": pre_skip,
+            "Frames": frames,
+            "Duration": get_duration(frames, 48000),
+        })
+    elif packet[:5] == b'\x7fFLAC' and len(packet) >= 51 and packet[9:13] == b'fLaC':
+        streaminfo = parse_flac_streaminfo(packet[17:51])
+        streaminfo["Format"] = "OGG"
+        if not streaminfo["Frames"]:
+            streaminfo["Frames"] = read_last_ogg_granule(f, serial)
+            streaminfo["Duration"] = get_duration(streaminfo["Frames"], streaminfo["Sample Rate"])
+        metadata.update(streaminfo)
+    else:
+        metadata["Subtype"] = "Unknown"
+    return metadata
+
+def iter_mp4_boxes(f, start, end):
+    """
+    Iterate over the boxes (atoms) of an MP4 file between two offsets.
+
+    Args:
+        f (file): File object opened in binary mode.
+        start (int): Offset of the first box.
+        end (int): Offset after the last box.
+
+    Yields:
+        tuple: Box type, payload offset and payload size.
+    """
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position  # box extends to the end of the file
+        if size < header_size:
+            return
+        yield box_type, position + header_size, size - header_size
+        position += size
+
+def read_mp4_track_handlers(f):
+    """
+    List the handler types of the tracks of an MP4 file, e.g. b'soun' for audio and b'vide' for video.
+
+    Args:
+        f (file): File object opened in binary mode.
+
+    Returns:
+        list: Handler types of the tracks in the moov box, empty if there is none (e.g. in HEIF images).
+    """
+    file_size = f.seek(0, os.SEEK_END)
+    handlers = []
+
+    def walk(start, end):
+        for box_type, payload_start, payload_size in iter_mp4_boxes(f, start, end):
+            if box_type in (b'moov', b'trak', b'mdia'):
+                walk(payload_start, payload_start + payload_size)
+            elif box_type == b'hdlr':
+                f.seek(payload_start)
+                handlers.append(f.read(min(payload_size, 12))[8:12])
+
+    walk(0, file_size)
+    return handlers
+
+def read_mp4_header(f):
+    """
+    Read the ftyp box and the first audio track of an MP4/M4A file.
+
+    Args:
+        f (file): File object opened in binary mode, positioned at the start of the file.
+
+    Returns:
+        dict: Parsed header fields, or None if the file is not an MP4 file.
+    """
+    file_size = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    box_size, box_type = struct.unpack('>I4s', f.read(8))
+    if box_type != b'ftyp' or box_size < 16:
+        return None
+    ftyp_data = f.read(box_size - 8)
+    major_brand, minor_version = struct.unpack('>4sI', ftyp_data[:8])
+    compatible_brands = [ftyp_data[i:i + 4].decode('latin1') for i in range(8, len(ftyp_data) - 3, 4)]
+
+    metadata = {
+        "Format": "MP4",
+        "Subtype": "Unknown",
+        "Major Brand": major_brand.decode('latin1'),
+        "Minor Version": minor_version,
+        "Compatible Brands": compatible_brands,
+        "Bit Depth": None,
+    }
+    track = {}
+
+    def walk(start, end):
+        # Returns True once an audio track has been described
+        for child_type, payload_start, payload_size in iter_mp4_boxes(f, start, end):
+            if child_type == b'trak':
+                track.clear()
+            if child_type in MP4_CONTAINER_BOXES:
+                if walk(payload_start, payload_start + payload_size):
+                    return True
+                if child_type == b'trak' and track.get("Handler") == b'soun':
+                    return True
+                continue
+            f.seek(payload_start)
+            if child_type == b'mvhd':
+                data = f.read(min(payload_size, 32))
+                if data[0] == 1:
+                    timescale, duration = struct.unpack('>IQ', data[20:32])
+                else:
+                    timescale, duration = struct.unpack('>II', data[12:20])
+                if timescale:
+                    metadata["Duration"] = duration / timescale
+            elif child_type == b'mdhd':
+                data = f.read(min(payload_size, 32))
+                if data[0] == 1:
+                    timescale, duration = struct.unpack('>IQ', data[20:32])
+                else:
+                    timescale, duration = struct.unpack('>II', data[12:20])
+                track["Timescale"] = timescale
+                track["Track Duration"] = duration
+            elif child_type == b'hdlr':
+                track["Handler"] = f.read(min(payload_size, 12))[8:12]
+            elif child_type == b'stsd':
+                data = f.read(min(payload_size, 8 + 8 + 28))
+                if len(data) >= 44:
+                    track["Codec"] = data[12:16]
+                    channels, sample_size = struct.unpack('>HH', data[32:36])
+                    track["Channels"] = channels
+                    track["Sample Size"] = sample_size
+                    track["Sample Rate"] = struct.unpack('>I', data[40:44])[0] >> 16
+        return False
+
+    walk(box_size, file_size)
+    if track.get("Handler") == b'soun':
+        codec = track.get("Codec", b'')
+        metadata["Format"] = "M4A" if metadata["Major Brand"].startswith("M4") else "MP4"
+        metadata["Subtype"] = MP4_AUDIO_CODECS.get(codec, codec.decode('latin1'))
+        metadata["Channels"] = track.get("Channels")
+        metadata["Sample Rate"] = track.get("Timescale") or track.get("Sample Rate")
+        if codec == b'alac':
+            metadata["Bit Depth"] = track.get("Sample Size")
+        if track.get("Timescale"):
+            metadata["Frames"] = track.get("Track Duration")
+            metadata["Duration"] = track["Track Duration"] / track["Timescale"]
+    return metadata
+
+# Header readers in the order they are tried; each rejects files of other formats
+HEADER_READERS = [
+    read_wav_header,
+    read_aiff_header,
+    read_flac_header,
+    read_ogg_header,
+    read_mp4_header,
+    read_mp3_header,
+]
+
+# Header reader of each format recognised by sniff_format; formats without one are not parsed
+HEADER_READER_FORMATS = {
+    "WAV": read_wav_header,
+    "AIFF": read_aiff_header,
+    "AIFF-C": read_aiff_header,
+    "FLAC": read_flac_header,
+    "OGG": read_ogg_header,
+    "OPUS": read_ogg_header,
+    "MP4": read_mp4_header,
+    "M4A": read_mp4_header,
+    "MP3": read_mp3_header,
+    "MP2": read_mp3_header,
+    "MP1": read_mp3_header,
+}
+
+def read_header(file_path, container=None):
+    """
+    Read the container header of an audio file with pure Python parsers.
+
+    Args:
+        file_path (str): The path to the audio file.
+        container (str, optional): Format sniffed from the file's content; its reader is tried
+            first, and a format without a reader is not parsed at all.
+
+    Returns:
+        dict: Parsed header fields, or None if no parser recognises the file or its header is truncated.
+    """
+    sanitized_file_path = sanitize_path(file_path)
+    if not is_safe_path(os.getcwd(), sanitized_file_path):
+        raise ValueError("Unsafe file path specified.")
+
+    readers = HEADER_READERS
+    if container in HEADER_READER_FORMATS:
+        preferred = HEADER_READER_FORMATS[container]
+        readers = [preferred] + [reader for reader in HEADER_READERS if reader is not preferred]
+    elif container in SNIFFED_MIME_TYPES:
+        return None
+
+    with open(sanitized_file_path, 'rb') as f:
+        for reader in readers:
+            f.seek(0)
+            try:
+                header = reader(f)
+            except (struct.error, IndexError, ValueError):
+                # Truncated or malformed headers, e.g. an empty mvhd box
+                header = None
+            if header:
+                return header
+    return None
+
+def probe_bit_depth(file_path, container=None):
+    """
+    Read the bit depth of an audio file from its container header, without decoding it.
+
+    Supports WAV (fmt chunk), FLAC (STREAMINFO), AIFF/AIFF-C (COMM chunk) and ALAC in MP4.
+
+    Args:
+        file_path (str): The path to the audio file.
+        container (str, optional): Format sniffed from the file's content.
+
+    Returns:
+        int: The bit depth in bits, or None if no header provides it.
+    """
+    try:
+        header = read_header(file_path, container)
+        return header.get("Bit Depth") if header else None
+    except Exception as e:
+        logging.error(f"Error reading header bit depth for {file_path}: {e}")
+        return None
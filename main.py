@@ -7,18 +7,24 @@ Created on Mon 2024.05
 Vilnius University Siauliai Academy
 """
 import os
+import asyncio
 import argparse
-import gradio as gr
 import logging
-from file_handler import handle_file_upload, handle_directory, save_metadata
+from collections import Counter
+from file_handler import handle_file_upload, handle_directory, handle_directory_incremental, save_metadata, format_summary, format_timing_summary, get_probe_tools, JsonLinesWriter
 from check import sanitize_path, is_safe_path
-from metadata_extractor import extract_metadata
+from metadata_extractor import extract_metadata, parse_hashes, parse_features, EXTRACTOR_PROFILES, DEFAULT_PROFILE, DEFAULT_HASH, LEVEL_2_FEATURES
+from probe import probe_files, PROBE_CONCURRENCY, PROBE_TIMEOUT
+from metrics import BatchMetrics, MetricsExporter, METRICS_INTERVAL
 from pathlib import Path
 
 # Default values for output directory, output format and processing level
 DEFAULT_OUTPUT_DIR = "./output"
 DEFAULT_OUTPUT_FORMAT = "json"
+OUTPUT_FORMATS = ["json", "jsonl", "txt", "pdf", "csv", "tsv"]
 DEFAULT_PROCESSING_LEVEL = 1
+DEFAULT_WORKERS = 1
+DEFAULT_CACHE_SIZE_MB = 512
 
 # Logging Configuration
 LOG_FILE_PATH = "application.log"
@@ -48,9 +54,30 @@ class Arguments:
         parser.add_argument("--files", nargs='+', help="Path to audio files to process")
         parser.add_argument("--directory", help="Directory containing audio files to process")
         parser.add_argument("--output", help="Output directory", default=DEFAULT_OUTPUT_DIR)
-        parser.add_argument("--level", type=int, choices=[1, 2], help="Processing level: 1 (basic), 2 (detailed)", default=DEFAULT_PROCESSING_LEVEL)
-        parser.add_argument("--format", choices=["json", "txt", "pdf", "csv", "tsv"], help="Output file format", default=DEFAULT_OUTPUT_FORMAT)
+        parser.add_argument("--level", type=int, choices=[0, 1, 2], help="Processing level: 0 (container headers only), 1 (basic), 2 (detailed)", default=DEFAULT_PROCESSING_LEVEL)
+        parser.add_argument("--format", choices=OUTPUT_FORMATS, help="Output file format (jsonl streams each record to disk as soon as it is extracted)", default=DEFAULT_OUTPUT_FORMAT)
+        parser.add_argument("--streaming", action="store_true", help="Run level 2 analysis block by block, with memory use independent of the recording's length")
+        parser.add_argument("--analysis-sr", type=int, metavar="HZ", help="Resample audio to this rate once on load for level 2 analysis, so costs are bounded and features comparable across files")
+        parser.add_argument("--features", help=f"Comma separated level 2 features to compute (default: all): {', '.join(LEVEL_2_FEATURES)}")
+        parser.add_argument("--timings", action="store_true", help="Record the time of each extraction stage under 'Timings' and print percentiles per extractor and format")
         parser.add_argument("--aggregate", action="store_true", help="Aggregate metadata from all extractors into a single dictionary")
+        parser.add_argument("--profile", choices=list(EXTRACTOR_PROFILES), help="Extractor profile: full (all applicable extractors), fast (no external tools), tags-only (tag readers only)", default=DEFAULT_PROFILE)
+        parser.add_argument("--hashes", help="Comma separated checksums to compute in one pass over each file, e.g. sha256,md5,sha1; hyphens and case are ignored, so SHA-3-256 is sha3_256", default=DEFAULT_HASH)
+        parser.add_argument("--block-digest", type=int, metavar="MB", help="Also record a Merkle-style digest of each file over blocks of this many MB")
+        parser.add_argument("--workers", type=int, help="Number of worker processes used for extraction", default=DEFAULT_WORKERS)
+        parser.add_argument("--cache", action="store_true", help="Cache extraction results in the output directory and reuse them for unchanged files")
+        parser.add_argument("--cache-size", type=int, help="Maximum size of the metadata cache in MB", default=DEFAULT_CACHE_SIZE_MB)
+        parser.add_argument("--probe-concurrency", type=int, help="Maximum number of ffprobe/MediaInfo processes running at the same time", default=PROBE_CONCURRENCY)
+        parser.add_argument("--probe-timeout", type=float, help="Seconds an ffprobe/MediaInfo process may run per file before it is killed", default=PROBE_TIMEOUT)
+        parser.add_argument("--extractor-timeout", type=float, metavar="SECONDS", help="Time budget of each extractor and of the level 2 analysis; stages over budget are listed under 'Timed Out' and abandoned, but only --file-timeout stops all work on a file")
+        parser.add_argument("--file-timeout", type=float, metavar="SECONDS", help="Time budget of each file; files over budget have their worker process killed and are reported as errors")
+        parser.add_argument("--metrics-file", metavar="PATH", help="Write live batch metrics to this file, as JSON if it ends in .json and in Prometheus text format otherwise")
+        parser.add_argument("--metrics-port", type=int, metavar="PORT", help="Serve live batch metrics on http://127.0.0.1:PORT/metrics (and /metrics.json)")
+        parser.add_argument("--metrics-interval", type=float, metavar="SECONDS", help="Seconds between refreshes of the metrics file", default=METRICS_INTERVAL)
+        parser.add_argument("--include", nargs='+', metavar="GLOB", help="Only process files of --directory matching one of these patterns, e.g. '*.wav' or 'calls/*.mp3'")
+        parser.add_argument("--exclude", nargs='+', metavar="GLOB", help="Skip files and subdirectories of --directory matching one of these patterns")
+        parser.add_argument("--max-depth", type=int, metavar="N", help="Levels of subdirectories of --directory to descend into (0: the directory only)")
+        parser.add_argument("--incremental", action="store_true", help="Only extract new or changed files of --directory and merge them with the previous run's results")
         if test_args:
             self.args = parser.parse_args(test_args)
         else:
@@ -77,22 +104,64 @@ class Arguments:
                 raise ValueError("Unsafe directory path specified.")
             if not os.path.isdir(sanitized_directory):
                 raise ValueError(f"Invalid directory path: {sanitized_directory}")
+        if self.args.workers < 1:
+            raise ValueError("Number of workers must be at least 1.")
+        if self.args.cache_size < 1:
+            raise ValueError("Cache size must be at least 1 MB.")
+        if self.args.incremental and not self.args.directory:
+            raise ValueError("Incremental mode requires --directory.")
+        if self.args.block_digest is not None and self.args.block_digest < 1:
+            raise ValueError("Block digest size must be at least 1 MB.")
+        if self.args.probe_concurrency < 1:
+            raise ValueError("Probe concurrency must be at least 1.")
+        if self.args.probe_timeout <= 0:
+            raise ValueError("Probe timeout must be positive.")
+        if self.args.analysis_sr is not None and self.args.analysis_sr < 1:
+            raise ValueError("Analysis sample rate must be at least 1 Hz.")
+        if self.args.metrics_file:
+            sanitized_metrics_file = sanitize_path(self.args.metrics_file)
+            if not is_safe_path(os.getcwd(), sanitized_metrics_file):
+                raise ValueError("Unsafe metrics file path specified.")
+        if self.args.max_depth is not None and self.args.max_depth < 0:
+            raise ValueError("Maximum depth must not be negative.")
+        if self.args.metrics_interval <= 0:
+            raise ValueError("Metrics interval must be positive.")
+        for timeout in (self.args.extractor_timeout, self.args.file_timeout):
+            if timeout is not None and timeout <= 0:
+                raise ValueError("Timeouts must be positive.")
+        self.args.hashes = parse_hashes(self.args.hashes)
+        self.args.features = parse_features(self.args.features)
 
 def gradio_interface():
     """
     Define and launch the Gradio interface for the audio metadata extraction tool.
+
+    Gradio is imported here rather than at module level, so CLI runs do not load it.
     """
-    def process_files(files, directory, output, level, format, aggregate):
+    import gradio as gr
+
+    async def process_files(files, directory, output, level, format, aggregate, workers, use_cache, profile, hashes, streaming, analysis_sr, features, timings):
         """
         Process the uploaded files or directory and extract metadata.
+
+        ffprobe and MediaInfo are awaited on the event loop, while the blocking
+        extraction runs in an executor so other requests keep being served.
     
         Args:
             file (str): Path to a single audio file.
             directory (str): Path to a directory containing audio files.
             output (str): Output directory for metadata.
-            level (int): Processing level (1 or 2).
+            level (int): Processing level (0, 1 or 2).
             format (str): Output file format.
             aggregate (bool): Whether to aggregate metadata.
+            workers (int): Number of worker processes for batch processing.
+            use_cache (bool): Whether to use the metadata cache in the output directory.
+            profile (str): Extractor profile.
+            hashes (list): Checksum algorithms to compute.
+            streaming (bool): Whether to run level 2 analysis block by block.
+            analysis_sr (int): Sample rate of level 2 analysis, 0 for each file's native rate.
+            features (list): Level 2 features to compute.
+            timings (bool): Whether to record the time of each extraction stage.
     
         Returns:
             str: Result message indicating success or failure.
@@ -103,23 +172,42 @@ def gradio_interface():
                 raise ValueError("Unsafe output directory path specified.")
     
             metadata = []
+            summary = Counter()
+            options = {"cache_dir": output_dir} if use_cache else {}
+            options["profile"] = profile or DEFAULT_PROFILE
+            options["hashes"] = parse_hashes(hashes)
+            options["streaming"] = bool(streaming)
+            if analysis_sr:
+                options["analysis_sr"] = int(analysis_sr)
+            options["features"] = parse_features(features)
+            options["timings"] = bool(timings)
+            loop = asyncio.get_running_loop()
             
             if files:
                 # Single file upload via Gradio
                 sanitized_files = [sanitize_path(files.name if hasattr(files, 'name') else files)]
-                metadata = handle_file_upload(sanitized_files, int(level), aggregate)
+                tools = get_probe_tools(int(level), options)
+                if tools:
+                    probed = await probe_files(sanitized_files, tools)
+                    options["prefetched"] = probed[sanitized_files[0]]
+                metadata = await loop.run_in_executor(None, lambda: handle_file_upload(sanitized_files, int(level), aggregate, summary=summary, **options))
             elif directory:
                 # Directory input for batch processing
                 sanitized_directory = sanitize_path(directory)
                 if not is_safe_path(os.getcwd(), sanitized_directory):
                    raise ValueError(f"Unsafe directory path specified: {sanitized_directory}")
-                metadata = handle_directory(sanitized_directory, int(level), aggregate)
+                if format == "jsonl":
+                    # Stream batch results to disk instead of collecting them in memory
+                    with JsonLinesWriter(output_dir) as writer:
+                        await loop.run_in_executor(None, lambda: handle_directory(sanitized_directory, int(level), aggregate, max(1, int(workers or 1)), writer, summary, **options))
+                    return f"Metadata saved to {output_dir} in {format} format. {format_summary(summary)}\n{format_timing_summary(summary)}".strip()
+                metadata = await loop.run_in_executor(None, lambda: handle_directory(sanitized_directory, int(level), aggregate, max(1, int(workers or 1)), summary=summary, **options))
             else:
                 return "No files or directory specified."
             
             if metadata:
                 save_metadata(metadata, output_dir, format)
-            return f"Metadata saved to {output_dir} in {format} format."
+            return f"Metadata saved to {output_dir} in {format} format. {format_summary(summary)}\n{format_timing_summary(summary)}".strip()
         except Exception as e:
             logging.error(f"Error processing files: {e}")
             return f"An error occurred: {e}"
@@ -133,12 +221,12 @@ def gradio_interface():
             single_or_batch (str): Processing type ("Single File" or "Batch Processing").
 
         Returns:
-            tuple: Updates for file and directory input visibility.
+            tuple: Updates for file, directory and workers input visibility.
         """
         if single_or_batch == "Single File":
-            return gr.update(visible=True), gr.update(visible=False, value="")
+            return gr.update(visible=True), gr.update(visible=False, value=""), gr.update(visible=False)
         else:
-            return gr.update(visible=False, value=None), gr.update(visible=True)
+            return gr.update(visible=False, value=None), gr.update(visible=True), gr.update(visible=True)
 
     with gr.Blocks() as demo:
         """
@@ -151,16 +239,24 @@ def gradio_interface():
             single_or_batch = gr.Radio(label="Processing Type", choices=["Single File", "Batch Processing"], value="Single File")
             file_input = gr.File(label="Upload Audio File", type="filepath", visible=True)
             directory_input = gr.Textbox(label="Directory Path", visible=False)
-            single_or_batch.change(show_file_upload, inputs=single_or_batch, outputs=[file_input, directory_input])
+            workers_input = gr.Number(label="Workers", value=DEFAULT_WORKERS, precision=0, minimum=1, visible=False)
+            single_or_batch.change(show_file_upload, inputs=single_or_batch, outputs=[file_input, directory_input, workers_input])
 
         output_input = gr.Textbox(label="Output Directory", value=DEFAULT_OUTPUT_DIR)
-        level_input = gr.Radio(label="Processing Level", choices=["1", "2"], value="1")
-        format_input = gr.Dropdown(label="Output Format", choices=["json", "txt", "pdf", "csv", "tsv"], value="json")
+        level_input = gr.Radio(label="Processing Level", choices=["0", "1", "2"], value="1")
+        format_input = gr.Dropdown(label="Output Format", choices=OUTPUT_FORMATS, value="json")
         aggregate_input = gr.Checkbox(label="Aggregate Metadata", value=True)
+        cache_input = gr.Checkbox(label="Use Metadata Cache", value=False)
+        profile_input = gr.Dropdown(label="Extractor Profile", choices=list(EXTRACTOR_PROFILES), value=DEFAULT_PROFILE)
+        hashes_input = gr.CheckboxGroup(label="Checksums", choices=["sha256", "md5", "sha1"], value=[DEFAULT_HASH])
+        streaming_input = gr.Checkbox(label="Streaming Level 2 Analysis (long recordings)", value=False)
+        features_input = gr.CheckboxGroup(label="Level 2 Features", choices=list(LEVEL_2_FEATURES), value=list(LEVEL_2_FEATURES))
+        analysis_sr_input = gr.Number(label="Analysis Sample Rate in Hz (0 = native)", value=0, precision=0, minimum=0)
+        timings_input = gr.Checkbox(label="Record Timings", value=False)
         start_button = gr.Button("Start")
         output = gr.Textbox(label="Output")
 
-        start_button.click(process_files, inputs=[file_input, directory_input, output_input, level_input, format_input, aggregate_input], outputs=output)
+        start_button.click(process_files, inputs=[file_input, directory_input, output_input, level_input, format_input, aggregate_input, workers_input, cache_input, profile_input, hashes_input, streaming_input, analysis_sr_input, features_input, timings_input], outputs=output)
 
     demo.launch(inbrowser=True)
 
@@ -178,17 +274,52 @@ def main(test_args=None):
             raise ValueError(f"Unsafe output directory path specified: {output_dir}")
 
         if args.files or args.directory:
-            if args.files:
-                sanitized_files = [sanitize_path(file) for file in args.files if is_safe_path(os.getcwd(), sanitize_path(file))]
-                metadata = handle_file_upload(sanitized_files, args.level, args.aggregate)
-            elif args.directory:
-                sanitized_directory = sanitize_path(args.directory)
-                if not is_safe_path(os.getcwd(), sanitized_directory):
-                    raise ValueError(f"Unsafe directory path specified: {sanitized_directory}")
-                metadata = handle_directory(sanitized_directory, args.level, args.aggregate)
+            options = {"profile": args.profile, "hashes": args.hashes, "streaming": args.streaming, "features": args.features, "timings": args.timings,
+                       "probe_concurrency": args.probe_concurrency, "probe_timeout": args.probe_timeout}
+            if args.analysis_sr:
+                options["analysis_sr"] = args.analysis_sr
+            if args.extractor_timeout:
+                options["extractor_timeout"] = args.extractor_timeout
+            if args.file_timeout:
+                options["file_timeout"] = args.file_timeout
+            if args.block_digest:
+                options["block_size"] = args.block_digest * 1024 * 1024
+            summary = Counter()
+            if args.cache:
+                options["cache_dir"] = output_dir
+                options["cache_size"] = args.cache_size * 1024 * 1024
+            exporter = None
+            if args.metrics_file or args.metrics_port is not None:
+                metrics = BatchMetrics()
+                options["metrics"] = metrics
+                exporter = MetricsExporter(metrics, args.metrics_file, args.metrics_port, args.metrics_interval)
+                exporter.start()
+            # JSON Lines output is streamed to disk record by record instead of being collected
+            writer = JsonLinesWriter(output_dir) if args.format == "jsonl" else None
+            try:
+                if args.files:
+                    sanitized_files = [sanitize_path(file) for file in args.files if is_safe_path(os.getcwd(), sanitize_path(file))]
+                    metadata = handle_file_upload(sanitized_files, args.level, args.aggregate, args.workers, writer, summary, **options)
+                elif args.directory:
+                    sanitized_directory = sanitize_path(args.directory)
+                    if not is_safe_path(os.getcwd(), sanitized_directory):
+                        raise ValueError(f"Unsafe directory path specified: {sanitized_directory}")
+                    walk_options = {"include": args.include, "exclude": args.exclude, "max_depth": args.max_depth}
+                    if args.incremental:
+                        metadata = handle_directory_incremental(sanitized_directory, args.level, args.aggregate, output_dir, args.workers, writer, summary, **walk_options, **options)
+                    else:
+                        metadata = handle_directory(sanitized_directory, args.level, args.aggregate, args.workers, writer, summary, **walk_options, **options)
+            finally:
+                if writer:
+                    writer.close()
+                if exporter:
+                    exporter.close()
 
             if metadata:
                 save_metadata(metadata, output_dir, args.format)
+            print(format_summary(summary))
+            if args.timings:
+                print(format_timing_summary(summary))
         else:
             gradio_interface()
     except Exception as e:
@@ -197,7 +328,7 @@ def main(test_args=None):
 
 if __name__ == "__main__":
     # Uncomment the following line to use manual arguments for testing
-    # test_args = ["--directory", "path/to/audio/file/directory", "--output", "./output", "--level", "2", "--format", "json", "--aggregate"]
+    # test_args = ["--directory", "path/to/audio/file/directory", "--output", "./output", "--level", "2", "--format", "json", "--aggregate", "--workers", "4"]
     # test_args = ["--files", "path/to/audio/file", "--output", "./output", "--level", "2", "--format", "json", "--aggregate"]
     test_args = None
     main(test_args)
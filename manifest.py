@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import logging
+
+from check import sanitize_path, is_safe_path
+from metadata_extractor import calculate_checksum, parse_hashes, parse_features, DEFAULT_PROFILE
+
+# Bump whenever the layout of the manifest changes, so older manifests are ignored
+MANIFEST_VERSION = 1
+
+def get_manifest_path(output_dir, directory):
+    """
+    Get the path of the manifest for a directory batch.
+
+    Each processed directory gets its own manifest in the output directory.
+
+    Args:
+        output_dir (str): Directory holding the manifests.
+        directory (str): Sanitized path of the processed directory.
+
+    Returns:
+        str: Path of the manifest file.
+
+    Raises:
+        ValueError: If the output directory path is unsafe.
+    """
+    sanitized_output_dir = sanitize_path(output_dir)
+    if not is_safe_path(os.getcwd(), sanitized_output_dir):
+        raise ValueError("Unsafe output directory path specified.")
+    directory_hash = hashlib.sha256(directory.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(sanitized_output_dir, f"manifest_{directory_hash}.json")
+
+def load_manifest(manifest_path, directory, level, aggregate, profile=DEFAULT_PROFILE, hashes=None, block_size=None, streaming=False, analysis_sr=None, features=None):
+    """
+    Load the manifest of a previous run over a directory.
+
+    A manifest written for a different directory, processing level,
+    aggregation mode, extractor profile, hash selection, block digest size,
+    level 2 analysis mode, analysis sample rate or feature selection cannot be
+    reused, so an empty one is returned instead.
+
+    Args:
+        manifest_path (str): Path of the manifest file.
+        directory (str): Sanitized path of the processed directory.
+        level (int): Processing level (0, 1 or 2).
+        aggregate (bool): Whether metadata is aggregated.
+        profile (str): Extractor profile.
+        hashes (list, optional): Additional hashing algorithms.
+        block_size (int, optional): Block size of block digests, None if there are none.
+        streaming (bool): Whether level 2 analysis is streamed block by block.
+        analysis_sr (int, optional): Sample rate of level 2 analysis, None for the native rate.
+        features (list, optional): Level 2 features, None for all of them.
+
+    Returns:
+        dict: The manifest.
+    """
+    manifest = {
+        "Version": MANIFEST_VERSION,
+        "Directory": directory,
+        "Level": int(level),
+        "Aggregate": bool(aggregate),
+        "Profile": profile,
+        "Hashes": parse_hashes(hashes),
+        "Block Size": block_size,
+        "Streaming": bool(streaming),
+        "Analysis Sample Rate": analysis_sr,
+        "Features": parse_features(features),
+        "Files": {}
+    }
+    if not os.path.isfile(manifest_path):
+        return manifest
+    try:
+        with open(manifest_path, 'r') as infile:
+            previous = json.load(infile)
+        if all(previous.get(key) == manifest[key] for key in ("Version", "Directory", "Level", "Aggregate", "Profile", "Hashes", "Block Size", "Streaming", "Analysis Sample Rate", "Features")):
+            return previous
+        logging.info(f"Manifest {manifest_path} was written with different settings, processing all files.")
+    except Exception as e:
+        logging.error(f"Error loading manifest {manifest_path}: {e}")
+    return manifest
+
+def save_manifest(manifest_path, manifest):
+    """
+    Save a manifest, replacing the previous one atomically.
+
+    Args:
+        manifest_path (str): Path of the manifest file.
+        manifest (dict): The manifest to save.
+    """
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, 'w') as outfile:
+        json.dump(manifest, outfile, default=str)
+    os.replace(temp_path, manifest_path)
+
+def is_unchanged(entry, file_path, stat):
+    """
+    Check whether a file is unchanged since it was recorded in the manifest.
+
+    Files with the same size and modification time are unchanged. Files whose
+    size is the same but whose modification time differs are compared by checksum.
+
+    Args:
+        entry (dict): Manifest entry of the file.
+        file_path (str): Sanitized path of the file.
+        stat (os.stat_result): Current stat result of the file.
+
+    Returns:
+        bool: True if the file is unchanged.
+    """
+    if entry.get("Size") != stat.st_size:
+        return False
+    if entry.get("Modification Time") == stat.st_mtime_ns:
+        return True
+    checksum = entry.get("Checksum")
+    return checksum is not None and checksum == calculate_checksum(file_path)
+
+def build_manifest_entry(file_path, stat, metadata, checksum=None):
+    """
+    Build the manifest entry of a processed file.
+
+    Args:
+        file_path (str): Sanitized path of the file.
+        stat (os.stat_result): Stat result of the file taken before processing.
+        metadata (dict or list or None): Result of processing the file.
+        checksum (str, optional): Checksum computed while processing the file; the file is hashed if None.
+
+    Returns:
+        dict: Manifest entry.
+    """
+    if checksum in (None, "Unknown") and metadata:
+        checksum = calculate_checksum(file_path)
+    return {
+        "Size": stat.st_size,
+        "Modification Time": stat.st_mtime_ns,
+        "Checksum": checksum if checksum != "Unknown" else None,
+        "Metadata": metadata
+    }
@@ -3,21 +3,117 @@ import os
 #   -> issue was triggered by imports for torch/numpy.....
 import html
 import re
-import json
-import subprocess
 import logging
 import hashlib
 from datetime import datetime
-from mutagen import File, MutagenError
-from pydub import AudioSegment
-from tinytag import TinyTag
-import eyed3
 import wave
-import librosa
-import soundfile as sf
-import shutil
-
-from check import sanitize_path, is_safe_path
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from check import sanitize_path, is_safe_path, ValidatedPath, sniff_format
+from header_parser import probe_bit_depth, read_header
+from cache import open_cache, DEFAULT_CACHE_SIZE
+from probe import run_ffprobe, run_mediainfo, open_decoder, get_process_count, PROBE_TIMEOUT
+
+# Audio and signal processing libraries (mutagen, pydub, tinytag, eyed3, librosa,
+# numpy, soundfile, soxr) are imported by the functions using them, so that
+# starting the tool and level 0 runs do not pay for loading all of them.
+
+# Bit depths implied by SoundFile subtypes
+SOUNDFILE_BIT_DEPTHS = {
+    'PCM_S8': 8,
+    'PCM_U8': 8,
+    'PCM_16': 16,
+    'PCM_24': 24,
+    'PCM_32': 32,
+    'FLOAT': 32,
+    'DOUBLE': 64,
+    'ALAC_16': 16,
+    'ALAC_20': 20,
+    'ALAC_24': 24,
+    'ALAC_32': 32,
+    'DWVW_12': 12,
+    'DWVW_16': 16,
+    'DWVW_24': 24,
+    'DPCM_8': 8,
+    'DPCM_16': 16,
+}
+
+# Lossy containers, whose samples have no bit depth unless the header gives one (e.g. ALAC in MP4, FLAC in Ogg)
+LOSSY_CONTAINERS = {"MP3", "MP2", "MP1", "AAC", "OGG", "OPUS", "M4A", "MP4", "AMR"}
+
+# Seconds of audio decoded when the bit depth has to be taken from a decoder
+BIT_DEPTH_PROBE_SECONDS = 1
+
+# Seconds of audio per block in streaming level 2 analysis
+STREAMING_BLOCK_SECONDS = 30
+
+# STFT frame and hop length of the level 2 features (librosa's defaults)
+FEATURE_FRAME_LENGTH = 2048
+FEATURE_HOP_LENGTH = 512
+
+# Level 2 features, with the section and key of their value in the metadata
+LEVEL_2_FEATURES = {
+    "rms": ("Info", "RMS Loudness"),
+    "tempo": ("Info", "Tempo"),
+    "chroma": ("Additional", "Chroma STFT"),
+    "centroid": ("Additional", "Spectral Centroid"),
+    "bandwidth": ("Additional", "Spectral Bandwidth"),
+    "contrast": ("Additional", "Spectral Contrast"),
+    "flatness": ("Additional", "Spectral Flatness"),
+    "zcr": ("Additional", "Zero Crossing Rate"),
+}
+
+# Seconds of onset envelope autocorrelated for tempo estimation (librosa's default)
+TEMPO_AC_SECONDS = 8.0
+
+# Sample rate FFmpeg decodes to for streaming analysis when the header does not give one
+DEFAULT_DECODE_SAMPLE_RATE = 44100
+
+# soxr quality used when resampling audio to the analysis sample rate
+RESAMPLE_QUALITY = "HQ"
+
+# Hashing algorithms selectable for file checksums; DEFAULT_HASH is the file's identity checksum
+SUPPORTED_HASHES = ["md5", "sha1", "sha224", "sha256", "sha384", "sha512", "sha3_256", "sha3_512", "blake2b", "blake2s"]
+DEFAULT_HASH = "sha256"
+
+# Size of each of the two buffers used when hashing files
+HASH_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Threads hashing the blocks of a block digest concurrently
+BLOCK_HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+# Extractors each profile may run; None allows every extractor
+EXTRACTOR_PROFILES = {
+    "full": None,
+    "fast": ["SoundFile", "Mutagen", "TinyTag", "Header"],  # no subprocesses
+    "tags-only": ["Mutagen", "TinyTag", "eyeD3"],
+}
+DEFAULT_PROFILE = "full"
+
+# Extractors able to read each container; containers not listed here run every extractor
+EXTRACTOR_ROUTES = {
+    "MP3": ["FFmpeg", "SoundFile", "Mutagen", "TinyTag", "eyeD3", "MediaInfo", "Header"],
+    "WAV": ["FFmpeg", "SoundFile", "Mutagen", "TinyTag", "MediaInfo", "Header"],
+    "AIFF": ["FFmpeg", "SoundFile", "Mutagen", "TinyTag", "MediaInfo", "Header"],
+    "AIFF-C": ["FFmpeg", "SoundFile", "Mutagen", "TinyTag", "MediaInfo", "Header"],
+    "FLAC": ["FFmpeg", "SoundFile", "Mutagen", "TinyTag", "MediaInfo", "Header"],
+    "OGG": ["FFmpeg", "SoundFile", "Mutagen", "TinyTag", "MediaInfo", "Header"],
+    "OPUS": ["FFmpeg", "SoundFile", "Mutagen", "TinyTag", "MediaInfo", "Header"],
+    "MP4": ["FFmpeg", "Mutagen", "TinyTag", "MediaInfo", "Header"],
+    "M4A": ["FFmpeg", "Mutagen", "TinyTag", "MediaInfo", "Header"],
+    "AAC": ["FFmpeg", "Mutagen", "MediaInfo"],
+    "WMA": ["FFmpeg", "Mutagen", "TinyTag", "MediaInfo"],
+    "AMR": ["FFmpeg", "MediaInfo"],
+}
+
+# Containers of file extensions the header parser does not recognise
+EXTENSION_CONTAINERS = {
+    ".aac": "AAC",
+    ".wma": "WMA",
+    ".amr": "AMR",
+}
 
 def sanitize_string(input_string):
     """
@@ -71,29 +167,470 @@ def sanitize_metadata(metadata):
             sanitized_metadata[key] = value  # Keep the value as is if it's not a string, dict, or list
     return sanitized_metadata
 
-def calculate_checksum(file_path, algorithm='sha256'):
+def hash_block(fd, offset, block_size, algorithm=DEFAULT_HASH):
     """
-    Calculate the checksum of a file using the specified algorithm.
+    Hash one block of an open file, read with os.pread so blocks can be hashed concurrently.
+
+    Args:
+        fd (int): File descriptor of the file.
+        offset (int): Byte offset of the block.
+        block_size (int): Size of the block in bytes; the last block of the file may be shorter.
+        algorithm (str): Hashing algorithm of the block.
+
+    Returns:
+        str: The hexadecimal digest of the block.
+    """
+    hash_func = hashlib.new(algorithm)
+    end = offset + block_size
+    while offset < end:
+        data = os.pread(fd, min(end - offset, HASH_BUFFER_SIZE), offset)
+        if not data:
+            break
+        hash_func.update(data)
+        offset += len(data)
+    return hash_func.hexdigest()
+
+def calculate_block_digest(fd, block_size, algorithm=DEFAULT_HASH):
+    """
+    Calculate the block digest of an open file, hashing its fixed-size blocks on a thread pool.
+
+    The block digests locate the regions of a file that changed, and the
+    Merkle root over them summarizes all blocks in one value.
+
+    Args:
+        fd (int): File descriptor of the file.
+        block_size (int): Size of each block in bytes.
+        algorithm (str): Hashing algorithm of the blocks and the tree.
+
+    Returns:
+        dict: Algorithm, block size, block digests and their Merkle root.
+    """
+    file_size = os.fstat(fd).st_size
+    with ThreadPoolExecutor(max_workers=BLOCK_HASH_WORKERS) as executor:
+        blocks = list(executor.map(
+            lambda offset: hash_block(fd, offset, block_size, algorithm),
+            range(0, file_size, block_size),
+        ))
+    return {
+        "Algorithm": algorithm.upper(),
+        "Block Size": block_size,
+        "Block Count": len(blocks),
+        "Merkle Root": calculate_merkle_root(blocks, algorithm),
+        "Blocks": blocks,
+    }
+
+def calculate_merkle_root(block_digests, algorithm=DEFAULT_HASH):
+    """
+    Calculate the Merkle root of a list of block digests.
+
+    Leaves are the plain block digests, so a single block can be checked with
+    any hashing tool. Inner nodes hash a 0x01 prefix followed by their two
+    children; an unpaired last node is carried up a level unchanged.
+
+    Args:
+        block_digests (list): Hexadecimal block digests in file order.
+        algorithm (str): Hashing algorithm of the tree.
+
+    Returns:
+        str: The hexadecimal root; the digest of empty input if there are no blocks.
+    """
+    if not block_digests:
+        return hashlib.new(algorithm).hexdigest()
+    level = [bytes.fromhex(block_digest) for block_digest in block_digests]
+    while len(level) > 1:
+        parents = [hashlib.new(algorithm, b'\x01' + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0].hex()
+
+def find_changed_regions(recorded, current):
+    """
+    Compare two block digests of a file and locate the regions that differ.
+
+    Args:
+        recorded (dict): Earlier block digest from calculate_block_digest.
+        current (dict): Block digest of the file now.
+
+    Returns:
+        list: (start, end) byte ranges of changed blocks, adjacent blocks merged.
+
+    Raises:
+        ValueError: If the digests use different block sizes or algorithms.
+    """
+    if (recorded["Block Size"], recorded["Algorithm"]) != (current["Block Size"], current["Algorithm"]):
+        raise ValueError("Block digests use different block sizes or algorithms")
+    if recorded["Merkle Root"] == current["Merkle Root"]:
+        return []
+    block_size = recorded["Block Size"]
+    old_blocks, new_blocks = recorded["Blocks"], current["Blocks"]
+    regions = []
+    for index in range(max(len(old_blocks), len(new_blocks))):
+        if index < len(old_blocks) and index < len(new_blocks) and old_blocks[index] == new_blocks[index]:
+            continue
+        start = index * block_size
+        if regions and regions[-1][1] == start:
+            regions[-1] = (regions[-1][0], start + block_size)
+        else:
+            regions.append((start, start + block_size))
+    return regions
+
+def calculate_digests(file_path, algorithms=(DEFAULT_HASH,), block_size=None):
+    """
+    Calculate several checksums, and optionally a block digest, of a file in a single read pass.
+
+    The file is read in large chunks into two alternating buffers. Each chunk
+    is hashed by all algorithms concurrently (hashlib releases the GIL) while
+    the next chunk is being read, so throughput is bounded by the disk or the
+    slowest algorithm rather than by their sum. The blocks of a block digest
+    are hashed meanwhile on a separate thread pool, each read with os.pread.
 
     Args:
         file_path (str): The path to the file.
-        algorithm (str): The hashing algorithm to use (default: 'sha256').
+        algorithms (list): Names of the hashing algorithms (see SUPPORTED_HASHES).
+        block_size (int, optional): Block size in bytes of a block digest; none is computed if None.
 
     Returns:
-        str: The calculated checksum as a hexadecimal string, or "Unknown" if an error occurs.
+        tuple: Hexadecimal checksum for each algorithm ("Unknown" for all of
+        them if an error occurs), and the block digest or None.
     """
     try:
         sanitized_file_path = sanitize_path(file_path)
         if not is_safe_path(os.getcwd(), sanitized_file_path):
             raise ValueError("Unsafe file path specified.")
-        hash_func = getattr(hashlib, algorithm)()
-        with open(sanitized_file_path, 'rb') as f:
-            while chunk := f.read(8192):
-                hash_func.update(chunk)
-        return hash_func.hexdigest()
+        hash_funcs = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+        updates = [hash_func.update for hash_func in hash_funcs.values()]
+        buffers = [bytearray(HASH_BUFFER_SIZE), bytearray(HASH_BUFFER_SIZE)]
+        with open(sanitized_file_path, 'rb', buffering=0) as f, ThreadPoolExecutor(max_workers=len(updates) + 1) as executor:
+            # os.pread does not move the file position, so the blocks can be read alongside the chunks
+            block_digest = executor.submit(calculate_block_digest, f.fileno(), block_size) if block_size else None
+            pending = []
+            current = 0
+            while True:
+                view = memoryview(buffers[current])
+                size = f.readinto(view)
+                # The previous chunk must be fully hashed before its buffer is read into again
+                for future in pending:
+                    future.result()
+                if not size:
+                    break
+                chunk = view[:size]
+                pending = [executor.submit(update, chunk) for update in updates]
+                current = 1 - current
+            block_digest = block_digest.result() if block_digest else None
+        checksums = {algorithm: hash_func.hexdigest() for algorithm, hash_func in hash_funcs.items()}
+        return checksums, block_digest
     except Exception as e:
         logging.error(f"Error calculating checksum for {file_path}: {e}")
-        return "Unknown"
+        return {algorithm: "Unknown" for algorithm in algorithms}, None
+
+def calculate_checksums(file_path, algorithms=(DEFAULT_HASH,)):
+    """
+    Calculate several checksums of a file in a single read pass.
+
+    Args:
+        file_path (str): The path to the file.
+        algorithms (list): Names of the hashing algorithms (see SUPPORTED_HASHES).
+
+    Returns:
+        dict: Hexadecimal checksum for each algorithm, or "Unknown" for all of them if an error occurs.
+    """
+    return calculate_digests(file_path, algorithms)[0]
+
+def calculate_checksum(file_path, algorithm=DEFAULT_HASH):
+    """
+    Calculate the checksum of a file using the specified algorithm.
+
+    Args:
+        file_path (str): The path to the file.
+        algorithm (str): The hashing algorithm to use (default: 'sha256').
+
+    Returns:
+        str: The calculated checksum as a hexadecimal string, or "Unknown" if an error occurs.
+    """
+    return calculate_checksums(file_path, [algorithm])[algorithm]
+
+def parse_hashes(hashes):
+    """
+    Parse a selection of hashing algorithms.
+
+    DEFAULT_HASH is always included first, because the file checksum used by
+    the cache and incremental runs is based on it.
+
+    Args:
+        hashes (str or list): Comma separated string or list of algorithm names.
+
+    Returns:
+        list: Normalized algorithm names without duplicates.
+
+    Raises:
+        ValueError: If an algorithm is not supported.
+    """
+    if isinstance(hashes, str):
+        hashes = hashes.split(",")
+    algorithms = [DEFAULT_HASH]
+    # Names are matched without case, hyphens and underscores, so "SHA-256" is "sha256" and "SHA-3-256" is "sha3_256"
+    supported = {name.replace("_", ""): name for name in SUPPORTED_HASHES}
+    for name in hashes or []:
+        key = re.sub(r"[-_]", "", name.strip().lower())
+        if not key:
+            continue
+        algorithm = supported.get(key)
+        if algorithm is None:
+            raise ValueError(f"Unsupported hash algorithm: {name.strip()}")
+        if algorithm not in algorithms:
+            algorithms.append(algorithm)
+    return algorithms
+
+def parse_features(features):
+    """
+    Parse a selection of level 2 features.
+
+    Args:
+        features (str or list or None): Comma separated string or list of feature names; None selects all features.
+
+    Returns:
+        list: Feature names without duplicates, in the order of LEVEL_2_FEATURES.
+
+    Raises:
+        ValueError: If a feature is unknown or none is selected.
+    """
+    if features is None:
+        return list(LEVEL_2_FEATURES)
+    if isinstance(features, str):
+        features = features.split(",")
+    selected = set()
+    for feature in features:
+        feature = feature.strip().lower()
+        if not feature:
+            continue
+        if feature not in LEVEL_2_FEATURES:
+            raise ValueError(f"Unknown level 2 feature: {feature}")
+        selected.add(feature)
+    if not selected:
+        raise ValueError("At least one level 2 feature must be selected.")
+    return [feature for feature in LEVEL_2_FEATURES if feature in selected]
+
+def get_cached_checksums(file_path, algorithms=(DEFAULT_HASH,), cache=None, block_size=None):
+    """
+    Get the checksums of a file, reusing cached values if the file is unchanged.
+
+    Args:
+        file_path (str): The path to the file.
+        algorithms (list): Algorithm names from parse_hashes, starting with DEFAULT_HASH.
+        cache (MetadataCache, optional): Metadata cache to consult.
+        block_size (int, optional): Block size in bytes of a block digest; none is computed if None.
+
+    Returns:
+        tuple: Hexadecimal checksum for each algorithm ("Unknown" where an
+        error occurs), and the block digest or None.
+    """
+    if cache is None:
+        return calculate_digests(file_path, algorithms, block_size)
+    try:
+        stat = os.stat(file_path)
+        checksum = cache.get_checksum(file_path, stat)
+        if checksum is not None:
+            checksums = {DEFAULT_HASH: checksum}
+            block_digest = None
+            if len(algorithms) > 1:
+                hit, checksums = cache.get(file_path, checksum, "Checksums")
+                if not hit or not all(algorithm in checksums for algorithm in algorithms):
+                    checksums = None
+            if checksums is not None and block_size:
+                hit, block_digest = cache.get(file_path, checksum, f"Block Digest {block_size}")
+                if not hit:
+                    checksums = None
+            if checksums is not None:
+                return {algorithm: checksums[algorithm] for algorithm in algorithms}, block_digest
+        checksums, block_digest = calculate_digests(file_path, algorithms, block_size)
+        if checksums[DEFAULT_HASH] != "Unknown":
+            cache.set_checksum(file_path, stat, checksums[DEFAULT_HASH])
+            if len(algorithms) > 1:
+                cache.put(file_path, checksums[DEFAULT_HASH], "Checksums", checksums)
+            if block_digest:
+                cache.put(file_path, checksums[DEFAULT_HASH], f"Block Digest {block_size}", block_digest)
+        return checksums, block_digest
+    except Exception as e:
+        logging.error(f"Error reading cached checksum for {file_path}: {e}")
+        return calculate_digests(file_path, algorithms, block_size)
+
+def fetch_cached(cache, file_path, checksum, section, compute):
+    """
+    Return a result from the metadata cache, computing it on a miss.
+
+    Args:
+        cache (MetadataCache or None): Metadata cache; the result is always computed if None.
+        file_path (str): The path to the file.
+        checksum (str): The checksum of the file.
+        section (str): Name of the cached result (e.g. an extractor name).
+        compute (callable): Function producing the result.
+
+    Returns:
+        The cached or freshly computed result.
+    """
+    if cache is None:
+        return compute()
+    return cache.fetch(file_path, checksum, section, compute)
+
+class StageTimings:
+    """
+    Wall times of the stages of extracting one file.
+
+    Stages measured more than once under the same name, like the features of
+    every block in streaming analysis, are summed. Stages run on several
+    threads, so the times are guarded by a lock; once closed, stages that
+    were abandoned after running out of time no longer add their times.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.closed = False
+        self.seconds = {}
+
+    def measure(self, name, compute, group=None):
+        """
+        Run a stage and add its wall time.
+
+        Args:
+            name (str): Name of the stage.
+            compute (callable): Function running the stage.
+            group (str, optional): Section the stage is listed under, e.g. "Extractors".
+
+        Returns:
+            The result of compute.
+        """
+        start = time.perf_counter()
+        try:
+            return compute()
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                if not self.closed:
+                    section = self.seconds if group is None else self.seconds.setdefault(group, {})
+                    section[name] = section.get(name, 0) + elapsed
+
+    def close(self):
+        """
+        Stop adding times, so the measured times can be reported while abandoned stages still run.
+        """
+        with self.lock:
+            self.closed = True
+
+    def to_dict(self):
+        """
+        Get the measured times in seconds, rounded to microseconds.
+
+        Returns:
+            dict: Seconds of every stage, with grouped stages in nested dictionaries.
+        """
+        with self.lock:
+            return {name: {stage: round(seconds, 6) for stage, seconds in value.items()} if isinstance(value, dict) else round(value, 6)
+                    for name, value in self.seconds.items()}
+
+def timed(timings, name, compute, group=None):
+    """
+    Run a stage, measuring its wall time if timings are recorded.
+
+    Args:
+        timings (StageTimings or None): Timings of the file; the stage is not timed if None.
+        name (str): Name of the stage.
+        compute (callable): Function running the stage.
+        group (str, optional): Section the stage is listed under.
+
+    Returns:
+        The result of compute.
+    """
+    if timings is None:
+        return compute()
+    return timings.measure(name, compute, group)
+
+def run_in_daemon_thread(function, *args):
+    """
+    Run a function on a new daemon thread.
+
+    Used for stages with a time budget: a stage that runs out of time is
+    abandoned, and a daemon thread does not keep the interpreter from
+    exiting while it finishes.
+
+    Args:
+        function (callable): Function to run.
+        *args: Arguments of the function.
+
+    Returns:
+        Future: Future of the function's result.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def check_cancelled(cancelled):
+    """
+    Stop an abandoned stage at one of its checkpoints.
+
+    Args:
+        cancelled (threading.Event or None): Set once the stage has run out of time.
+
+    Raises:
+        TimeoutError: If the stage has been cancelled.
+    """
+    if cancelled is not None and cancelled.is_set():
+        raise TimeoutError("Stage cancelled after running out of time")
+
+# Last exception caught by an extractor on each thread, see note_extractor_error
+_extractor_errors = threading.local()
+
+def note_extractor_error(error):
+    """
+    Remember the exception an extractor caught before returning None.
+
+    Extractors log their errors and return None; the extractor's caller on
+    the same thread picks the exception up with take_extractor_error to
+    report the failure by type.
+
+    Args:
+        error (Exception): The exception caught.
+    """
+    _extractor_errors.error = error
+
+def take_extractor_error():
+    """
+    Get and forget the last exception caught by an extractor on this thread.
+
+    Returns:
+        Exception: The exception, or None if no extractor failed since the last call.
+    """
+    error = getattr(_extractor_errors, "error", None)
+    _extractor_errors.error = None
+    return error
+
+def get_bytes_read():
+    """
+    Get the number of bytes this process has read so far.
+
+    Counts reads from files and pipes, including tool output, as reported by
+    Linux in /proc/self/io.
+
+    Returns:
+        int: Bytes read, or None where the count is not available.
+    """
+    try:
+        with open("/proc/self/io", 'r') as infile:
+            for line in infile:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
 
 def get_file_modification_date(file_path):
     """
@@ -155,23 +692,177 @@ def get_access_date(file_path):
         logging.error(f"Error getting access date for {file_path}: {e}")
         return "Unknown"
 
-def get_bit_depth(file_path):
+class DecodedAudio:
+    """
+    Decoded audio of a single file, shared by every consumer in one extract_metadata call.
+
+    The file is decoded on first use only, so bit depth, RMS loudness and the
+    level 2 features all work from the same decode.
+    """
+    # numpy sample types for pydub sample widths (pydub stores 24-bit audio as 32-bit)
+    SAMPLE_TYPES = {1: "int8", 2: "int16", 4: "int32"}
+
+    def __init__(self, file_path, analysis_sr=None):
+        """
+        Args:
+            file_path (str): The sanitized path to the audio file.
+            analysis_sr (int, optional): Sample rate the samples are resampled to once decoded; the native rate if None.
+        """
+        self.file_path = file_path
+        self.analysis_sr = analysis_sr
+        self._segment = None
+        self._sample_width = None
+        self._rms = None
+        self._samples = None
+        self._sample_rate = None
+
+    def _decode(self):
+        """
+        Decode the file with pydub/FFmpeg if it has not been decoded yet.
+
+        Returns:
+            AudioSegment: The decoded audio.
+        """
+        from pydub import AudioSegment
+        if self._segment is None:
+            logging.debug(f"Decoding audio: {self.file_path}")
+            self._segment = AudioSegment.from_file(self.file_path)
+            self._sample_width = self._segment.sample_width
+        return self._segment
+
+    @property
+    def bit_depth(self):
+        """int: Bit depth of the decoded samples."""
+        if self._sample_width is None:
+            self._decode()
+        return self._sample_width * 8  # sample_width is in bytes
+
+    @property
+    def rms(self):
+        """int: RMS loudness of the decoded samples, as reported by pydub."""
+        if self._rms is None:
+            self._rms = self._decode().rms
+        return self._rms
+
+    @property
+    def samples(self):
+        """
+        tuple: Mono float32 samples in [-1, 1] and their sample rate, as returned by
+        librosa.load(sr=None), resampled to analysis_sr if one is set.
+        """
+        import numpy as np
+        if self._samples is None:
+            segment = self._decode()
+            # Cache everything else derived from the segment so it can be released afterwards
+            if self._rms is None:
+                self._rms = segment.rms
+            data = np.frombuffer(segment.raw_data, dtype=self.SAMPLE_TYPES[segment.sample_width])
+            data = data.reshape(-1, segment.channels).mean(axis=1, dtype=np.float32)
+            self._samples = data / np.float32(1 << (8 * segment.sample_width - 1))
+            self._sample_rate = segment.frame_rate
+            if self.analysis_sr and self.analysis_sr != self._sample_rate:
+                import soxr
+                self._samples = soxr.resample(self._samples, self._sample_rate, self.analysis_sr, quality=RESAMPLE_QUALITY)
+                self._sample_rate = self.analysis_sr
+            self._segment = None
+        return self._samples, self._sample_rate
+
+class SharedSpectrogram:
+    """
+    Spectrograms of one signal, shared by every level 2 feature.
+
+    Each spectrogram is computed on first use, with librosa's default STFT
+    parameters, exactly as the feature functions would compute it from the
+    samples. Passing it to them therefore leaves their results unchanged.
+    """
+    def __init__(self, samples, sample_rate, center=True):
+        """
+        Args:
+            samples (np.ndarray): Mono samples.
+            sample_rate (int): Sample rate of the samples.
+            center (bool): Whether STFT frames are centered, padding the signal's ends.
+        """
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.center = center
+        self._magnitude = None
+        self._power = None
+        self._onset_envelope = None
+
+    @property
+    def magnitude(self):
+        """np.ndarray: Magnitude spectrogram, as used by the spectral_* features."""
+        import numpy as np
+        import librosa
+        if self._magnitude is None:
+            self._magnitude = np.abs(librosa.stft(self.samples, center=self.center))
+        return self._magnitude
+
+    @property
+    def power(self):
+        """np.ndarray: Power spectrogram, as used by chroma_stft and the mel spectrogram."""
+        if self._power is None:
+            self._power = self.magnitude ** 2
+        return self._power
+
+    @property
+    def onset_envelope(self):
+        """np.ndarray: Onset strength envelope from the log-power mel spectrogram, as used by tempo."""
+        import librosa
+        if self._onset_envelope is None:
+            mel = librosa.power_to_db(librosa.feature.melspectrogram(S=self.power, sr=self.sample_rate))
+            self._onset_envelope = librosa.onset.onset_strength(S=mel, sr=self.sample_rate, center=self.center)
+        return self._onset_envelope
+
+def get_bit_depth(file_path, audio=None, container=None):
     """
     Get the bit depth of an audio file.
 
+    The bit depth is read from the container header (WAV, FLAC, AIFF) or the
+    SoundFile subtype where possible. Lossy formats (LOSSY_CONTAINERS) have
+    no bit depth, so they are reported as "Unknown" without decoding them;
+    a decoder would only report the sample width it decodes to. Only when
+    neither gives an answer for another format is the file decoded: through
+    the shared decoded audio if one is given, otherwise by decoding just its
+    first BIT_DEPTH_PROBE_SECONDS seconds.
+
     Args:
         file_path (str): The path to the audio file.
+        audio (DecodedAudio, optional): Shared decoded audio of the file.
+        container (str, optional): Container format from detect_container, selecting the header parser;
+            detected from the file if None.
 
     Returns:
-        int or str: The bit depth in bits, or "Unknown" if it cannot be determined.
+        int or str: The bit depth in bits, or "Unknown" if it cannot be determined or the format is lossy.
     """
     try:
         sanitized_file_path = sanitize_path(file_path)
         if not is_safe_path(os.getcwd(), sanitized_file_path):
             raise ValueError("Unsafe file path specified.")
+
+        if container is None:
+            container = detect_container(sanitized_file_path)
+        bit_depth = probe_bit_depth(sanitized_file_path, container)
+        if bit_depth:
+            return bit_depth
+        if container in LOSSY_CONTAINERS:
+            return "Unknown"
+
+        # SoundFile and pydub are only imported when the header does not give the bit depth
+        try:
+            import soundfile as sf
+            bit_depth = SOUNDFILE_BIT_DEPTHS.get(sf.info(sanitized_file_path).subtype)
+            if bit_depth:
+                return bit_depth
+        except:
+            pass
+
         try:
-            audio = AudioSegment.from_file(sanitized_file_path)
-            return audio.sample_width * 8  # sample_width is in bytes
+            if audio is not None:
+                return audio.bit_depth
+            from pydub import AudioSegment
+            segment = AudioSegment.from_file(sanitized_file_path, duration=BIT_DEPTH_PROBE_SECONDS)
+            return segment.sample_width * 8  # sample_width is in bytes
         except:
             pass
     
@@ -204,15 +895,21 @@ def serialize_mutagen_value(value):
         return value.text
     return str(value)
 
-def extract_with_ffmpeg(file_path):
+def extract_with_ffmpeg(file_path, info=None, timeout=PROBE_TIMEOUT):
     """
     Extract metadata from an audio file using FFmpeg.
 
     Args:
         file_path (str): The path to the audio file.
+        info (dict or Exception, optional): ffprobe JSON output of the file, or the
+            error raised while probing it, e.g. from probe_files; ffprobe is run on the file if None.
+        timeout (float): Seconds ffprobe may run before it is killed.
 
     Returns:
         dict: Extracted metadata dictionary, or None if an error occurs.
+
+    Raises:
+        TimeoutError: If ffprobe timed out, so the caller can record it.
     """
     try:
         logging.debug(f"Opening file with FFmpeg: {file_path}")
@@ -220,30 +917,42 @@ def extract_with_ffmpeg(file_path):
         if not is_safe_path(os.getcwd(), sanitized_file_path):
             raise ValueError("Unsafe file path specified.")
 
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format', '-of', 'json', sanitized_file_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-        )
-        if result.returncode != 0:
-            raise Exception(result.stderr)
-        info = json.loads(result.stdout)
-        format_info = info['format']
-        metadata = {
-            "Source": "FFmpeg",
-            "Info": {
-                "Format": format_info.get('format_name', "Unknown"),
-                "Duration": float(format_info.get('duration', 0)),
-                "Size": int(format_info.get('size', 0)),
-                "Bit Rate": int(format_info.get('bit_rate', 0)),
-                "Extra Info": format_info.get('tags', {})
-            },
-            "Extra": format_info
-        }
-        return sanitize_metadata(metadata)
+        if isinstance(info, Exception):
+            raise info
+        if info is None:
+            info = run_ffprobe(sanitized_file_path, timeout)
+        return parse_ffprobe_output(info)
+    except TimeoutError:
+        raise
     except Exception as e:
         logging.error(f"FFmpeg error extracting metadata from {file_path}: {e}")
+        note_extractor_error(e)
     return None
 
+def parse_ffprobe_output(info):
+    """
+    Convert the ffprobe JSON output of one file into a metadata dictionary.
+
+    Args:
+        info (dict): ffprobe JSON output of the file.
+
+    Returns:
+        dict: Extracted metadata dictionary.
+    """
+    format_info = info['format']
+    metadata = {
+        "Source": "FFmpeg",
+        "Info": {
+            "Format": format_info.get('format_name', "Unknown"),
+            "Duration": float(format_info.get('duration', 0)),
+            "Size": int(format_info.get('size', 0)),
+            "Bit Rate": int(format_info.get('bit_rate', 0)),
+            "Extra Info": format_info.get('tags', {})
+        },
+        "Extra": format_info
+    }
+    return sanitize_metadata(metadata)
+
 def extract_with_soundfile(file_path):
     """
     Extract metadata from an audio file using SoundFile.
@@ -255,6 +964,7 @@ def extract_with_soundfile(file_path):
         dict: Extracted metadata dictionary, or None if an error occurs.
     """
     try:
+        import soundfile as sf
         logging.debug(f"Opening file with soundfile: {file_path}")
         sanitized_file_path = sanitize_path(file_path)
         if not is_safe_path(os.getcwd(), sanitized_file_path):
@@ -279,14 +989,115 @@ def extract_with_soundfile(file_path):
         return sanitize_metadata(metadata)
     except Exception as e:
         logging.error(f"SoundFile error extracting metadata from {file_path}: {e}")
+        note_extractor_error(e)
     return None
 
-def build_metadata_dict(file_path):
+def extract_with_headers(file_path, container=None):
+    """
+    Extract metadata from an audio file by parsing its container header in pure Python.
+
+    Nothing is decoded and no external tools are run, so this is the fastest
+    extractor. It supports WAV, AIFF, FLAC, Ogg (Vorbis, Opus, FLAC), MP4/M4A and MP3.
+
+    Args:
+        file_path (str): The path to the audio file.
+        container (str, optional): Format sniffed from the file's content, selecting the parser to try first.
+
+    Returns:
+        dict: Extracted metadata dictionary, or None if an error occurs.
+    """
+    try:
+        logging.debug(f"Opening file with header parser: {file_path}")
+        sanitized_file_path = sanitize_path(file_path)
+        if not is_safe_path(os.getcwd(), sanitized_file_path):
+            raise ValueError("Unsafe file path specified.")
+
+        header = read_header(sanitized_file_path, container)
+        if header is None:
+            raise ValueError("Unrecognised container header")
+        info_keys = ["Format", "Subtype", "Sample Rate", "Channels", "Duration", "Frames", "Bit Depth"]
+        metadata = {
+            "Source": "Header",
+            "Info": {key: header[key] if header.get(key) is not None else "Unknown" for key in info_keys},
+            "Extra": {key: value for key, value in header.items() if key not in info_keys}
+        }
+        return sanitize_metadata(metadata)
+    except Exception as e:
+        logging.error(f"Header parser error extracting metadata from {file_path}: {e}")
+        note_extractor_error(e)
+    return None
+
+def detect_container(file_path):
+    """
+    Detect the container format of an audio file, used to route it to the applicable extractors.
+
+    The format sniffed from the file's first bytes is used where recognised
+    (and cached, so repeated calls do not read the file again); otherwise the
+    container header is parsed, and failing that the file extension decides.
+
+    Args:
+        file_path (str): The path to the audio file.
+
+    Returns:
+        str: The container name (e.g. "MP3", "FLAC"), or "Unknown".
+    """
+    container = sniff_format(file_path)
+    if container:
+        return container
+    try:
+        header = read_header(file_path)
+        if header:
+            return header["Format"]
+    except Exception as e:
+        logging.error(f"Error detecting container of {file_path}: {e}")
+    return EXTENSION_CONTAINERS.get(os.path.splitext(file_path)[1].lower(), "Unknown")
+
+def route_extractors(extractors, container, profile=DEFAULT_PROFILE):
+    """
+    Select the extractors to run on a file.
+
+    An extractor runs if the profile allows it and it can read the container.
+
+    Args:
+        extractors (list): (name, function) pairs of all extractors, in merge order.
+        container (str): Container format from detect_container.
+        profile (str): Extractor profile, one of EXTRACTOR_PROFILES.
+
+    Returns:
+        tuple: (name, function) pairs to run and names of the skipped extractors.
+
+    Raises:
+        ValueError: If the profile is unknown.
+    """
+    if profile not in EXTRACTOR_PROFILES:
+        raise ValueError(f"Unknown extractor profile: {profile}")
+    allowed = EXTRACTOR_PROFILES[profile]
+    applicable = EXTRACTOR_ROUTES.get(container)
+
+    selected = []
+    skipped = []
+    for name, extractor in extractors:
+        if (allowed is None or name in allowed) and (applicable is None or name in applicable):
+            selected.append((name, extractor))
+        else:
+            skipped.append(name)
+    return selected, skipped
+
+def build_metadata_dict(file_path, audio=None, cache=None, detect_bit_depth=True, hashes=None, block_size=None, timings=None, container=None):
     """
     Build a base metadata dictionary for an audio file.
 
     Args:
         file_path (str): The path to the audio file.
+        audio (DecodedAudio, optional): Shared decoded audio of the file.
+        cache (MetadataCache, optional): Metadata cache for the checksum and bit depth.
+        detect_bit_depth (bool): Whether to detect the bit depth; left "Unknown" otherwise.
+        hashes (list, optional): Additional hashing algorithms; their checksums are
+            listed under "Checksums", computed in the same pass as the main checksum.
+        block_size (int, optional): Block size in bytes of a block digest, listed
+            under "Block Digest"; none is computed if None.
+        timings (StageTimings, optional): Timings the checksum time is added to.
+        container (str, optional): Container format from detect_container, used to read the bit depth.
 
     Returns:
         dict: Base metadata dictionary.
@@ -295,10 +1106,17 @@ def build_metadata_dict(file_path):
     if not is_safe_path(os.getcwd(), sanitized_file_path):
         raise ValueError("Unsafe file path specified.")
 
-    return {
+    algorithms = parse_hashes(hashes)
+    checksums, block_digest = timed(timings, "Checksum", lambda: get_cached_checksums(sanitized_file_path, algorithms, cache, block_size))
+    checksum = checksums[DEFAULT_HASH]
+    bit_depth = "Unknown"
+    if detect_bit_depth:
+        bit_depth = fetch_cached(cache, sanitized_file_path, checksum, "Bit Depth", lambda: get_bit_depth(sanitized_file_path, audio, container))
+
+    metadata = {
         "Source": "Aggregated",
         "File Name": os.path.basename(sanitized_file_path),
-        "Checksum": calculate_checksum(sanitized_file_path),
+        "Checksum": checksum,
         "Creation Date": str(get_creation_date(sanitized_file_path)),
         "Modification Date": str(get_file_modification_date(sanitized_file_path)),
         "Access Date": str(get_access_date(sanitized_file_path)),
@@ -329,66 +1147,224 @@ def build_metadata_dict(file_path):
             "Bit Rate": "Unknown",
             "Encoding": "Unknown",
             "Channels": "Unknown",
-            "Bit Depth": get_bit_depth(sanitized_file_path),
+            "Bit Depth": bit_depth,
             "File Size": os.path.getsize(sanitized_file_path),
             "Duration": "Unknown",
         },
         "Additional": {},
         "Extra": {}
     }
+    if len(algorithms) > 1:
+        metadata["Checksums"] = {algorithm.upper(): value for algorithm, value in checksums.items()}
+    if block_digest:
+        metadata["Block Digest"] = block_digest
+    return metadata
 
-def extract_metadata(file_path, level, aggregate=True):
+def extract_metadata(file_path, level, aggregate=True, cache_dir=None, cache_size=DEFAULT_CACHE_SIZE, profile=DEFAULT_PROFILE, prefetched=None, hashes=None, block_size=None, probe_timeout=PROBE_TIMEOUT, extractor_timeout=None, streaming=False, analysis_sr=None, features=None, timings=False, file_checksum=False):
     """
     Extract metadata from an audio file using multiple extractors.
 
+    Level 0 only parses the container header, without decoding the file or
+    running any external tool. Level 1 runs the extractors selected by the
+    profile that can read the file's container, and level 2 adds signal
+    analysis on top. Aggregated metadata lists the extractors that were not
+    run under "Skipped Extractors".
+
+    With an extractor_timeout, every extractor and the level 2 analysis get
+    that many seconds. ffprobe and MediaInfo processes are killed when they
+    exceed it; in-process extractors cannot be interrupted, so their threads
+    are abandoned and whatever they return later is discarded. Stages that
+    ran out of time are listed under "Timed Out".
+
+    With timings, the result gets a "Timings" section (an extra entry with
+    "Source": "Timings" if not aggregated) giving the file's container, the
+    wall time in seconds of the whole extraction, of build_metadata_dict and
+    the checksum in it, of every extractor, of level 2 analysis and of each
+    level 2 feature, and the bytes read and tool processes started meanwhile.
+    Bytes are counted for the whole process, so they include other files
+    extracted concurrently in the same process.
+
     Args:
         file_path (str): The path to the audio file.
-        level (int): Processing level (1 or 2).
+        level (int): Processing level (0, 1 or 2).
         aggregate (bool): Whether to aggregate metadata from all extractors.
+        cache_dir (str, optional): Directory of the metadata cache; no caching if None.
+        cache_size (int): Maximum size of the metadata cache in bytes.
+        profile (str): Extractor profile ("full", "fast" or "tags-only"), ignored at level 0.
+        prefetched (dict, optional): Tool output already fetched for the file (or the error
+            raised fetching it), keyed by extractor name, e.g. from probe_files.
+        hashes (list, optional): Additional hashing algorithms for the "Checksums" field.
+        block_size (int, optional): Block size in bytes of the "Block Digest" field; omitted if None.
+        probe_timeout (float): Seconds an ffprobe or MediaInfo process may run.
+        extractor_timeout (float, optional): Seconds each extractor and the level 2 analysis are waited for; unlimited if None.
+            Stages over budget are abandoned, and only stop early where they can be cancelled (see run_in_daemon_thread).
+        streaming (bool): Whether level 2 analysis reads the file block by block instead of decoding it whole.
+        analysis_sr (int, optional): Sample rate level 2 analysis resamples the audio to; the native rate if None.
+        features (list, optional): Level 2 features to compute, keys of LEVEL_2_FEATURES; all of them if None.
+        timings (bool): Whether to add a "Timings" section.
+        file_checksum (bool): Whether a non-aggregated result gets an extra entry with "Source": "File"
+            and the file's "Checksum", which aggregated results always have (e.g. for incremental runs).
 
     Returns:
         dict or list: Aggregated metadata dictionary or list of metadata dictionaries.
     """
-    sanitized_file_path = sanitize_path(file_path)
-    if not is_safe_path(os.getcwd(), sanitized_file_path):
-        raise ValueError("Unsafe file path specified.")
-        
-    base_metadata = build_metadata_dict(sanitized_file_path)
-    
+    start = time.perf_counter()
+    bytes_read = get_bytes_read()
+    process_count = get_process_count()
+    stage_timings = StageTimings() if timings else None
+
+    # Validated once here; the helpers below accept the validated path without resolving it again
+    sanitized_file_path = ValidatedPath(file_path)
+
     try:
         level = int(level)
     except ValueError:
         raise ValueError("Level must be an integer")
 
-    extractors = [
-        ("FFmpeg", extract_with_ffmpeg),
-        ("SoundFile", extract_with_soundfile),
-        ("Mutagen", extract_with_mutagen),
-        ("TinyTag", extract_with_tinytag),
-        ("eyeD3", extract_with_eyed3),
-        ("MediaInfo", extract_with_mediainfo)
-    ]
+    cache = open_cache(cache_dir, cache_size) if cache_dir else None
+    # Detected once from the file's first bytes and handed to every stage that depends on the format
+    container = detect_container(sanitized_file_path)
+    # Only level 2 decodes the whole file (unless it streams), so only then can the bit depth fall back on that decode
+    audio = DecodedAudio(sanitized_file_path, analysis_sr)
+    # Level 0 takes the bit depth from the header extractor instead of probing the file separately
+    base_metadata = timed(stage_timings, "Build Metadata Dict",
+                          lambda: build_metadata_dict(sanitized_file_path, audio if level == 2 and not streaming else None, cache, detect_bit_depth=level > 0,
+                                                      hashes=hashes, block_size=block_size, timings=stage_timings, container=container))
+    checksum = base_metadata["Checksum"]
+
+    prefetched = prefetched or {}
+    selected_features = parse_features(features)
+    if extractor_timeout is not None:
+        probe_timeout = min(probe_timeout, extractor_timeout)
+    skipped = []
+    if level == 0:
+        extractors = [("Header", lambda path: extract_with_headers(path, container))]
+    else:
+        # The header parser runs last so the established extractors keep precedence when aggregating
+        extractors = [
+            ("FFmpeg", lambda path: extract_with_ffmpeg(path, prefetched.get("FFmpeg"), probe_timeout)),
+            ("SoundFile", extract_with_soundfile),
+            ("Mutagen", extract_with_mutagen),
+            ("TinyTag", extract_with_tinytag),
+            ("eyeD3", extract_with_eyed3),
+            ("MediaInfo", lambda path: extract_with_mediainfo(path, prefetched.get("MediaInfo"), probe_timeout)),
+            ("Header", lambda path: extract_with_headers(path, container))
+        ]
+        extractors, skipped = route_extractors(extractors, container, profile)
+
+    timed_out = set()
+    # Exceptions the extractors caught, by extractor name
+    extractor_errors = {}
+    # Set once extraction stops waiting, so abandoned level 2 analysis stops at its next checkpoint
+    cancelled = threading.Event()
+
+    def run_extractor(name, extractor):
+        take_extractor_error()
+        try:
+            metadata = timed(stage_timings, name, lambda: fetch_cached(cache, sanitized_file_path, checksum, name, lambda: extractor(sanitized_file_path)), "Extractors")
+            error = take_extractor_error()
+            if metadata is None and error is not None:
+                extractor_errors[name] = {"Source": name, "Error": f"{type(error).__name__}: {error}", "Error Type": type(error).__name__}
+            return metadata
+        except TimeoutError as e:
+            logging.error(f"{name} timed out on {sanitized_file_path}: {e}")
+            timed_out.add(name)
+            return None
+
+    def run_level_2():
+        if level != 2:
+            return None
+        # Results of each analysis mode, sample rate and feature selection are cached separately
+        section = "Level 2 Streaming" if streaming else "Level 2"
+        if analysis_sr:
+            section = f"{section} {analysis_sr} Hz"
+        if selected_features != list(LEVEL_2_FEATURES):
+            section = f"{section} {','.join(selected_features)}"
+        if streaming:
+            compute = lambda: get_streaming_level_2_metadata(sanitized_file_path, analysis_sr=analysis_sr, features=selected_features, timings=stage_timings, cancelled=cancelled)
+        else:
+            compute = lambda: get_level_2_metadata(sanitized_file_path, audio, features=selected_features, timings=stage_timings, cancelled=cancelled)
+        return timed(stage_timings, "Level 2", lambda: fetch_cached(cache, sanitized_file_path, checksum, section, compute))
 
+    def wait_for(name, future, deadline):
+        try:
+            return future.result(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            logging.error(f"{name} timed out after {extractor_timeout} seconds on {sanitized_file_path}")
+            timed_out.add(name)
+            return None
+
+    if extractor_timeout is not None:
+        # Every stage runs on its own daemon thread, so stages over budget can be abandoned.
+        # Python code cannot be interrupted: FFmpeg/MediaInfo are killed by the probe
+        # timeout and level 2 analysis stops at its next checkpoint, but other
+        # extractors and a running pydub decode finish in the background.
+        # Results are merged in list order.
+        deadline = time.monotonic() + extractor_timeout
+        try:
+            futures = [run_in_daemon_thread(run_extractor, name, extractor) for name, extractor in extractors]
+            level_2_metadata = wait_for("Level 2", run_in_daemon_thread(run_level_2), deadline)
+            results = [wait_for(name, future, deadline) for (name, _), future in zip(extractors, futures)]
+        finally:
+            cancelled.set()
+    elif len(extractors) > 1:
+        # Extractors mostly wait on subprocesses and file I/O, so they run concurrently
+        # while level 2 analysis runs on this thread; results are merged in list order.
+        with ThreadPoolExecutor(max_workers=len(extractors)) as executor:
+            futures = [executor.submit(run_extractor, name, extractor) for name, extractor in extractors]
+            level_2_metadata = run_level_2()
+            results = [future.result() for future in futures]
+    else:
+        results = [run_extractor(name, extractor) for name, extractor in extractors]
+        level_2_metadata = run_level_2()
+
+    # Stages in extraction order
+    timed_out_stages = [name for name in [name for name, _ in extractors] + ["Level 2"] if name in timed_out]
+    failed_extractors = [extractor_errors[name] for name, _ in extractors if name in extractor_errors and name not in timed_out]
+    timings_metadata = None
+    if timings:
+        stage_timings.close()
+        bytes_read_after = get_bytes_read()
+        # Prefetched tool output was produced by one process for this file
+        prefetched_count = sum(1 for name, _ in extractors if prefetched.get(name) is not None)
+        timings_metadata = {
+            "Container": container,
+            "Total": round(time.perf_counter() - start, 6),
+            **stage_timings.to_dict(),
+            "Bytes Read": bytes_read_after - bytes_read if bytes_read is not None and bytes_read_after is not None else "Unknown",
+            "Subprocesses": get_process_count() - process_count + prefetched_count
+        }
     all_metadata = []
-    for name, extractor in extractors:
-        metadata = extractor(sanitized_file_path)
+    for (name, _), metadata in zip(extractors, results):
         if metadata:
             metadata["Source"] = name
             all_metadata.append(metadata)
-                 
+
     if aggregate:
+        base_metadata["Skipped Extractors"] = skipped
+        base_metadata["Timed Out"] = timed_out_stages
+        base_metadata["Extractor Errors"] = failed_extractors
         for new_metadata in all_metadata:
             merge_metadata(base_metadata, new_metadata)
-        if level == 2:
-            base_metadata = add_level_2_metadata(sanitized_file_path, base_metadata)
+        if level == 2 and level_2_metadata:
+            merge_level_2_metadata(base_metadata, level_2_metadata)
+        if timings_metadata:
+            base_metadata["Timings"] = timings_metadata
         return base_metadata
     else:
         if level == 2:
-            for md in all_metadata:
-                md = add_level_2_metadata(sanitized_file_path, md)
+            if level_2_metadata:
+                for md in all_metadata:
+                    merge_level_2_metadata(md, level_2_metadata)
+        all_metadata.extend({"Source": name, "Timed Out": True} for name in timed_out_stages)
+        all_metadata.extend(failed_extractors)
+        if file_checksum:
+            all_metadata.append({"Source": "File", "Checksum": checksum})
+        if timings_metadata:
+            all_metadata.append({"Source": "Timings", **timings_metadata})
         return all_metadata
 
-def add_level_2_metadata(file_path, metadata, enable_level_2=True):
+def add_level_2_metadata(file_path, metadata, enable_level_2=True, audio=None):
     """
     Add level 2 metadata to the base metadata dictionary.
 
@@ -396,6 +1372,7 @@ def add_level_2_metadata(file_path, metadata, enable_level_2=True):
         file_path (str): The path to the audio file.
         metadata (dict): The base metadata dictionary.
         enable_level_2 (bool): Whether to enable level 2 metadata extraction.
+        audio (DecodedAudio, optional): Shared decoded audio of the file.
 
     Returns:
         dict: Updated metadata dictionary.
@@ -404,90 +1381,317 @@ def add_level_2_metadata(file_path, metadata, enable_level_2=True):
         logging.info("Level 2 metadata extraction is temporarily disabled due to hardware/software issues.")
         return metadata
 
+    level_2_metadata = get_level_2_metadata(file_path, audio)
+    if level_2_metadata:
+        merge_level_2_metadata(metadata, level_2_metadata)
+    return metadata
+
+def merge_level_2_metadata(metadata, level_2_metadata):
+    """
+    Merge level 2 metadata into a metadata dictionary.
+
+    Args:
+        metadata (dict): The metadata dictionary to update.
+        level_2_metadata (dict): Level 2 metadata from get_level_2_metadata.
+
+    Returns:
+        None
+    """
+    try:
+        merge_metadata(metadata, level_2_metadata)
+    except Exception as e:
+        logging.error(f"Error in add_level_2_metadata: {e}")
+
+def get_level_2_metadata(file_path, audio=None, analysis_sr=None, features=None, timings=None, cancelled=None):
+    """
+    Compute level 2 (signal analysis) metadata for an audio file.
+
+    Only the selected features are computed, and the samples and the shared
+    spectrogram only when a selected feature needs them.
+
+    Args:
+        file_path (str): The path to the audio file.
+        audio (DecodedAudio, optional): Shared decoded audio of the file.
+        analysis_sr (int, optional): Sample rate to analyse at if no decoded audio is given; the native rate if None.
+            Ignored when audio is given, which is analysed at the rate it was created with.
+        features (list, optional): Names of the features to compute, keys of LEVEL_2_FEATURES; all of them if None.
+        timings (StageTimings, optional): Timings the time of each feature is added to, under "Level 2 Features".
+        cancelled (threading.Event, optional): Set when the analysis has run out of time; it then stops
+            before the next feature instead of computing the rest.
+
+    Returns:
+        dict: Level 2 metadata dictionary, or None if an error occurs.
+
+    Raises:
+        TimeoutError: If the analysis was cancelled.
+    """
     try:
         sanitized_file_path = sanitize_path(file_path)
         if not is_safe_path(os.getcwd(), sanitized_file_path):
             raise ValueError("Unsafe file path specified.")
 
-        audio_segment = AudioSegment.from_file(sanitized_file_path)
-        rms_loudness = audio_segment.rms
-        samples, sample_rate = librosa.load(sanitized_file_path, sr=None)
+        if audio is None:
+            audio = DecodedAudio(sanitized_file_path, analysis_sr)
+        features = parse_features(features)
+        level_2_metadata = {"Info": {}, "Additional": {}}
+
+        if "rms" in features:
+            level_2_metadata["Info"]["RMS Loudness"] = timed(timings, "rms", lambda: audio.rms, "Level 2 Features")
+        if features == ["rms"]:
+            # pydub measures the loudness, the samples are not needed
+            return level_2_metadata
+
+        # Only the spectral and rhythm features need librosa, so an rms-only run does not import it
+        import librosa
+        samples, sample_rate = audio.samples
+        check_cancelled(cancelled)
+        # One STFT for every spectral feature instead of one per feature, computed only if one is selected
+        spectrogram = SharedSpectrogram(samples, sample_rate)
+
+        def add_feature(feature, calculate):
+            if feature not in features:
+                return
+            check_cancelled(cancelled)
+            section, key = LEVEL_2_FEATURES[feature]
+            try:
+                # Intermediate results shared between features count towards the first feature needing them
+                value = timed(timings, feature, calculate, "Level 2 Features")
+            except Exception as e:
+                logging.error(f"Error calculating {key}: {e}")
+                value = "Unknown"
+            level_2_metadata[section][key] = value
+
+        add_feature("tempo", lambda: librosa.beat.tempo(onset_envelope=spectrogram.onset_envelope, sr=sample_rate)[0])
+        add_feature("chroma", lambda: librosa.feature.chroma_stft(S=spectrogram.power, sr=sample_rate).mean(axis=1).tolist())
+        add_feature("centroid", lambda: librosa.feature.spectral_centroid(S=spectrogram.magnitude, sr=sample_rate).mean().tolist())
+        add_feature("bandwidth", lambda: librosa.feature.spectral_bandwidth(S=spectrogram.magnitude, sr=sample_rate).mean().tolist())
+        add_feature("contrast", lambda: librosa.feature.spectral_contrast(S=spectrogram.magnitude, sr=sample_rate).mean(axis=1).tolist())
+        add_feature("flatness", lambda: librosa.feature.spectral_flatness(S=spectrogram.magnitude).mean().tolist())
+        add_feature("zcr", lambda: librosa.feature.zero_crossing_rate(y=samples).mean().tolist())
+        level_2_metadata["Additional"]["Analysis Sample Rate"] = sample_rate
+
+        return level_2_metadata
         
-        try:
-            tempo = librosa.beat.tempo(y=samples, sr=sample_rate)[0]
-        except Exception as e:
-            logging.error(f"Error calculating tempo: {e}")
-            tempo = "Unknown"
+    except TimeoutError:
+        # Cancelled, which is not a result to cache
+        raise
+    except Exception as e:
+        logging.error(f"Error in add_level_2_metadata: {e}")
+        # logging.info("Level 2 metadata extraction is temporarily disabled due to hardware/software issues.")
+        return None
 
-        try:
-            chroma_stft = librosa.feature.chroma_stft(y=samples, sr=sample_rate)
-            chroma_stft_mean = chroma_stft.mean(axis=1).tolist()
-        except Exception as e:
-            logging.error(f"Error calculating chroma_stft: {e}")
-            chroma_stft_mean = "Unknown"
+def open_audio_chunks(file_path, chunk_seconds=STREAMING_BLOCK_SECONDS):
+    """
+    Open an audio file for reading in consecutive chunks of bounded size.
 
-        try:
-            spectral_centroid = librosa.feature.spectral_centroid(y=samples, sr=sample_rate)
-            spectral_centroid_mean = spectral_centroid.mean().tolist()
-        except Exception as e:
-            logging.error(f"Error calculating spectral_centroid: {e}")
-            spectral_centroid_mean = "Unknown"
+    SoundFile reads the file where it can, anything else is decoded through
+    an FFmpeg pipe.
 
-        try:
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=samples, sr=sample_rate)
-            spectral_bandwidth_mean = spectral_bandwidth.mean().tolist()
-        except Exception as e:
-            logging.error(f"Error calculating spectral_bandwidth: {e}")
-            spectral_bandwidth_mean = "Unknown"
+    Args:
+        file_path (str): The sanitized path to the audio file.
+        chunk_seconds (float): Approximate length of each chunk in seconds.
 
-        try:
-            spectral_contrast = librosa.feature.spectral_contrast(y=samples, sr=sample_rate)
-            spectral_contrast_mean = spectral_contrast.mean(axis=1).tolist()
-        except Exception as e:
-            logging.error(f"Error calculating spectral_contrast: {e}")
-            spectral_contrast_mean = "Unknown"
+    Returns:
+        tuple: Sample rate, bit depth of the source samples (or None if unknown)
+        and a generator of float32 chunks shaped (frames, channels).
+    """
+    import numpy as np
+    import soundfile as sf
+    try:
+        info = sf.info(file_path)
+        sample_rate, channels, bit_depth = info.samplerate, info.channels, SOUNDFILE_BIT_DEPTHS.get(info.subtype)
+
+        def read_chunks(chunk_frames):
+            with sf.SoundFile(file_path) as f:
+                while True:
+                    chunk = f.read(chunk_frames, dtype='float32', always_2d=True)
+                    if not len(chunk):
+                        return
+                    yield chunk
+    except Exception as e:
+        logging.debug(f"SoundFile cannot read {file_path}, decoding it with FFmpeg: {e}")
+        header = read_header(file_path, sniff_format(file_path)) or {}
+        sample_rate = header.get("Sample Rate") or DEFAULT_DECODE_SAMPLE_RATE
+        channels = header.get("Channels") or 1
+        bit_depth = header.get("Bit Depth")
+
+        def read_chunks(chunk_frames):
+            process = open_decoder(file_path, sample_rate, channels)
+            frame_bytes = 4 * channels
+            try:
+                while True:
+                    data = process.stdout.read(chunk_frames * frame_bytes)
+                    if len(data) < frame_bytes:
+                        return
+                    data = data[:len(data) - len(data) % frame_bytes]
+                    yield np.frombuffer(data, dtype=np.float32).reshape(-1, channels)
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+                process.stdout.close()
+
+    return sample_rate, bit_depth, read_chunks(max(1, int(chunk_seconds * sample_rate)))
+
+def iter_frame_blocks(chunks, block_seconds, sample_rate):
+    """
+    Regroup mono chunks of any length into overlapping blocks for frame-wise analysis.
 
-        try:
-            spectral_flatness = librosa.feature.spectral_flatness(y=samples)
-            spectral_flatness_mean = spectral_flatness.mean().tolist()
-        except Exception as e:
-            logging.error(f"Error calculating spectral_flatness: {e}")
-            spectral_flatness_mean = "Unknown"
+    Consecutive blocks overlap by FEATURE_FRAME_LENGTH - FEATURE_HOP_LENGTH
+    samples and start a whole number of hops apart, so uncentered STFT frames
+    computed block by block tile the signal exactly like frames computed over
+    the whole signal.
 
-        try:
-            zero_crossing_rate = librosa.feature.zero_crossing_rate(y=samples)
-            zero_crossing_rate_mean = zero_crossing_rate.mean().tolist()
-        except Exception as e:
-            logging.error(f"Error calculating zero_crossing_rate: {e}")
-            zero_crossing_rate_mean = "Unknown"
+    Args:
+        chunks (iterable): Mono float32 chunks.
+        block_seconds (float): Approximate length of each block in seconds.
+        sample_rate (int): Sample rate of the chunks.
 
-        level_2_metadata = {
-            "Info": {
-                "RMS Loudness": rms_loudness,
-                "Tempo": tempo,
-            },
-            "Additional": {
-                "Chroma STFT": chroma_stft_mean,
-                "Spectral Centroid": spectral_centroid_mean,
-                "Spectral Bandwidth": spectral_bandwidth_mean,
-                "Spectral Contrast": spectral_contrast_mean,
-                "Spectral Flatness": spectral_flatness_mean,
-                "Zero Crossing Rate": zero_crossing_rate_mean,
-            }
-        }
+    Yields:
+        np.ndarray: Blocks of at least FEATURE_FRAME_LENGTH samples.
+    """
+    import numpy as np
+    overlap = FEATURE_FRAME_LENGTH - FEATURE_HOP_LENGTH
+    step = max(1, int(block_seconds * sample_rate) // FEATURE_HOP_LENGTH) * FEATURE_HOP_LENGTH
+    buffer = np.zeros(0, dtype=np.float32)
+    for chunk in chunks:
+        buffer = np.concatenate([buffer, chunk])
+        while len(buffer) >= step + overlap:
+            yield buffer[:step + overlap]
+            buffer = buffer[step:]
+    if len(buffer) >= FEATURE_FRAME_LENGTH:
+        yield buffer
+
+def get_streaming_level_2_metadata(file_path, block_seconds=STREAMING_BLOCK_SECONDS, analysis_sr=None, features=None, timings=None,
+                                   cancelled=None):
+    """
+    Compute level 2 metadata block by block, with memory use independent of the file's length.
 
-        merge_metadata(metadata, level_2_metadata)
-        return metadata
-        
-    except Exception as e:
-        logging.error(f"Error in add_level_2_metadata: {e}")
-        # logging.info("Level 2 metadata extraction is temporarily disabled due to hardware/software issues.")
-        return metadata
-        
+    Every feature is averaged over all STFT frames of the file through running
+    sums, and the tempo is estimated from the mean tempogram. Frames are not
+    centered and the dB scale and chroma tuning are set per block, so values
+    can differ slightly from get_level_2_metadata.
+
+    Args:
+        file_path (str): The path to the audio file.
+        block_seconds (float): Approximate length of each block in seconds.
+        analysis_sr (int, optional): Sample rate the audio is resampled to; the native rate if None.
+        features (list, optional): Names of the features to compute, keys of LEVEL_2_FEATURES; all of them if None.
+        timings (StageTimings, optional): Timings the time of each feature, summed over all blocks, is added to.
+        cancelled (threading.Event, optional): Set when the analysis has run out of time; it then stops
+            before the next chunk, killing its FFmpeg decoder.
+
+    Returns:
+        dict: Level 2 metadata dictionary, or None if an error occurs.
+
+    Raises:
+        TimeoutError: If the analysis was cancelled.
+    """
+    chunks = None
+    try:
+        import numpy as np
+        sanitized_file_path = sanitize_path(file_path)
+        if not is_safe_path(os.getcwd(), sanitized_file_path):
+            raise ValueError("Unsafe file path specified.")
+
+        features = parse_features(features)
+        native_sample_rate, bit_depth, chunks = open_audio_chunks(sanitized_file_path, block_seconds)
+        sample_rate = analysis_sr or native_sample_rate
+        sums = {}
+        frame_counts = {}
+        failed = set()
+        # The RMS loudness is measured on the native samples of all channels, like pydub does
+        rms_sums = {"Squares": 0.0, "Samples": 0}
+
+        def mono_chunks():
+            resampler = None
+            if sample_rate != native_sample_rate:
+                import soxr
+                resampler = soxr.ResampleStream(native_sample_rate, sample_rate, 1, dtype='float32', quality=RESAMPLE_QUALITY)
+            for chunk in chunks:
+                check_cancelled(cancelled)
+                rms_sums["Squares"] += float(np.square(chunk, dtype=np.float64).sum())
+                rms_sums["Samples"] += chunk.size
+                samples = chunk.mean(axis=1, dtype=np.float32)
+                yield samples if resampler is None else resampler.resample_chunk(samples)
+            if resampler is not None:
+                yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+        def accumulate(feature, compute):
+            if feature not in features or feature in failed:
+                return
+            try:
+                values = timed(timings, feature, compute, "Level 2 Features")
+            except Exception as e:
+                logging.error(f"Error calculating {LEVEL_2_FEATURES[feature][1]}: {e}")
+                failed.add(feature)
+                return
+            sums[feature] = sums.get(feature, 0) + values.sum(axis=-1)
+            frame_counts[feature] = frame_counts.get(feature, 0) + values.shape[-1]
+
+        if features == ["rms"]:
+            # Only the loudness is needed, so the chunks are read but not analysed
+            for _ in mono_chunks():
+                pass
+        else:
+            # Only the spectral and rhythm features need librosa, so an rms-only run does not import it
+            import librosa
+            # The tempogram window librosa.beat.tempo would use for the whole file
+            tempogram_length = librosa.time_to_frames(TEMPO_AC_SECONDS, sr=sample_rate, hop_length=FEATURE_HOP_LENGTH).item()
+            for samples in iter_frame_blocks(mono_chunks(), block_seconds, sample_rate):
+                spectrogram = SharedSpectrogram(samples, sample_rate, center=False)
+                # The tempo is estimated from the mean tempogram once all blocks are read
+                accumulate("tempo", lambda: librosa.feature.tempogram(onset_envelope=spectrogram.onset_envelope, sr=sample_rate,
+                                                                      win_length=tempogram_length))
+                accumulate("chroma", lambda: librosa.feature.chroma_stft(S=spectrogram.power, sr=sample_rate))
+                accumulate("centroid", lambda: librosa.feature.spectral_centroid(S=spectrogram.magnitude, sr=sample_rate))
+                accumulate("bandwidth", lambda: librosa.feature.spectral_bandwidth(S=spectrogram.magnitude, sr=sample_rate))
+                accumulate("contrast", lambda: librosa.feature.spectral_contrast(S=spectrogram.magnitude, sr=sample_rate))
+                accumulate("flatness", lambda: librosa.feature.spectral_flatness(S=spectrogram.magnitude))
+                accumulate("zcr", lambda: librosa.feature.zero_crossing_rate(samples, center=False))
+
+        def mean(feature):
+            if feature in failed or not frame_counts.get(feature):
+                return "Unknown"
+            value = sums[feature] / frame_counts[feature]
+            return value.tolist() if value.size > 1 else value.item()
+
+        level_2_metadata = {"Info": {}, "Additional": {}}
+        for feature in features:
+            section, key = LEVEL_2_FEATURES[feature]
+            level_2_metadata[section][key] = mean(feature)
+
+        if "tempo" in features and frame_counts.get("tempo"):
+            try:
+                tempogram = (sums["tempo"] / frame_counts["tempo"])[:, np.newaxis]
+                level_2_metadata["Info"]["Tempo"] = librosa.beat.tempo(tg=tempogram, sr=sample_rate)[0]
+            except Exception as e:
+                logging.error(f"Error calculating Tempo: {e}")
+                level_2_metadata["Info"]["Tempo"] = "Unknown"
+
+        if "rms" in features:
+            # Same scale as pydub, which widens 24-bit samples to 32 bits
+            sample_width = 1 if bit_depth and bit_depth <= 8 else 2 if not bit_depth or bit_depth <= 16 else 4
+            rms_loudness = "Unknown"
+            if rms_sums["Samples"]:
+                rms_loudness = int(np.sqrt(rms_sums["Squares"] / rms_sums["Samples"]) * (1 << (8 * sample_width - 1)))
+            level_2_metadata["Info"]["RMS Loudness"] = rms_loudness
+
+        if features != ["rms"]:
+            level_2_metadata["Additional"]["Analysis Sample Rate"] = sample_rate
+        level_2_metadata["Additional"]["Analysis Mode"] = "Streaming"
+        return level_2_metadata
+
+    except TimeoutError:
+        # Cancelled, which is not a result to cache
+        raise
     except Exception as e:
-        logging.error(f"Error in add_level_2_metadata: {e}")
-        # logging.info("Level 2 metadata extraction is temporarily disabled due to hardware/software issues.")
-        return metadata
+        logging.error(f"Error in streaming level 2 analysis: {e}")
+        return None
+    finally:
+        # Stops the FFmpeg decoder if the chunks were not all read
+        if chunks is not None:
+            chunks.close()
 
 def merge_metadata(base, new):
     """
@@ -509,7 +1713,11 @@ def merge_metadata(base, new):
             if base.get(key, "Unknown") == "Unknown" and value != "Unknown":
                 base[key] = value
             elif key not in base:
-                base["Extra"][key] = value
+                # Nested sections such as "Additional" have no "Extra" of their own
+                if "Extra" in base:
+                    base["Extra"][key] = value
+                else:
+                    base[key] = value
 
 def extract_with_mutagen(file_path):
     """
@@ -522,6 +1730,7 @@ def extract_with_mutagen(file_path):
         dict: Extracted metadata dictionary, or None if an error occurs.
     """
     try:
+        from mutagen import File, MutagenError
         logging.debug(f"Opening file with Mutagen: {file_path}")
         sanitized_file_path = sanitize_path(file_path)
         if not is_safe_path(os.getcwd(), sanitized_file_path):
@@ -567,10 +1776,16 @@ def extract_with_mutagen(file_path):
             "Extra": serialize_mutagen_value(audio.info.pprint())
         }
         return sanitize_metadata(metadata)
+    except ImportError as e:
+        # Caught first, as MutagenError is not defined when Mutagen cannot be imported
+        logging.error(f"Mutagen is not available to extract metadata from {file_path}: {e}")
+        note_extractor_error(e)
     except MutagenError as e:
         logging.error(f"MutagenError extracting metadata from {file_path}: {e}")
+        note_extractor_error(e)
     except Exception as e:
         logging.error(f"Error extracting metadata from {file_path} with Mutagen: {e}")
+        note_extractor_error(e)
 
     return None
 
@@ -585,6 +1800,7 @@ def extract_with_tinytag(file_path):
         dict: Extracted metadata dictionary, or None if an error occurs.
     """
     try:
+        from tinytag import TinyTag
         logging.debug(f"Opening file with TinyTag: {file_path}")
         sanitized_file_path = sanitize_path(file_path)
         if not is_safe_path(os.getcwd(), sanitized_file_path):
@@ -611,6 +1827,7 @@ def extract_with_tinytag(file_path):
         return sanitize_metadata(metadata)
     except Exception as e:
         logging.error(f"TinyTag error extracting metadata from {file_path}: {e}")
+        note_extractor_error(e)
     return None
 
 def extract_with_eyed3(file_path):
@@ -624,6 +1841,7 @@ def extract_with_eyed3(file_path):
         dict: Extracted metadata dictionary, or None if an error occurs.
     """
     try:
+        import eyed3
         logging.debug(f"Opening file with eyeD3: {file_path}")
         sanitized_file_path = sanitize_path(file_path)
         if not is_safe_path(os.getcwd(), sanitized_file_path):
@@ -666,17 +1884,24 @@ def extract_with_eyed3(file_path):
         return sanitize_metadata(metadata)
     except Exception as e:
         logging.error(f"eyeD3 error extracting metadata from {file_path}: {e}")
+        note_extractor_error(e)
     return None
 
-def extract_with_mediainfo(file_path):
+def extract_with_mediainfo(file_path, info=None, timeout=PROBE_TIMEOUT):
     """
     Extract metadata from an audio file using MediaInfo.
 
     Args:
         file_path (str): The path to the audio file.
+        info (dict or Exception, optional): MediaInfo JSON output of the file, or the
+            error raised while probing it, e.g. from a batched run; MediaInfo is run on the file if None.
+        timeout (float): Seconds MediaInfo may run before it is killed.
 
     Returns:
         dict: Extracted metadata dictionary, or None if an error occurs.
+
+    Raises:
+        TimeoutError: If MediaInfo timed out, so the caller can record it.
     """
     try:
         logging.debug(f"Opening file with MediaInfo: {file_path}")
@@ -684,63 +1909,73 @@ def extract_with_mediainfo(file_path):
         if not is_safe_path(os.getcwd(), sanitized_file_path):
             raise ValueError("Unsafe file path specified.")
 
-        mediainfo_path = shutil.which("mediainfo")
-        if mediainfo_path is None:
-            raise FileNotFoundError("mediainfo executable not found in PATH")
-        
-        result = subprocess.run(
-            [mediainfo_path, '--Output=JSON', sanitized_file_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-        )
-        if result.returncode != 0:
-            raise Exception(result.stderr)
-        info = json.loads(result.stdout)
-        general = info['media']['track'][0]
-        audio = info['media']['track'][1]
-
-        geolocation = {
-            "Latitude": general.get('Location_Latitude', "Unknown"),
-            "Longitude": general.get('Location_Longitude', "Unknown")
-        }
-
-        device_info = {
-            "Encoder": general.get('Encoded_Library/String', 'Unknown'),
-            "Software": general.get('Encoded_Application', 'Unknown')
-        }
-
-        metadata = {
-            "Source": "MediaInfo",
-            "Title": general.get('Title', "Unknown"),
-            "Artist": general.get('Performer', "Unknown"),
-            "Album": general.get('Album', "Unknown"),
-            "Year": general.get('Recorded_Date', "Unknown"),
-            "Genre": general.get('Genre', "Unknown"),
-            "Track Number": general.get('Track_Position', "Unknown"),
-            "Disc Number": general.get('Part', "Unknown"),
-            "Composer": general.get('Composer', "Unknown"),
-            "Conductor": general.get('Conductor', "Unknown"),
-            "Lyrics": general.get('Lyrics', "Unknown"),
-            "Language": general.get('Language', "Unknown"),
-            "Geolocation": geolocation,
-            "Device Information": device_info,
-            "Info": {
-                "Format": general.get('Format', "Unknown"),
-                "Sample Rate": audio.get('SamplingRate', "Unknown"),
-                "Bit Rate": audio.get('BitRate', "Unknown"),
-                "Encoding": audio.get('Format_Settings_Mode', "Unknown"),
-                "Channels": audio.get('Channel(s)', "Unknown"),
-                "Bit Depth": audio.get('BitDepth', "Unknown"),
-                "Duration": general.get('Duration', "Unknown"),
-            },
-            "Extra": info
-        }
-        return sanitize_metadata(metadata)
+        if isinstance(info, Exception):
+            raise info
+        if info is None:
+            info = run_mediainfo([sanitized_file_path], timeout).get(os.path.normpath(sanitized_file_path))
+            if info is None:
+                raise ValueError("MediaInfo returned no output for the file")
+        return parse_mediainfo_output(info)
+    except TimeoutError:
+        raise
     except FileNotFoundError as e:
         logging.error(f"MediaInfo error: {e}")
     except Exception as e:
         logging.error(f"MediaInfo error extracting metadata from {file_path}: {e}")
+        note_extractor_error(e)
     return None
 
+def parse_mediainfo_output(info):
+    """
+    Convert the MediaInfo JSON output of one file into a metadata dictionary.
+
+    Args:
+        info (dict): MediaInfo JSON output of the file.
+
+    Returns:
+        dict: Extracted metadata dictionary.
+    """
+    general = info['media']['track'][0]
+    audio = info['media']['track'][1]
+
+    geolocation = {
+        "Latitude": general.get('Location_Latitude', "Unknown"),
+        "Longitude": general.get('Location_Longitude', "Unknown")
+    }
+
+    device_info = {
+        "Encoder": general.get('Encoded_Library/String', 'Unknown'),
+        "Software": general.get('Encoded_Application', 'Unknown')
+    }
+
+    metadata = {
+        "Source": "MediaInfo",
+        "Title": general.get('Title', "Unknown"),
+        "Artist": general.get('Performer', "Unknown"),
+        "Album": general.get('Album', "Unknown"),
+        "Year": general.get('Recorded_Date', "Unknown"),
+        "Genre": general.get('Genre', "Unknown"),
+        "Track Number": general.get('Track_Position', "Unknown"),
+        "Disc Number": general.get('Part', "Unknown"),
+        "Composer": general.get('Composer', "Unknown"),
+        "Conductor": general.get('Conductor', "Unknown"),
+        "Lyrics": general.get('Lyrics', "Unknown"),
+        "Language": general.get('Language', "Unknown"),
+        "Geolocation": geolocation,
+        "Device Information": device_info,
+        "Info": {
+            "Format": general.get('Format', "Unknown"),
+            "Sample Rate": audio.get('SamplingRate', "Unknown"),
+            "Bit Rate": audio.get('BitRate', "Unknown"),
+            "Encoding": audio.get('Format_Settings_Mode', "Unknown"),
+            "Channels": audio.get('Channel(s)', "Unknown"),
+            "Bit Depth": audio.get('BitDepth', "Unknown"),
+            "Duration": general.get('Duration', "Unknown"),
+        },
+        "Extra": info
+    }
+    return sanitize_metadata(metadata)
+
 # Example usage:
 # file_path = "path/to/audio/file"
 # metadata = extract_metadata(file_path, level=2, aggregate=True)
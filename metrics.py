@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from check import sanitize_path, is_safe_path
+from file_handler import get_timings, get_timed_out_stages, get_extractor_errors, is_error_record
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Seconds between refreshes of the metrics file
+METRICS_INTERVAL = 5
+
+# Prefix of the exported metric names
+METRIC_PREFIX = "aft"
+
+# Address the metrics endpoint listens on, so metrics are only served locally
+METRICS_HOST = "127.0.0.1"
+
+class LatencyHistogram:
+    """
+    Histogram of latencies over LATENCY_BUCKETS.
+    """
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        """
+        Count one latency.
+
+        Args:
+            seconds (float): The latency.
+        """
+        self.count += 1
+        self.sum += seconds
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def to_dict(self):
+        """
+        Get the histogram with cumulative bucket counts, as Prometheus histograms have them.
+
+        Returns:
+            dict: Cumulative count per bucket bound ("+Inf" for all), count and sum.
+        """
+        buckets = {}
+        total = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts):
+            total += count
+            buckets[str(bound)] = total
+        buckets["+Inf"] = self.count
+        return {"Buckets": buckets, "Count": self.count, "Sum": round(self.sum, 6)}
+
+class BatchMetrics:
+    """
+    Live metrics of a batch run.
+
+    Updated by iter_file_results as files are submitted and finished, and read
+    by MetricsExporter from another thread. Extractor latencies come from the
+    "Timings" section, which iter_file_results records for the metrics.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.files = 0
+        self.bytes = 0
+        self.in_flight = 0
+        self.failures = Counter()
+        self.extractor_failures = Counter()
+        self.stage_timeouts = Counter()
+        self.file_latency = LatencyHistogram()
+        self.extractor_latency = {}
+
+    def set_in_flight(self, count):
+        """
+        Set the number of files being processed.
+
+        Args:
+            count (int): Files submitted for processing but not finished yet.
+        """
+        with self.lock:
+            self.in_flight = count
+
+    def observe(self, file_path, metadata):
+        """
+        Count a finished file.
+
+        Args:
+            file_path (str): Sanitized path of the file.
+            metadata (dict or list or None): Result of processing the file; non-audio files (None) are not counted.
+        """
+        if metadata is None:
+            return
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+        timings = get_timings(metadata)
+        with self.lock:
+            self.files += 1
+            self.bytes += size
+            if is_error_record(metadata):
+                self.failures[metadata.get("Error Type", "Error")] += 1
+            for stage in get_timed_out_stages(metadata):
+                self.stage_timeouts[stage] += 1
+            for error in get_extractor_errors(metadata):
+                self.extractor_failures[(error["Source"], error["Error Type"])] += 1
+            if timings:
+                self.file_latency.observe(timings["Total"])
+                for name, seconds in timings.get("Extractors", {}).items():
+                    self.extractor_latency.setdefault(name, LatencyHistogram()).observe(seconds)
+
+    def snapshot(self):
+        """
+        Get the current metrics.
+
+        Returns:
+            dict: The metrics, with throughput averaged since the start of the run.
+        """
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                "Elapsed Seconds": round(elapsed, 3),
+                "Files": self.files,
+                "Bytes": self.bytes,
+                "In Flight": self.in_flight,
+                "Files Per Second": round(self.files / elapsed, 3) if elapsed else 0,
+                "MB Per Second": round(self.bytes / 1024 / 1024 / elapsed, 3) if elapsed else 0,
+                "Failures": dict(self.failures),
+                "Extractor Failures": self._group_extractor_failures(),
+                "Stage Timeouts": dict(self.stage_timeouts),
+                "File Latency": self.file_latency.to_dict(),
+                "Extractor Latency": {name: histogram.to_dict() for name, histogram in sorted(self.extractor_latency.items())}
+            }
+
+    def _group_extractor_failures(self):
+        failures = {}
+        for (name, error_type), count in sorted(self.extractor_failures.items()):
+            failures.setdefault(name, {})[error_type] = count
+        return failures
+
+    def to_json(self):
+        """
+        Format the current metrics as JSON.
+
+        Returns:
+            str: The metrics.
+        """
+        return json.dumps(self.snapshot(), indent=4)
+
+    def to_prometheus(self):
+        """
+        Format the current metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def add_metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{METRIC_PREFIX}_{name}{format_labels(labels)} {value}")
+
+        def add_histogram(name, help_text, histograms):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} histogram")
+            for labels, histogram in histograms:
+                for bound, count in histogram["Buckets"].items():
+                    lines.append(f"{METRIC_PREFIX}_{name}_bucket{format_labels({**labels, 'le': bound})} {count}")
+                lines.append(f"{METRIC_PREFIX}_{name}_sum{format_labels(labels)} {histogram['Sum']}")
+                lines.append(f"{METRIC_PREFIX}_{name}_count{format_labels(labels)} {histogram['Count']}")
+
+        add_metric("files_processed_total", "counter", "Audio files processed.", [({}, snapshot["Files"])])
+        add_metric("bytes_processed_total", "counter", "Bytes of the audio files processed.", [({}, snapshot["Bytes"])])
+        add_metric("files_in_flight", "gauge", "Files submitted for processing but not finished.", [({}, snapshot["In Flight"])])
+        add_metric("files_per_second", "gauge", "Files processed per second since the start of the run.", [({}, snapshot["Files Per Second"])])
+        add_metric("megabytes_per_second", "gauge", "MB processed per second since the start of the run.", [({}, snapshot["MB Per Second"])])
+        add_metric("failures_total", "counter", "Files that could not be processed, by exception type.",
+                   [({"type": error_type}, count) for error_type, count in sorted(snapshot["Failures"].items())])
+        add_metric("extractor_failures_total", "counter", "Extractor runs that failed, by extractor and exception type.",
+                   [({"extractor": name, "type": error_type}, count)
+                    for name, counts in snapshot["Extractor Failures"].items() for error_type, count in counts.items()])
+        add_metric("stage_timeouts_total", "counter", "Stages that ran out of time, by stage.",
+                   [({"stage": stage}, count) for stage, count in sorted(snapshot["Stage Timeouts"].items())])
+        add_histogram("file_seconds", "Wall time of extracting a file.", [({}, snapshot["File Latency"])])
+        add_histogram("extractor_seconds", "Wall time of an extractor on a file.",
+                      [({"extractor": name}, histogram) for name, histogram in snapshot["Extractor Latency"].items()])
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    """
+    Format the labels of a Prometheus sample.
+
+    Args:
+        labels (dict): Label names and values.
+
+    Returns:
+        str: The labels in braces with escaped values, empty if there are none.
+    """
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+class MetricsExporter:
+    """
+    Export the metrics of a batch run while it is running.
+
+    The metrics file is rewritten every interval seconds and once more when
+    the exporter is closed; it is written as JSON if its name ends in ".json"
+    and in the Prometheus text format otherwise. With a port, the metrics are
+    also served on METRICS_HOST at /metrics (Prometheus text) and
+    /metrics.json.
+    """
+
+    def __init__(self, metrics, file_path=None, port=None, interval=METRICS_INTERVAL):
+        """
+        Initialize the exporter.
+
+        Args:
+            metrics (BatchMetrics): Metrics to export.
+            file_path (str, optional): Path of the metrics file; no file is written if None.
+            port (int, optional): Port of the metrics endpoint; no endpoint is served if None.
+            interval (float): Seconds between refreshes of the metrics file.
+
+        Raises:
+            ValueError: If the metrics file path is unsafe.
+        """
+        self.metrics = metrics
+        self.file_path = None
+        if file_path:
+            self.file_path = sanitize_path(file_path)
+            if not is_safe_path(os.getcwd(), self.file_path):
+                raise ValueError("Unsafe metrics file path specified.")
+        self.port = port
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.threads = []
+        self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """
+        Start refreshing the metrics file and serving the endpoint.
+        """
+        if self.file_path:
+            self.threads.append(threading.Thread(target=self._refresh, daemon=True))
+        if self.port is not None:
+            self.server = ThreadingHTTPServer((METRICS_HOST, self.port), self._build_handler())
+            self.threads.append(threading.Thread(target=self.server.serve_forever, daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def close(self):
+        """
+        Stop the exporter, writing the final metrics file.
+        """
+        self.stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self.threads:
+            thread.join()
+        if self.file_path:
+            self.write()
+
+    def write(self):
+        """
+        Write the metrics file, replacing the previous one atomically.
+        """
+        try:
+            content = self.metrics.to_json() if self.file_path.endswith(".json") else self.metrics.to_prometheus()
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            temp_path = f"{self.file_path}.tmp"
+            with open(temp_path, 'w') as outfile:
+                outfile.write(content)
+            os.replace(temp_path, self.file_path)
+        except OSError as e:
+            logging.error(f"Error writing metrics file {self.file_path}: {e}")
+
+    def _refresh(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def _build_handler(self):
+        metrics = self.metrics
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = metrics.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Metrics request: {format % args}")
+
+        return MetricsHandler
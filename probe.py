@@ -0,0 +1,391 @@
+import os
+import json
+import shutil
+import asyncio
+import logging
+import threading
+import subprocess
+from functools import lru_cache
+
+from check import sanitize_path, is_safe_path
+
+# Number of files passed to one MediaInfo process in batch mode
+MEDIAINFO_BATCH_SIZE = 32
+
+# Maximum number of probing processes running at the same time
+PROBE_CONCURRENCY = os.cpu_count() or 4
+
+# Seconds a probing process may run (per file for MediaInfo processes covering several files)
+PROBE_TIMEOUT = 60
+
+# Extractors backed by external probing tools, with the executable each one runs
+PROBE_TOOLS = {
+    "FFmpeg": "ffprobe",
+    "MediaInfo": "mediainfo",
+}
+
+# Tool processes started synchronously by this process, see get_process_count
+_process_count = 0
+_process_count_lock = threading.Lock()
+
+def count_process():
+    """
+    Count a tool process started synchronously by this process.
+    """
+    global _process_count
+    with _process_count_lock:
+        _process_count += 1
+
+def get_process_count():
+    """
+    Get the number of tool processes started synchronously by this process.
+
+    Processes started by run_command_async are not counted, since the
+    prefetcher runs them for other files while a file is being extracted.
+
+    Returns:
+        int: Number of ffprobe, MediaInfo and FFmpeg processes started so far.
+    """
+    return _process_count
+
+@lru_cache(maxsize=None)
+def get_tool_path(executable):
+    """
+    Locate an executable once per process.
+
+    Args:
+        executable (str): Name of the executable.
+
+    Returns:
+        str: Path to the executable, or None if it is not in PATH.
+    """
+    return shutil.which(executable)
+
+def sanitize_file_paths(file_paths):
+    """
+    Sanitize the paths of files passed to a probing tool.
+
+    Args:
+        file_paths (list): Paths of the files.
+
+    Returns:
+        list: The sanitized paths.
+
+    Raises:
+        ValueError: If a file path is unsafe.
+    """
+    sanitized_file_paths = []
+    for file_path in file_paths:
+        sanitized_file_path = sanitize_path(file_path)
+        if not is_safe_path(os.getcwd(), sanitized_file_path):
+            raise ValueError("Unsafe file path specified.")
+        sanitized_file_paths.append(sanitized_file_path)
+    return sanitized_file_paths
+
+def build_command(tool, file_paths):
+    """
+    Build the command line running a probing tool on files.
+
+    Args:
+        tool (str): Name of the tool's extractor, a key of PROBE_TOOLS.
+        file_paths (list): Paths of the files; ffprobe takes exactly one.
+
+    Returns:
+        list: The command line.
+
+    Raises:
+        FileNotFoundError: If the tool is not installed.
+        ValueError: If a file path is unsafe.
+    """
+    executable = get_tool_path(PROBE_TOOLS[tool])
+    if executable is None:
+        raise FileNotFoundError(f"{PROBE_TOOLS[tool]} executable not found in PATH")
+    sanitized_file_paths = sanitize_file_paths(file_paths)
+    if tool == "FFmpeg":
+        return [executable, '-v', 'error', '-show_entries', 'format', '-of', 'json', *sanitized_file_paths]
+    return [executable, '--Output=JSON', *sanitized_file_paths]
+
+def split_mediainfo_output(output):
+    """
+    Split the JSON output of a MediaInfo run per file.
+
+    Args:
+        output (str): Standard output of MediaInfo.
+
+    Returns:
+        dict: MediaInfo JSON output of each file, keyed by normalized file
+        path. Files MediaInfo could not read are missing.
+    """
+    info = json.loads(output)
+    # A single file gives one object, several files give a list of them
+    outputs = info if isinstance(info, list) else [info]
+
+    results = {}
+    for file_output in outputs:
+        media = file_output.get('media') if isinstance(file_output, dict) else None
+        if media and media.get('@ref') and media.get('track'):
+            results[os.path.normpath(media['@ref'])] = file_output
+    return results
+
+def run_ffprobe(file_path, timeout=PROBE_TIMEOUT):
+    """
+    Run ffprobe on a file.
+
+    Args:
+        file_path (str): Path of the file.
+        timeout (float): Seconds the process may run before it is killed.
+
+    Returns:
+        dict: The ffprobe JSON output.
+
+    Raises:
+        TimeoutError: If ffprobe timed out and was killed.
+    """
+    count_process()
+    try:
+        result = subprocess.run(
+            build_command("FFmpeg", [file_path]),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        raise TimeoutError(f"ffprobe timed out after {timeout} seconds") from None
+    return json.loads(result.stdout)
+
+def run_mediainfo(file_paths, timeout=PROBE_TIMEOUT):
+    """
+    Run one MediaInfo process on several files and split its output per file.
+
+    Args:
+        file_paths (list): Paths of the files.
+        timeout (float): Seconds per file the process may run before it is killed.
+
+    Returns:
+        dict: MediaInfo JSON output of each file, keyed by normalized file path.
+
+    Raises:
+        TimeoutError: If MediaInfo timed out and was killed.
+    """
+    count_process()
+    try:
+        result = subprocess.run(
+            build_command("MediaInfo", file_paths),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=timeout * len(file_paths)
+        )
+    except subprocess.TimeoutExpired:
+        raise TimeoutError(f"mediainfo timed out after {timeout * len(file_paths)} seconds") from None
+    return split_mediainfo_output(result.stdout)
+
+def open_decoder(file_path, sample_rate, channels):
+    """
+    Start FFmpeg decoding a file to raw 32-bit float samples on its standard output.
+
+    Used where a file has to be read block by block and SoundFile cannot
+    decode it. The caller reads stdout and must wait for or kill the process.
+
+    Args:
+        file_path (str): Path of the file.
+        sample_rate (int): Sample rate of the decoded samples.
+        channels (int): Number of channels of the decoded samples.
+
+    Returns:
+        subprocess.Popen: The FFmpeg process.
+
+    Raises:
+        FileNotFoundError: If FFmpeg is not installed.
+        ValueError: If the file path is unsafe.
+    """
+    executable = get_tool_path("ffmpeg")
+    if executable is None:
+        raise FileNotFoundError("ffmpeg executable not found in PATH")
+    sanitized_file_path = sanitize_file_paths([file_path])[0]
+    command = [executable, '-v', 'error', '-i', sanitized_file_path, '-vn',
+               '-ac', str(channels), '-ar', str(sample_rate), '-f', 'f32le', '-']
+    count_process()
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+async def run_command_async(command, timeout=PROBE_TIMEOUT):
+    """
+    Run a command without blocking the event loop.
+
+    The process is killed if it times out or the awaiting task is cancelled.
+
+    Args:
+        command (list): The command line.
+        timeout (float): Seconds the process may run.
+
+    Returns:
+        str: Standard output of the command.
+
+    Raises:
+        TimeoutError: If the process timed out.
+        subprocess.CalledProcessError: If the process failed.
+    """
+    process = await asyncio.create_subprocess_exec(*command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except BaseException as e:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if isinstance(e, asyncio.TimeoutError):
+            raise TimeoutError(f"{os.path.basename(command[0])} timed out after {timeout} seconds") from None
+        raise
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr.decode(errors='replace'))
+    return stdout.decode(errors='replace')
+
+async def probe_files(file_paths, tools=tuple(PROBE_TOOLS), concurrency=PROBE_CONCURRENCY, timeout=PROBE_TIMEOUT,
+                      chunk_size=MEDIAINFO_BATCH_SIZE, semaphore=None):
+    """
+    Run the probing tools on many files with bounded concurrency.
+
+    ffprobe runs once per file and MediaInfo once per chunk of chunk_size
+    files. At most `concurrency` processes run at the same time. A file whose
+    MediaInfo chunk failed is left out so its extractor can retry it alone.
+
+    Args:
+        file_paths (list): Paths of the files.
+        tools (iterable): Names of the tools' extractors, keys of PROBE_TOOLS.
+        concurrency (int): Maximum number of processes in flight, ignored if a semaphore is given.
+        timeout (float): Seconds a process may run (per file for MediaInfo).
+        chunk_size (int): Number of files per MediaInfo process.
+        semaphore (asyncio.Semaphore, optional): Limit shared with other probing calls.
+
+    Returns:
+        dict: For each file path, the output of every tool, or the exception
+        it raised, keyed by the tool's extractor name.
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(concurrency)
+    results = {file_path: {} for file_path in file_paths}
+
+    async def ffprobe(file_path):
+        async with semaphore:
+            try:
+                results[file_path]["FFmpeg"] = json.loads(await run_command_async(build_command("FFmpeg", [file_path]), timeout))
+            except Exception as e:
+                logging.error(f"FFmpeg error probing {file_path}: {e!r}")
+                results[file_path]["FFmpeg"] = e
+
+    async def mediainfo(chunk):
+        async with semaphore:
+            try:
+                outputs = split_mediainfo_output(await run_command_async(build_command("MediaInfo", chunk), timeout * len(chunk)))
+            except Exception as e:
+                logging.error(f"MediaInfo error probing {len(chunk)} files: {e!r}")
+                return
+        for file_path in chunk:
+            output = outputs.get(os.path.normpath(sanitize_path(file_path)))
+            if output is not None:
+                results[file_path]["MediaInfo"] = output
+
+    tasks = []
+    if "FFmpeg" in tools:
+        tasks.extend(ffprobe(file_path) for file_path in file_paths)
+    if "MediaInfo" in tools:
+        tasks.extend(mediainfo(file_paths[start:start + chunk_size]) for start in range(0, len(file_paths), chunk_size))
+    await asyncio.gather(*tasks)
+    return results
+
+class ProbePrefetcher:
+    """
+    Probe the files of a batch ahead of their extraction.
+
+    An asyncio event loop on a background thread runs probe_files on chunks
+    of the batch, one chunk ahead of the file being asked for, so the tool
+    output is usually ready when the file's turn comes. All chunks share one
+    concurrency limit.
+    """
+    def __init__(self, file_paths, tools, concurrency=PROBE_CONCURRENCY, timeout=PROBE_TIMEOUT, chunk_size=MEDIAINFO_BATCH_SIZE):
+        """
+        Args:
+            file_paths (list or BatchPaths): Sanitized paths of the files, in processing order.
+            tools (list): Names of the tools' extractors, keys of PROBE_TOOLS.
+            concurrency (int): Maximum number of probing processes in flight.
+            timeout (float): Seconds a process may run (per file for MediaInfo).
+            chunk_size (int): Number of files per chunk.
+        """
+        self.file_paths = file_paths
+        self.tools = tools
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.chunks = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.semaphore = self._call(self._create_semaphore(concurrency)).result()
+
+    def _call(self, coroutine):
+        """
+        Schedule a coroutine on the background event loop.
+
+        Args:
+            coroutine: The coroutine.
+
+        Returns:
+            concurrent.futures.Future: Future of its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    @staticmethod
+    async def _create_semaphore(concurrency):
+        # Created on the background loop, which older Python versions bind it to
+        return asyncio.Semaphore(concurrency)
+
+    def _fetch_chunk(self, chunk_index):
+        """
+        Start probing a chunk unless it is already probed or out of range.
+
+        Args:
+            chunk_index (int): Index of the chunk.
+
+        Returns:
+            concurrent.futures.Future: Future of the chunk's probe_files result, or None if out of range.
+        """
+        if chunk_index not in self.chunks:
+            start = chunk_index * self.chunk_size
+            # Sliced rather than measured, as not all paths of a batch may be known yet
+            chunk = self.file_paths[start:start + self.chunk_size]
+            if chunk:
+                self.chunks[chunk_index] = self._call(
+                    probe_files(chunk, self.tools, timeout=self.timeout, chunk_size=self.chunk_size, semaphore=self.semaphore))
+        return self.chunks.get(chunk_index)
+
+    def get(self, index):
+        """
+        Get the probing results of a file.
+
+        Args:
+            index (int): Index of the file in file_paths.
+
+        Returns:
+            dict: Output of every tool, or the exception it raised, keyed by the tool's extractor name.
+        """
+        chunk_index = index // self.chunk_size
+        future = self._fetch_chunk(chunk_index)
+        self._fetch_chunk(chunk_index + 1)
+        # Files are requested roughly in order, so chunks well behind are no longer needed
+        for old_index in [i for i in self.chunks if i < chunk_index - 1]:
+            del self.chunks[old_index]
+        try:
+            return future.result().get(self.file_paths[index], {})
+        except Exception as e:
+            logging.error(f"Error probing {self.file_paths[index]}: {e}")
+            return {}
+
+    def close(self):
+        """
+        Cancel outstanding probes, killing their processes, and stop the background loop.
+        """
+        async def shutdown():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            self._call(shutdown()).result()
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
@@ -0,0 +1,70 @@
+import os
+import sys
+import hashlib
+import tempfile
+import unittest
+
+# Directory of the tool; paths must lie below the working directory
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+from metadata_extractor import calculate_digests, calculate_merkle_root, find_changed_regions
+
+# Block size of the test files; small so that a file spans several blocks
+BLOCK_SIZE = 4096
+
+def sha256(data):
+    return hashlib.sha256(data).digest()
+
+class BlockDigestTest(unittest.TestCase):
+    """
+    Block digests of calculate_digests and the regions find_changed_regions locates with them.
+    """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory(prefix=".test_", dir=REPO_DIR)
+        # Five blocks, the last one short, each with different content
+        self.data = b''.join(bytes([index]) * BLOCK_SIZE for index in range(4)) + b'\xff' * 100
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def write(self, name, data):
+        file_path = os.path.join(self.work_dir.name, name)
+        with open(file_path, 'wb') as outfile:
+            outfile.write(data)
+        return os.path.relpath(file_path, REPO_DIR)
+
+    def test_merkle_root(self):
+        file_path = self.write("audio.bin", self.data)
+        checksums, block_digest = calculate_digests(file_path, ["sha256"], BLOCK_SIZE)
+        leaves = [sha256(self.data[offset:offset + BLOCK_SIZE]) for offset in range(0, len(self.data), BLOCK_SIZE)]
+        # Inner nodes hash 0x01 and their children; the unpaired fifth leaf is carried up twice
+        left = sha256(b'\x01' + sha256(b'\x01' + leaves[0] + leaves[1]) + sha256(b'\x01' + leaves[2] + leaves[3]))
+        root = sha256(b'\x01' + left + leaves[4])
+        self.assertEqual(checksums["sha256"], hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(block_digest["Block Count"], 5)
+        self.assertEqual(block_digest["Blocks"], [leaf.hex() for leaf in leaves])
+        self.assertEqual(block_digest["Merkle Root"], root.hex())
+        self.assertEqual(calculate_merkle_root(block_digest["Blocks"]), root.hex())
+
+    def test_empty_file(self):
+        file_path = self.write("empty.bin", b'')
+        _, block_digest = calculate_digests(file_path, ["sha256"], BLOCK_SIZE)
+        self.assertEqual(block_digest["Block Count"], 0)
+        self.assertEqual(block_digest["Merkle Root"], hashlib.sha256().hexdigest())
+
+    def test_one_block_changed(self):
+        file_path = self.write("audio.bin", self.data)
+        _, recorded = calculate_digests(file_path, ["sha256"], BLOCK_SIZE)
+        changed = bytearray(self.data)
+        changed[2 * BLOCK_SIZE + 10] ^= 0xff
+        self.write("audio.bin", bytes(changed))
+        _, current = calculate_digests(file_path, ["sha256"], BLOCK_SIZE)
+        self.assertNotEqual(recorded["Merkle Root"], current["Merkle Root"])
+        self.assertEqual(find_changed_regions(recorded, current), [(2 * BLOCK_SIZE, 3 * BLOCK_SIZE)])
+        self.assertEqual(find_changed_regions(recorded, recorded), [])
+
+if __name__ == "__main__":
+    unittest.main()
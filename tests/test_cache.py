@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Directory of the tool; paths must lie below the working directory
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+from cache import MetadataCache
+
+class MetadataCacheTest(unittest.TestCase):
+    """
+    Storing and looking up extractor results in MetadataCache.
+    """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory(prefix=".test_", dir=REPO_DIR)
+        self.cache = MetadataCache(os.path.relpath(self.work_dir.name, REPO_DIR))
+
+    def tearDown(self):
+        self.cache.close()
+        self.work_dir.cleanup()
+
+    def test_failed_result_is_not_cached(self):
+        calls = []
+        def compute():
+            calls.append(True)
+            return None
+        self.assertIsNone(self.cache.fetch("audio.wav", "abc", "Mutagen", compute))
+        self.assertIsNone(self.cache.fetch("audio.wav", "abc", "Mutagen", compute))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.cache.get("audio.wav", "abc", "Mutagen"), (False, None))
+
+    def test_result_is_cached(self):
+        calls = []
+        def compute():
+            calls.append(True)
+            return {"Title": "Song"}
+        self.cache.fetch("audio.wav", "abc", "Mutagen", compute)
+        self.assertEqual(self.cache.fetch("audio.wav", "abc", "Mutagen", compute), {"Title": "Song"})
+        self.assertEqual(len(calls), 1)
+
+    def test_replacing_an_entry_keeps_the_total_size(self):
+        self.cache.put("audio.wav", "abc", "Mutagen", {"Title": "Song"})
+        self.cache.put("audio.wav", "abc", "Mutagen", {"Title": "Another song"})
+        stored = self.cache.connection.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+        self.assertEqual(self.cache.total_size, stored)
+
+if __name__ == "__main__":
+    unittest.main()
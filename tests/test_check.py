@@ -0,0 +1,109 @@
+import os
+import sys
+import struct
+import tempfile
+import unittest
+
+# Directory of the tool; paths must lie below the working directory
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+from check import sniff_format, is_audio_file
+
+def box(box_type, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+def ftyp(major_brand, *compatible_brands):
+    return box(b'ftyp', major_brand + struct.pack('>I', 0) + b''.join(compatible_brands))
+
+def track(handler):
+    hdlr = box(b'hdlr', bytes(8) + handler + bytes(12) + b'\x00')
+    return box(b'trak', box(b'mdia', hdlr))
+
+def heif_meta(handler):
+    # HEIF/AVIF images describe their items in a meta box instead of tracks in a moov box
+    return box(b'meta', bytes(4) + box(b'hdlr', bytes(8) + handler + bytes(12) + b'\x00'))
+
+class SniffMP4Test(unittest.TestCase):
+    """
+    sniff_format on files of the ISO base media format, which holds audio, video and images alike.
+    """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory(prefix=".test_", dir=REPO_DIR)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def write(self, name, data):
+        file_path = os.path.join(self.work_dir.name, name)
+        with open(file_path, 'wb') as outfile:
+            outfile.write(data)
+        return file_path
+
+    def test_m4a_brand_is_audio(self):
+        file_path = self.write("song.m4a", ftyp(b'M4A ', b'M4A ', b'mp42', b'isom') + box(b'moov', track(b'soun')))
+        self.assertEqual(sniff_format(file_path), "M4A")
+        self.assertTrue(is_audio_file(file_path))
+
+    def test_generic_brand_with_audio_track_only_is_audio(self):
+        file_path = self.write("audio.mp4", ftyp(b'isom', b'isom', b'mp41') + box(b'moov', track(b'soun')))
+        self.assertEqual(sniff_format(file_path), "MP4")
+        self.assertTrue(is_audio_file(file_path))
+
+    def test_isom_video_is_not_audio(self):
+        file_path = self.write("clip.mp4", ftyp(b'isom', b'isom', b'avc1') + box(b'moov', track(b'vide') + track(b'soun')))
+        self.assertIsNone(sniff_format(file_path))
+        self.assertFalse(is_audio_file(file_path))
+
+    def test_3gp_video_is_not_audio(self):
+        file_path = self.write("vid.3gp", ftyp(b'3gp4', b'3gp4', b'isom') + box(b'moov', track(b'vide')))
+        self.assertIsNone(sniff_format(file_path))
+        self.assertFalse(is_audio_file(file_path))
+
+    def test_heic_image_is_not_audio(self):
+        file_path = self.write("photo.heic", ftyp(b'heic', b'mif1', b'heic') + heif_meta(b'pict'))
+        self.assertIsNone(sniff_format(file_path))
+        self.assertFalse(is_audio_file(file_path))
+
+    def test_avif_image_is_not_audio(self):
+        file_path = self.write("img.avif", ftyp(b'avif', b'avif', b'mif1', b'miaf') + heif_meta(b'pict'))
+        self.assertIsNone(sniff_format(file_path))
+        self.assertFalse(is_audio_file(file_path))
+
+    def test_truncated_moov_is_not_audio(self):
+        file_path = self.write("broken.mp4", ftyp(b'isom') + struct.pack('>I4s', 1, b'moov') + b'\x00\x00')
+        self.assertIsNone(sniff_format(file_path))
+
+class SniffMPEGTest(unittest.TestCase):
+    """
+    sniff_format on files that start with an MPEG frame sync.
+    """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory(prefix=".test_", dir=REPO_DIR)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def write(self, name, data):
+        file_path = os.path.join(self.work_dir.name, name)
+        with open(file_path, 'wb') as outfile:
+            outfile.write(data)
+        return file_path
+
+    def test_utf16_text_is_not_audio(self):
+        file_path = self.write("notes.txt", ("Some notes\n" * 20).encode('utf-16'))
+        self.assertIsNone(sniff_format(file_path))
+        self.assertFalse(is_audio_file(file_path))
+
+    def test_consecutive_frames_are_mp3(self):
+        # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz: 417-byte frames
+        frame = b'\xff\xfb\x90\x00' + bytes(413)
+        file_path = self.write("audio.bin", frame * 3)
+        self.assertEqual(sniff_format(file_path), "MP3")
+        self.assertTrue(is_audio_file(file_path))
+
+if __name__ == "__main__":
+    unittest.main()
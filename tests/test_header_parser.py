@@ -0,0 +1,135 @@
+import os
+import sys
+import struct
+import tempfile
+import unittest
+
+# Directory of the tool; paths must lie below the working directory
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+from check import sniff_format
+from header_parser import read_header
+
+def chunk(chunk_id, payload, byte_order='<'):
+    return struct.pack(byte_order + '4sI', chunk_id, len(payload)) + payload + b'\x00' * (len(payload) & 1)
+
+def wav_fmt(channels=2, sample_rate=44100, bits=16):
+    block_align = channels * bits // 8
+    return chunk(b'fmt ', struct.pack('<HHIIHH', 1, channels, sample_rate, sample_rate * block_align, block_align, bits))
+
+def rf64(riff_id, data_size):
+    # The 32-bit sizes are 0xFFFFFFFF, the real ones are in the ds64 chunk
+    ds64 = chunk(b'ds64', struct.pack('<QQQI', 0, data_size, 0, 0))
+    data = struct.pack('<4sI', b'data', 0xFFFFFFFF) + bytes(64)
+    return struct.pack('<4sI4s', riff_id, 0xFFFFFFFF, b'WAVE') + ds64 + wav_fmt() + data
+
+def box(box_type, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+def mp4(moov_children):
+    return box(b'ftyp', b'M4A ' + bytes(4) + b'M4A isom') + box(b'moov', moov_children)
+
+def mp4_audio_track(timescale=44100, duration=88200):
+    mdhd = box(b'mdhd', bytes(12) + struct.pack('>II', timescale, duration) + bytes(4))
+    hdlr = box(b'hdlr', bytes(8) + b'soun' + bytes(13))
+    # Sample entry: size, codec, reserved, data reference index, reserved, channels, sample size, reserved, 16.16 rate
+    entry = struct.pack('>I4s6sH8sHHI', 36, b'mp4a', bytes(6), 1, bytes(8), 2, 16, 0) + struct.pack('>I', timescale << 16)
+    stsd = box(b'stsd', struct.pack('>II', 0, 1) + entry)
+    return box(b'trak', box(b'mdia', mdhd + hdlr + box(b'minf', box(b'stbl', stsd))))
+
+def ogg_page(granule, serial, sequence, packet, header_type=0):
+    return (b'OggS' + struct.pack('<BBqIIIB', 0, header_type, granule, serial, sequence, 0, 1)
+            + bytes([len(packet)]) + packet)
+
+class ReadHeaderTest(unittest.TestCase):
+    """
+    read_header on synthetic headers of every supported container, whole and truncated.
+    """
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory(prefix=".test_", dir=REPO_DIR)
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def read(self, data):
+        file_path = os.path.join(self.work_dir.name, "audio.bin")
+        with open(file_path, 'wb') as outfile:
+            outfile.write(data)
+        return read_header(file_path, sniff_format(file_path))
+
+    def test_wav(self):
+        data = chunk(b'data', bytes(400))
+        header = self.read(struct.pack('<4sI4s', b'RIFF', 4 + len(wav_fmt()) + len(data), b'WAVE') + wav_fmt() + data)
+        self.assertEqual((header["Format"], header["Subtype"], header["Channels"]), ("WAV", "PCM_16", 2))
+        self.assertEqual((header["Sample Rate"], header["Bit Depth"], header["Frames"]), (44100, 16, 100))
+
+    def test_rf64_and_bw64(self):
+        for riff_id in (b'RF64', b'BW64'):
+            with self.subTest(riff_id=riff_id):
+                header = self.read(rf64(riff_id, 441000 * 4))
+                self.assertEqual(header["Format"], "WAV")
+                self.assertEqual(header["Frames"], 441000)
+                self.assertEqual(header["Duration"], 10.0)
+
+    def test_truncated_wav(self):
+        self.assertIsNone(self.read(b'RIFF'))
+        self.assertIsNone(self.read(struct.pack('<4sI4s', b'RIFF', 100, b'WAVE') + b'fmt '))
+
+    def test_aiff(self):
+        # 44100 as an 80-bit IEEE 754 extended float
+        comm = chunk(b'COMM', struct.pack('>HIH', 1, 22050, 24) + b'\x40\x0e\xac\x44' + bytes(6), '>')
+        header = self.read(struct.pack('>4sI4s', b'FORM', 4 + len(comm), b'AIFF') + comm)
+        self.assertEqual((header["Format"], header["Subtype"], header["Channels"]), ("AIFF", "PCM_24", 1))
+        self.assertEqual((header["Sample Rate"], header["Bit Depth"], header["Duration"]), (44100, 24, 0.5))
+
+    def test_truncated_aiff(self):
+        self.assertIsNone(self.read(struct.pack('>4sI4s', b'FORM', 30, b'AIFF') + b'COMM' + struct.pack('>I', 18) + bytes(6)))
+
+    def test_flac(self):
+        packed = 48000 << 44 | (2 - 1) << 41 | (24 - 1) << 36 | 96000
+        streaminfo = struct.pack('>HH', 4096, 4096) + bytes(6) + packed.to_bytes(8, 'big') + bytes(16)
+        header = self.read(b'fLaC' + bytes([0x80]) + len(streaminfo).to_bytes(3, 'big') + streaminfo)
+        self.assertEqual((header["Format"], header["Channels"], header["Sample Rate"]), ("FLAC", 2, 48000))
+        self.assertEqual((header["Bit Depth"], header["Frames"], header["Duration"]), (24, 96000, 2.0))
+
+    def test_truncated_flac(self):
+        self.assertIsNone(self.read(b'fLaC' + bytes([0x80, 0, 0, 34]) + bytes(10)))
+
+    def test_ogg_opus(self):
+        opus_head = b'OpusHead' + struct.pack('<BBHIhB', 1, 2, 312, 44100, 0, 0)
+        data = ogg_page(0, 7, 0, opus_head, header_type=2) + ogg_page(48000 + 312, 7, 1, bytes(10), header_type=4)
+        header = self.read(data)
+        self.assertEqual((header["Format"], header["Subtype"], header["Channels"]), ("OGG", "OPUS", 2))
+        self.assertEqual((header["Input Sample Rate"], header["Frames"], header["Duration"]), (44100, 48000, 1.0))
+
+    def test_truncated_ogg(self):
+        self.assertIsNone(self.read(b'OggS' + bytes(10)))
+
+    def test_mp4(self):
+        header = self.read(mp4(mp4_audio_track()))
+        self.assertEqual((header["Format"], header["Subtype"], header["Channels"]), ("M4A", "AAC", 2))
+        self.assertEqual((header["Sample Rate"], header["Frames"], header["Duration"]), (44100, 88200, 2.0))
+
+    def test_truncated_mp4_boxes(self):
+        # An empty mvhd, an mdhd cut short, and a moov box claiming more bytes than the file has
+        self.assertIsNone(self.read(mp4(box(b'mvhd'))))
+        self.assertIsNone(self.read(mp4(box(b'trak', box(b'mdia', box(b'mdhd', bytes(13)))))))
+        truncated_moov = box(b'ftyp', b'M4A ' + bytes(4)) + struct.pack('>I4s', 1000, b'moov') + box(b'mvhd')
+        self.assertIsNone(self.read(truncated_moov))
+
+    def test_mp3(self):
+        # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417-byte frames
+        frame = b'\xff\xfb\x90\x00' + bytes(413)
+        header = self.read(frame * 3)
+        self.assertEqual((header["Format"], header["Subtype"], header["Channels"]), ("MP3", "MPEG_LAYER_III", 2))
+        self.assertEqual((header["Sample Rate"], header["Bit Rate"], header["Encoding"]), (44100, 128000, "CBR"))
+        self.assertAlmostEqual(header["Duration"], 3 * 417 * 8 / 128000)
+
+    def test_truncated_mp3(self):
+        self.assertIsNone(self.read(b'\xff\xfb\x90'))
+
+if __name__ == "__main__":
+    unittest.main()